@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare loading a page of six resources by six requests with one `/_batch`
+request, each handler waits 20ms on another service.
+
+Run: python benchmarks/bench_batch.py
+"""
+import json
+import time
+
+from flask import Flask
+
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+
+WAIT = 0.02
+RESOURCES = ("disks", "volumes", "hosts", "users", "alerts", "tasks")
+
+
+def make_sugar_class(resources):
+    class Sugar(FlaskSugar):
+        config_dict = {"schema": {}, "resources": resources}
+
+        def index(self, data, web_request, **kwargs):
+            time.sleep(WAIT)
+            return [{"id": i} for i in range(10)]
+    Sugar.__name__ = resources.title() + "Sugar"
+    return Sugar
+
+
+def bench(number=20):
+    app = Flask(__name__)
+    jar = FlaskJar(__name__, app)
+    for resources in RESOURCES:
+        jar.register(make_sugar_class(resources))
+    client = app.test_client()
+
+    start = time.time()
+    for _ in range(number):
+        for resources in RESOURCES:
+            assert client.get("/" + resources).status_code == 200
+    separate = (time.time() - start) / number
+    print "%d requests: %.1fms" % (len(RESOURCES), separate * 1000)
+
+    body = json.dumps([{"url": "/" + resources} for resources in RESOURCES])
+    start = time.time()
+    for _ in range(number):
+        response = client.post("/_batch", data=body)
+        assert response.status_code == 200
+    batch = (time.time() - start) / number
+    print "1 batch request: %.1fms, %.1fx" % (batch * 1000, separate / batch)
+
+
+if __name__ == "__main__":
+    bench()
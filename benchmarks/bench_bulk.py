@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare creating 1000 disks by one request each with one `/disks/_bulk`
+request, the handler waits 2ms on the storage service.
+
+Run: python benchmarks/bench_bulk.py
+"""
+import json
+import time
+
+from flask import Flask
+
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+
+COUNT = 1000
+WAIT = 0.002
+
+
+class DiskSugar(FlaskSugar):
+    bulk_max_workers = 16
+    config_dict = {
+        "schema": {
+            "create": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "size": {"type": "integer"},
+                },
+                "required": ["name"],
+            },
+        },
+        "resources": "disks",
+    }
+
+    def create(self, data, web_request, **kwargs):
+        time.sleep(WAIT)
+        return data
+
+
+def bench():
+    app = Flask(__name__)
+    FlaskJar(__name__, app).register(DiskSugar)
+    client = app.test_client()
+    disks = [{"name": "disk%d" % i, "size": str(i)} for i in range(COUNT)]
+
+    start = time.time()
+    for disk in disks:
+        response = client.post(
+            "/disks", data=json.dumps(disk), content_type="application/json",
+        )
+        assert response.status_code == 200
+    single = time.time() - start
+    print "%d POST /disks: %.2fs" % (COUNT, single)
+
+    start = time.time()
+    response = client.post(
+        "/disks/_bulk", content_type="application/json",
+        data=json.dumps([
+            {"operation": "create", "data": disk} for disk in disks
+        ]),
+    )
+    bulk = time.time() - start
+    assert all(item["status"] == 200 for item in json.loads(response.data))
+    print "1 POST /disks/_bulk of %d items, %d workers: %.2fs, %.1fx" % (
+        COUNT, DiskSugar.bulk_max_workers, bulk, single / bulk)
+
+
+if __name__ == "__main__":
+    bench()
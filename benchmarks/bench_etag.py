@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare a poller reading an unchanged disk of 500 fields without ETags,
+with ETags hashed from the body and with ETags made of a version, the
+handler waits 1ms on the database.
+
+Run: python benchmarks/bench_etag.py
+"""
+import time
+
+from flask import Flask
+
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+
+WAIT = 0.001
+DISK = dict(("field%d" % i, "value%d" % i) for i in range(500))
+
+
+class PlainDiskSugar(FlaskSugar):
+    config_dict = {"schema": {}, "resources": "plain_disks"}
+
+    def show(self, data, web_request, id, **kwargs):
+        time.sleep(WAIT)
+        return DISK
+
+
+class TaggedDiskSugar(PlainDiskSugar):
+    config_dict = {"schema": {}, "resources": "tagged_disks"}
+    etag_operations = ("show", )
+
+
+class VersionedDiskSugar(TaggedDiskSugar):
+    config_dict = {"schema": {}, "resources": "versioned_disks"}
+
+    def version(self, operation, data, web_request, **kwargs):
+        return 1
+
+
+def bench(client, url, number=1000):
+    etag = client.get(url).headers.get("ETag")
+    headers = {"If-None-Match": etag} if etag else {}
+    start = time.time()
+    sent = 0
+    for _ in range(number):
+        response = client.get(url, headers=headers)
+        sent += len(response.data)
+    cost = (time.time() - start) / number
+    print "GET %-19s status %d, %6.3fms, %7.1fKB sent in total" % (
+        url, response.status_code, cost * 1000, sent / 1024.0)
+
+
+if __name__ == "__main__":
+    app = Flask(__name__)
+    jar = FlaskJar(__name__, app)
+    jar.register(PlainDiskSugar)
+    jar.register(TaggedDiskSugar)
+    jar.register(VersionedDiskSugar)
+    test_client = app.test_client()
+    bench(test_client, "/plain_disks/1")
+    bench(test_client, "/tagged_disks/1")
+    bench(test_client, "/versioned_disks/1")
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare the precompiled form plan with the legacy
+filter-then-validate path on wide and deeply nested payloads, and forms
+created without a plan with the legacy form compiling its validator.
+
+Run: python benchmarks/bench_form.py
+"""
+from collections import defaultdict
+import timeit
+
+from jsonschema import Draft4Validator
+
+from schema_sugar import SugarConfig, JsonForm, convert_type
+from schema_sugar.compiler import CompiledValidator
+
+
+def legacy_filter_data(data, properties, output):
+    for key in data:
+        if data[key] in ("", None):
+            continue
+        if key in properties:
+            if "type" not in properties[key]:
+                output[key] = data[key]
+                continue
+            if properties[key]['type'].lower() == 'object':
+                output[key] = {}
+                legacy_filter_data(
+                    data[key], properties[key]['properties'], output[key]
+                )
+            else:
+                output[key] = convert_type(data[key], properties[key]['type'])
+
+
+def legacy_validate(schema, data, validator=None):
+    if validator is None:
+        Draft4Validator.check_schema(schema)
+        validator = Draft4Validator(schema)
+    output = {}
+    legacy_filter_data(data, schema['properties'], output)
+    errors = defaultdict(list)
+    for error in validator.iter_errors(output):
+        errors[".".join(str(p) for p in error.absolute_path)].append(
+            error.message
+        )
+    return output, errors
+
+
+def wide_case(width=200):
+    types = ("string", "number", "boolean")
+    schema = {
+        "type": "object",
+        "properties": dict(
+            ("field%d" % i, {"type": types[i % 3]}) for i in range(width)
+        ),
+    }
+    values = ("value", "12", "true")
+    data = dict(("field%d" % i, values[i % 3]) for i in range(width))
+    # unknown fields sent by client
+    data.update(("extra%d" % i, "x") for i in range(width))
+    return schema, data
+
+
+def nested_case(depth=20, width=5):
+    schema = {"type": "object", "properties": {}}
+    data = {}
+    node_schema, node_data = schema, data
+    for level in range(depth):
+        for i in range(width):
+            node_schema["properties"]["field%d" % i] = {"type": "number"}
+            node_data["field%d" % i] = "%d.5" % i
+        child_schema = {"type": "object", "properties": {}}
+        node_schema["properties"]["child"] = child_schema
+        node_data["child"] = {}
+        node_schema, node_data = child_schema, node_data["child"]
+    return schema, data
+
+
+def bench(name, schema, data, number=500):
+    baseline = timeit.timeit(
+        lambda: legacy_validate(schema, data), number=number,
+    )
+    print "%-8s legacy filter + validate: %.3fs" % (name, baseline)
+    cost = timeit.timeit(
+        lambda: JsonForm(data, live_schema=schema).validate(), number=number,
+    )
+    print "%-8s JsonForm without plan: %.3fs, %.1fx" % (
+        name, cost, baseline / cost
+    )
+    cached_validator = Draft4Validator(schema)
+    legacy = timeit.timeit(
+        lambda: legacy_validate(schema, data, cached_validator),
+        number=number,
+    )
+    print "%-8s legacy filter + cached validator: %.3fs" % (name, legacy)
+    for validator_class in (Draft4Validator, CompiledValidator):
+        config = SugarConfig(
+            {"schema": {"create": schema}, "resources": "items"},
+            validator_class=validator_class,
+        )
+        validator = config.get_validator("create")
+        plan = config.get_plan("create")
+
+        def run():
+            form = JsonForm(
+                data, live_schema=schema, validator=validator, plan=plan
+            )
+            form.validate()
+
+        cost = timeit.timeit(run, number=number)
+        print "%-8s plan(%s): %.3fs, %.1fx" % (
+            name, validator_class.__name__, cost, legacy / cost
+        )
+
+
+if __name__ == "__main__":
+    bench("wide", *wide_case())
+    bench("nested", *nested_case())
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare FlaskJar and FutureJar serving 1000 concurrent requests whose
+handlers wait 20ms on another service.
+
+FlaskJar needs a thread per request in flight, FutureJar runs handlers on
+16 threads, a handler returning a future gives its thread back while it
+waits.
+
+Then compare the per request cost of the FlaskJar and WsgiJar WSGI
+applications with handlers returning at once.
+
+Run: python benchmarks/bench_jars.py
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import heapq
+import threading
+import time
+import timeit
+
+from flask import Flask
+from werkzeug.test import EnvironBuilder
+
+from schema_sugar import SchemaSugarBase
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+from schema_sugar.contrib.future_jar import FutureJar
+from schema_sugar.contrib.wsgi_jar import WsgiJar
+
+REQUESTS = 1000
+WAIT = 0.02
+
+
+class Delayer(threading.Thread):
+    """
+    Complete futures after a delay, like the client of another service.
+    """
+
+    def __init__(self):
+        super(Delayer, self).__init__()
+        self.daemon = True
+        self.condition = threading.Condition()
+        self.pending = []
+
+    def later(self, delay, result):
+        future = Future()
+        with self.condition:
+            heapq.heappush(
+                self.pending, (time.time() + delay, id(future), future, result)
+            )
+            self.condition.notify()
+        return future
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                deadline, _, future, result = self.pending[0]
+                now = time.time()
+                if deadline > now:
+                    self.condition.wait(deadline - now)
+                    continue
+                heapq.heappop(self.pending)
+            future.set_result(result)
+
+
+delayer = Delayer()
+delayer.start()
+
+CONFIG = {"schema": {}, "resources": "disks"}
+
+
+class SleepingSugar(SchemaSugarBase):
+    config_dict = CONFIG
+
+    def show(self, data, web_request, id, **kwargs):
+        time.sleep(WAIT)
+        return {"id": id}
+
+
+class FutureSugar(SchemaSugarBase):
+    config_dict = CONFIG
+
+    def show(self, data, web_request, id, **kwargs):
+        return delayer.later(WAIT, {"id": id})
+
+
+class FlaskDiskSugar(FlaskSugar):
+    config_dict = CONFIG
+
+    def show(self, data, web_request, id, **kwargs):
+        time.sleep(WAIT)
+        return {"id": id}
+
+
+def bench_flask(threads):
+    app = Flask(__name__)
+    FlaskJar(__name__, app).register(FlaskDiskSugar)
+    pool = ThreadPoolExecutor(threads)
+
+    def get(index):
+        return app.test_client().get("/disks/%d" % index).status_code
+
+    start = time.time()
+    statuses = list(pool.map(get, range(REQUESTS)))
+    cost = time.time() - start
+    pool.shutdown()
+    assert statuses == [200] * REQUESTS
+    print "FlaskJar, %4d threads: %.2fs, %.0f req/s" % (
+        threads, cost, REQUESTS / cost)
+
+
+def bench_future_jar(sugar_class):
+    jar = FutureJar(__name__, max_workers=16)
+    jar.register(sugar_class)
+    start = time.time()
+    futures = [jar.handle("GET", "/disks/%d" % i) for i in range(REQUESTS)]
+    statuses = [future.result().status for future in futures]
+    cost = time.time() - start
+    jar.shutdown()
+    assert statuses == [200] * REQUESTS
+    print "FutureJar, 16 threads, %s: %.2fs, %.0f req/s" % (
+        sugar_class.__name__, cost, REQUESTS / cost)
+
+
+class FastSugar(SchemaSugarBase):
+    config_dict = CONFIG
+
+    def show(self, data, web_request, id, **kwargs):
+        return {"id": id, "name": "disk" + id}
+
+
+class FlaskFastSugar(FlaskSugar):
+    config_dict = CONFIG
+
+    def show(self, data, web_request, id, **kwargs):
+        return {"id": id, "name": "disk" + id}
+
+
+def bench_wsgi_overhead(number=10000):
+    app = Flask(__name__)
+    FlaskJar(__name__, app).register(FlaskFastSugar)
+    wsgi_jar = WsgiJar(__name__)
+    wsgi_jar.register(FastSugar)
+    environ = EnvironBuilder("/disks/1?fields=id").get_environ()
+
+    def start_response(status, headers):
+        pass
+
+    for name, application in (("FlaskJar", app), ("WsgiJar", wsgi_jar)):
+        cost = timeit.timeit(
+            lambda: "".join(application(dict(environ), start_response)),
+            number=number,
+        ) / number
+        print "%s, per request: %.1fus" % (name, cost * 1000000)
+
+
+if __name__ == "__main__":
+    bench_flask(16)
+    bench_flask(128)
+    bench_future_jar(SleepingSugar)
+    bench_future_jar(FutureSugar)
+    bench_wsgi_overhead()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare size and decode time of the /meta payload in json and MessagePack.
+
+Run: python benchmarks/bench_meta.py
+"""
+import timeit
+
+from flask import Flask
+
+from schema_sugar import serialization
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+
+
+def make_app(count=500, width=30):
+    app = Flask(__name__)
+    jar = FlaskJar(__name__, app)
+    schema = {
+        "type": "object",
+        "properties": dict(
+            ("field%d" % i, {"type": "string", "maxLength": 64,
+                             "help": "the field number %d" % i})
+            for i in range(width)
+        ),
+        "required": ["field0"],
+    }
+    for index in range(count):
+
+        def create(self, data, web_request, **kwargs):
+            return data
+
+        jar.register(type(
+            "Sugar%d" % index, (FlaskSugar, ),
+            {
+                "config_dict": {
+                    "schema": {"create": schema, "update": schema},
+                    "resources": "resource%d" % index,
+                },
+                "create": create,
+                "update": create,
+            },
+        ))
+    return app
+
+
+def bench(app, number=10):
+    client = app.test_client()
+    json_cost = None
+    for mimetype in (serialization.JSON_MIMETYPE,
+                     serialization.MSGPACK_MIMETYPE):
+        payload = client.get("/meta", headers={"Accept": mimetype}).data
+        cost = timeit.timeit(
+            lambda: serialization.loads(payload, mimetype), number=number
+        ) / number
+        json_cost = json_cost or cost
+        print "%-22s %8.1fKB, decode %.1fms, %.1fx" % (
+            mimetype, len(payload) / 1024.0, cost * 1000, json_cost / cost
+        )
+
+
+if __name__ == "__main__":
+    bench(make_app())
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare listing 100k disks in one response with fetching the first page of
+50 disks of a paginated index.
+
+Run: python benchmarks/bench_pagination.py
+"""
+import bisect
+import time
+
+from flask import Flask
+
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+
+DISKS = [{"id": i, "name": "disk%d" % i, "size": i * 1024}
+         for i in xrange(100000)]
+IDS = [disk["id"] for disk in DISKS]
+
+
+class AllDiskSugar(FlaskSugar):
+    config_dict = {"schema": {}, "resources": "all_disks"}
+
+    def index(self, data, web_request, **kwargs):
+        return DISKS
+
+
+class PagedDiskSugar(FlaskSugar):
+    config_dict = {
+        "schema": {}, "resources": "paged_disks",
+        "pagination": {"limit": 50},
+    }
+
+    def index(self, data, web_request, cursor, **kwargs):
+        start = 0
+        if cursor.position is not None:
+            start = bisect.bisect_right(IDS, cursor.position)
+        disks = DISKS[start:start + cursor.limit + 1]
+        if len(disks) > cursor.limit:
+            disks = disks[:cursor.limit]
+            cursor.set_next(disks[-1]["id"])
+        return disks
+
+
+def bench(client, url, number):
+    start = time.time()
+    for _ in range(number):
+        response = client.get(url)
+    cost = (time.time() - start) / number
+    print "GET %-20s %8.1fms, %8.1fKB" % (
+        url, cost * 1000, len(response.data) / 1024.0)
+
+
+if __name__ == "__main__":
+    app = Flask(__name__)
+    jar = FlaskJar(__name__, app)
+    jar.register(AllDiskSugar)
+    jar.register(PagedDiskSugar)
+    test_client = app.test_client()
+    bench(test_client, "/all_disks", 3)
+    bench(test_client, "/paged_disks", 100)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare the compiled projector with the legacy out_filter on 10k-row
+index responses.
+
+Run: python benchmarks/bench_projector.py
+"""
+import timeit
+
+from schema_sugar.projector import Projector
+
+
+def legacy_out_filter(result, out_fields):
+    out_dict = {}
+    out_fields = set(out_fields)
+    for key, value in result.items():
+        if key in out_fields:
+            out_dict[key] = value
+    return out_dict
+
+
+def make_rows(count=10000, width=50):
+    return [
+        dict(
+            [("field%d" % i, i) for i in range(width)]
+            + [("id", index), ("owner", {"id": index, "name": "admin"})]
+        )
+        for index in range(count)
+    ]
+
+
+def bench(width, number=5):
+    rows = make_rows(width=width)
+    out_fields = ["id", "field1", "field2"]
+    legacy = timeit.timeit(
+        lambda: [legacy_out_filter(row, out_fields) for row in rows],
+        number=number,
+    ) / number
+    print "width %3d legacy out_filter per row: %.1fms" % (
+        width, legacy * 1000)
+    project = Projector(out_fields)
+    cost = timeit.timeit(lambda: project(rows), number=number) / number
+    print "width %3d projector: %.1fms, %.1fx" % (
+        width, cost * 1000, legacy / cost)
+    project = Projector(out_fields + ["owner.name"])
+    cost = timeit.timeit(lambda: project(rows), number=number) / number
+    print "width %3d projector with nested field: %.1fms" % (
+        width, cost * 1000)
+
+
+if __name__ == "__main__":
+    bench(10)
+    bench(200)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare the start up time of registering 1,000 sugars with checked and
+trusted schemas.
+
+Run: python benchmarks/bench_startup.py
+"""
+import copy
+import timeit
+
+from schema_sugar import SchemaSugarBase, trusted_schemas
+
+
+def make_sugar_classes(count=1000, width=20):
+    schema = {
+        "type": "object",
+        "properties": dict(
+            ("field%d" % i, {"type": "string", "maxLength": 64})
+            for i in range(width)
+        ),
+        "required": ["field0"],
+    }
+    classes = []
+    for index in range(count):
+        config_dict = {
+            "schema": {
+                "create": copy.deepcopy(schema),
+                "update": copy.deepcopy(schema),
+                "index": {"type": "object"},
+            },
+            "resources": "resource%d" % index,
+            "out_fields": {"show": ["field0", "field1"]},
+        }
+
+        def create(self, data, web_request, **kwargs):
+            return data
+
+        classes.append(
+            type(
+                "Sugar%d" % index, (SchemaSugarBase, ),
+                {"config_dict": config_dict, "create": create,
+                 "update": create, "index": create},
+            )
+        )
+    return classes
+
+
+def start(trusted):
+    classes = make_sugar_classes()
+    with trusted_schemas(trusted):
+        for sugar_class in classes:
+            sugar_class()
+
+
+if __name__ == "__main__":
+    checked = min(timeit.repeat(lambda: start(False), number=1, repeat=3))
+    print "checked schemas: %.3fs" % checked
+    trusted = min(timeit.repeat(lambda: start(True), number=1, repeat=3))
+    print "trusted schemas: %.3fs, %.1fx" % (trusted, checked / trusted)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compare an index of 200k records returned as a list with the same records
+returned by a generator and streamed, the time to first byte and the
+largest piece of body held in memory.
+
+Run: python benchmarks/bench_stream.py
+"""
+import time
+
+from flask import Flask
+
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+
+COUNT = 200000
+
+
+def make_record(index):
+    return {"id": index, "name": "disk%d" % index, "size": index * 1024,
+            "secret": "x" * 32}
+
+
+class ListSugar(FlaskSugar):
+    config_dict = {
+        "schema": {}, "resources": "lists",
+        "out_fields": {"index": ["id", "name", "size"]},
+    }
+
+    def index(self, data, web_request, **kwargs):
+        return [make_record(i) for i in xrange(COUNT)]
+
+
+class StreamSugar(FlaskSugar):
+    config_dict = {
+        "schema": {}, "resources": "streams",
+        "out_fields": {"index": ["id", "name", "size"]},
+    }
+
+    def index(self, data, web_request, **kwargs):
+        return (make_record(i) for i in xrange(COUNT))
+
+
+def bench(url, client, headers=None):
+    start = time.time()
+    response = client.get(url, buffered=False, headers=headers or {})
+    chunks = iter(response.response)
+    first = next(chunks)
+    first_byte = time.time() - start
+    largest = len(first)
+    size = len(first)
+    for chunk in chunks:
+        largest = max(largest, len(chunk))
+        size += len(chunk)
+    total = time.time() - start
+    response.close()
+    print "%-40s first byte %7.1fms, total %6.2fs, body %.1fMB, " \
+          "largest chunk %.1fKB" % (
+              url + (" (NDJSON)" if headers else ""), first_byte * 1000,
+              total, size / 1048576.0, largest / 1024.0)
+
+
+if __name__ == "__main__":
+    app = Flask(__name__)
+    jar = FlaskJar(__name__, app)
+    jar.register(ListSugar)
+    jar.register(StreamSugar)
+    test_client = app.test_client()
+    bench("/lists", test_client)
+    bench("/streams", test_client)
+    bench("/streams", test_client, {"Accept": "application/x-ndjson"})
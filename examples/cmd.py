@@ -1,3 +1,5 @@
+from collections import Iterator
+
 from schema_sugar.client.client import RestClient
 from schema_sugar.client.parser import run_cmds
 from schema_sugar.client.support.flask import parse_rule
@@ -5,6 +7,12 @@ from schema_sugar.client.support.flask import parse_rule
 
 def main():
     client = RestClient(parse_rule)
-    print run_cmds(client)
+    result = run_cmds(client)
+    if isinstance(result, Iterator):
+        # `list` of paginated resources fetches the pages as printed
+        for record in result:
+            print record
+    else:
+        print result
 
-main()
\ No newline at end of file
+main()
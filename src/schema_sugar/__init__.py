@@ -5,26 +5,49 @@
 from abc import abstractmethod
 import click
 from collections import (
-    OrderedDict,
+    Iterator,
     defaultdict,
+    namedtuple,
 )
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import copy
 import inspect
-import json
+from itertools import imap
+import logging
+import re
+import sys
+import threading
 
-import jsonschema
 from jsonschema import Draft4Validator
 from jsonschema.exceptions import ValidationError
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from .constant import (
-    SHOW_OP, OPERATIONS, CREATE_OP, UPDATE_OP, method2op,
-    resources_method2op, RESOURCES_HTTP2OP_MAP, CLI2OP_MAP,
-    HTTP_GET
+    SHOW_OP, INDEX_OP, OPERATIONS, CREATE_OP, UPDATE_OP, method2op,
+    resources_method2op, RESOURCES_HTTP2OP_MAP, RESOURCE_HTTP2OP_MAP,
+    CLI2OP_MAP, HTTP_GET, ROUTE_RESOURCE, ROUTE_RESOURCES, ROUTE_ACTION,
+    ROUTE_BULK, BULK_OPERATIONS, WRITE_OPERATIONS, FIELDS_PARAM,
+    CURSOR_PARAM,
 )
 
+from .etag import ETagStore, ETagged, NotModified, make_etag, etag_matches
 from .exceptions import ConfigError, MethodNotImplement, FormError
+from . import pagination
+from .pagination import Cursor
+from .projector import Projector
+from .refs import schema_store
+from . import serialization
+from .serialization import JSON_MIMETYPE
+from .utils import LRUCache
 
 __version__ = "0.0.1"
 
+logger = logging.getLogger(__name__)
+
 
 def is_abs_method(method):
     if not callable(method):
@@ -39,6 +62,10 @@ def is_abs_method(method):
         return False
 
 
+# `unicode.isdigit` accepts digits like u"²", which `int` rejects
+_DIGITS = re.compile(r"[0-9]+\Z")
+
+
 def _convert_boolean(data):
     if isinstance(data, basestring):
         if data.lower() in ("true", "1"):
@@ -49,17 +76,19 @@ def _convert_boolean(data):
 
 
 def _convert_int(data):
-    try:
-        return int(data)
-    except (ValueError, TypeError):
-        return data
+    if isinstance(data, basestring):
+        try:
+            return int(data)
+        except ValueError:
+            return data
+    return data
 
 
 def _convert_number(data):
     if isinstance(data, (int, float)):
         return data
     if isinstance(data, basestring):
-        if data.isdigit():
+        if _DIGITS.match(data):
             return int(data)
     try:
         return float(data)
@@ -68,7 +97,7 @@ def _convert_number(data):
 
 converter_map = {
     "boolean": _convert_boolean,
-    "integer": _convert_boolean,
+    "integer": _convert_int,
     "number": _convert_number,
 }
 
@@ -85,6 +114,319 @@ def convert_type(data, type):
     return data
 
 
+_NUMBER_TYPES = frozenset((int, float))
+_STRING_TYPES = frozenset((str, unicode))
+
+
+def convert_column(values, type_):
+    """
+    Convert a column of values to specified type at once, the result is
+    the same as calling `convert_type` for each value, but common columns
+    (numbers, digit strings, float strings and boolean strings) are
+    converted without a python call per value, with NumPy if installed.
+    :type values: list
+    :param type_: type definition in json-schema
+    :rtype: list
+    """
+    converter = converter_map.get(type_)
+    if converter is None or not values:
+        return values
+    kinds = set(map(type, values))
+    if type_ in ("number", "integer"):
+        if kinds <= _NUMBER_TYPES \
+                or (type_ == "integer" and kinds.isdisjoint(_STRING_TYPES)):
+            return values
+        if not kinds <= _STRING_TYPES:
+            return map(converter, values)
+        if all(values) and _DIGITS.match("".join(values)):
+            return map(int, values)
+        if type_ == "number" and numpy is not None:
+            strings = numpy.array(values)
+            if not numpy.char.isdigit(strings).any():
+                try:
+                    return strings.astype(numpy.float64).tolist()
+                except ValueError:
+                    pass
+    elif type_ == "boolean" and numpy is not None \
+            and kinds <= _STRING_TYPES:
+        strings = numpy.char.lower(numpy.array(values))
+        converted = numpy.array(values, dtype=object)
+        converted[(strings == "true") | (strings == "1")] = True
+        converted[(strings == "false") | (strings == "0")] = False
+        return converted.tolist()
+    return map(converter, values)
+
+
+def _get_type(schema):
+    """
+    Get the lower-cased type name of given schema.
+    :rtype: str or unicode or None
+    """
+    type_ = schema.get("type")
+    if isinstance(type_, basestring):
+        return type_.lower()
+    return None
+
+
+class FormPlan(object):
+    """
+    Precompiled filter-convert plan of an object schema.
+    The plan drops fields not defined in schema and converts values to the
+    types defined in schema in one walk of the data, each property holds
+    its converter and object properties hold their nested plans. The
+    filtered data is validated by one validator of the whole schema.
+    """
+
+    def __init__(self, schema, validator_class=Draft4Validator,
+                 resolver=None, validator=None, validate=True):
+        """
+        :type schema: dict
+        :param validator_class: class used to compile the schema.
+        :param resolver: `$ref` resolver of the root schema.
+        :param validator: an already compiled validator of the schema.
+        :param validate: if False, the plan only filters and converts data.
+        """
+        if resolver is None:
+            resolver = getattr(validator, "resolver", None) \
+                or schema_store.resolver_for(schema)
+        self.schema = schema
+        self.validator_class = validator_class
+        self.resolver = resolver
+        # fields can be converted column by column, {key: type}
+        self.column_types = {}
+        self.fields = [
+            self._make_field(key, field_schema)
+            for key, field_schema in
+            (schema.get("properties") or {}).iteritems()
+        ]
+        if validate and validator is None:
+            validator = validator_class(schema, resolver=resolver)
+        self.validator = validator
+
+    def _make_field(self, key, field_schema):
+        """
+        :return: (key, converter, nested_plan, is_array)
+        """
+        field_type = _get_type(field_schema)
+        if field_type == "object" and "properties" in field_schema:
+            plan = FormPlan(
+                field_schema, self.validator_class, self.resolver,
+                validate=False,
+            )
+            return key, None, plan, False
+        # values of shared definitions are converted like their targets
+        field_type = _get_type(self._resolve_ref(field_schema))
+        if field_type in converter_map:
+            self.column_types[key] = field_type
+        return (
+            key, self._make_converter(field_schema), None,
+            field_type == "array",
+        )
+
+    def _resolve_ref(self, schema):
+        """
+        Follow the `$ref` of given schema.
+        :rtype: dict
+        """
+        while isinstance(schema.get("$ref"), basestring):
+            schema = self.resolver.resolve(schema["$ref"])[1]
+        return schema
+
+    def _make_converter(self, schema):
+        """
+        Make converter of values defined by given schema, array items and
+        object properties are converted too.
+        :rtype: callable or None
+        """
+        schema = self._resolve_ref(schema)
+        type_ = _get_type(schema)
+        if type_ == "object" and "properties" in schema:
+            plan = FormPlan(
+                schema, self.validator_class, self.resolver, validate=False,
+            )
+
+            def convert_object(value):
+                if isinstance(value, dict):
+                    return plan.filter(value)
+                return value
+            return convert_object
+
+        if type_ == "array" and isinstance(schema.get("items"), dict):
+            items = schema["items"]
+            items_type = _get_type(items)
+            if items_type in converter_map:
+                def convert_array(value):
+                    if isinstance(value, list):
+                        return convert_column(value, items_type)
+                    return value
+                return convert_array
+
+            convert_item = self._make_converter(items)
+            if convert_item is not None:
+                def convert_array(value):
+                    if isinstance(value, list):
+                        return [convert_item(item) for item in value]
+                    return value
+                return convert_array
+            return None
+
+        return converter_map.get(type_)
+
+    def run(self, data, fail_fast=False):
+        """
+        Filter, convert and validate given data.
+        :type data: dict
+        :param fail_fast: stop validation at the first error.
+        :return: (filtered_data, errors)
+        """
+        output = self.filter(data)
+        return output, self._errors(output, fail_fast)
+
+    def run_many(self, records, fail_fast=False):
+        """
+        Filter, convert and validate a list of records. Values of numeric
+        and boolean fields are converted column by column with
+        `convert_column`.
+        :type records: list
+        :param fail_fast: stop validation of a record at its first error.
+        :return: (filtered_data_list, errors_list)
+        """
+        rows = [dict(record) for record in records]
+        for key, type_ in self.column_types.iteritems():
+            positions = [
+                index for index, row in enumerate(rows)
+                if row.get(key) not in ("", None)
+            ]
+            values = convert_column(
+                [rows[index][key] for index in positions], type_
+            )
+            for index, value in zip(positions, values):
+                rows[index][key] = value
+
+        outputs = [self.filter(row, self.column_types) for row in rows]
+        return outputs, [
+            self._errors(output, fail_fast) for output in outputs
+        ]
+
+    def _errors(self, output, fail_fast):
+        if self.validator is None:
+            return []
+        errors = []
+        for error in self.validator.iter_errors(output):
+            errors.append(error)
+            if fail_fast:
+                break
+        return errors
+
+    def filter(self, data, converted=()):
+        """
+        Filter and convert given data without validation.
+        :type data: dict or werkzeug.datastructures.MultiDict
+        :param converted: keys whose values are already converted.
+        :rtype: dict
+        """
+        output = {}
+        # query string(werkzeug.MultiDict) may contain many values for a key
+        getlist = getattr(data, "getlist", None)
+        for key, converter, plan, is_array in self.fields:
+            if key not in data:
+                continue
+            if is_array and getlist is not None:
+                value = getlist(key)
+            else:
+                value = data[key]
+            if value in ("", None):
+                continue
+            if plan is not None and isinstance(value, dict):
+                output[key] = plan.filter(value)
+                continue
+            if converter is not None and key not in converted:
+                value = converter(value)
+            output[key] = value
+        return output
+
+
+_schema_trust = threading.local()
+_schema_trust_default = [False]
+
+
+def set_schemas_trusted(trusted):
+    """
+    Trust all the schemas and configs of this process(they are checked in
+    CI, etc), `SugarConfig` and `JsonForm` skip checking them then.
+    :type trusted: bool
+    """
+    _schema_trust_default[0] = bool(trusted)
+
+
+def schemas_trusted():
+    """
+    :rtype: bool
+    """
+    return getattr(_schema_trust, "trusted", _schema_trust_default[0])
+
+
+@contextmanager
+def trusted_schemas(trusted=True):
+    """
+    Trust(or not) the schemas and configs created in the block, in current
+    thread only.
+    """
+    old = getattr(_schema_trust, "trusted", None)
+    _schema_trust.trusted = bool(trusted)
+    try:
+        yield
+    finally:
+        if old is None:
+            del _schema_trust.trusted
+        else:
+            _schema_trust.trusted = old
+
+
+# (form class, id(live_schema)) -> (live_schema, merged, validator, plan)
+_merged_schemas = {}
+_MERGED_SCHEMAS_LIMIT = 1024
+# id(schema) -> (schema, plan) of forms created without a plan
+_form_plans = {}
+
+
+def _cached_plan(schema):
+    """
+    Get the plan of a schema used by forms directly, the schema is checked
+    and compiled only once, it should be treated as immutable.
+    :rtype: FormPlan
+    """
+    cached = _form_plans.get(id(schema))
+    # schema is kept in the entry, so its id can not be reused
+    if cached is not None and cached[0] is schema:
+        return cached[1]
+    if not schemas_trusted():
+        Draft4Validator.check_schema(schema)
+    plan = FormPlan(schema)
+    if len(_form_plans) >= _MERGED_SCHEMAS_LIMIT:
+        _form_plans.clear()
+    _form_plans[id(schema)] = (schema, plan)
+    return plan
+
+
+def _make_errors(error_iter, fail_fast=False):
+    """
+    :return: (error_msg, errors), errors is a dict like
+      {field: [error_detail, ]}, error_msg is None if no error.
+    """
+    error_msg = None
+    errors = defaultdict(list)
+    for error in error_iter:
+        if error_msg is None:
+            error_msg = str(error)
+        errors[
+            ".".join(str(path_part) for path_part in error.absolute_path)
+        ].append(error.message)
+        if fail_fast:
+            break
+    return error_msg, errors
+
+
 class JsonForm(object):
     """
     Form class that use JsonSchema to do wtforms-like validation.
@@ -92,21 +434,31 @@ class JsonForm(object):
     """
     schema = {}
 
-    def __init__(self, json_data, strict=False, live_schema=None):
+    def __init__(self, json_data, strict=False, live_schema=None,
+                 validator=None, fail_fast=False, plan=None):
         """
         Got Json data and validate it by given schema.
 
         :type json_data: dict
         :param strict: if strict is not True, the data will be handlered
-          by _filter_data function.It will remove unnecessary field(which
+          by the form plan.It will remove unnecessary field(which
           does not exist in schema) automatically before validation works.
         :param live_schema: if you haven't inherited JsonForm and overwrite
           the class property 'schema', you can pass and live_schema here to
           do the validation.
         :param try_convert: if True, json-form will try to convert given data to
           expected type. For example , convert "true" "1" to True, etc.
+        :param validator: an already checked and compiled validator for the
+          schema(see `SugarConfig.get_validator`), schema checking and
+          validator compiling will be skipped if it is given.
+        :param fail_fast: if True, validation stops at the first error, so
+          `errors` contains only one error.
+        :param plan: an already compiled `FormPlan` for the schema(see
+          `SugarConfig.get_plan`), used to filter and convert data in
+          non-strict mode.
         """
         self.live_schema = live_schema
+        self.fail_fast = fail_fast
         if not isinstance(json_data, dict):
             raise TypeError('json_data must be a dict.')
         if (not self.schema) and (live_schema is None):
@@ -115,58 +467,105 @@ class JsonForm(object):
             if not self.schema:
                 self.schema = live_schema
             else:
-                self.schema['properties'].update(live_schema['properties'])
-                if "required" in self.schema and "required" in live_schema:
-                    self.schema['required'] = list(
-                        set(self.schema['required']) |
-                        set(live_schema["required"])
-                    )
+                _, self.schema, merged_validator, merged_plan = \
+                    self._merge_schema(live_schema)
+                validator = validator or merged_validator
+                plan = plan or merged_plan
 
-        Draft4Validator.check_schema(self.schema)
+        if validator is None:
+            if plan is None:
+                plan = _cached_plan(self.schema)
+            validator = plan.validator
 
-        self.data = {}
+        self.validator = validator
+        self.errors = None
+        self.error_msg = None
         if not strict:
-            self._filter_data(json_data, self.schema['properties'], self.data)
+            if plan is None:
+                plan = _cached_plan(self.schema)
+            self.data = plan.filter(json_data)
         else:
             self.data = json_data
-        self.validator = Draft4Validator(self.schema)
-        self.errors = None
-        self.error_msg = None
+
+    @classmethod
+    def _merge_schema(cls, live_schema):
+        """
+        Merge the class schema with given live schema.
+        The merged schema, its validator and plan are computed only once for
+        each (form class, live schema) pair, the class schema is never
+        modified. Both schemas should be treated as immutable.
+        :rtype: tuple
+        :return: (live_schema, merged_schema, validator, plan)
+        """
+        key = (cls, id(live_schema))
+        merged = _merged_schemas.get(key)
+        # live_schema is kept in the entry, so its id can not be reused
+        if merged is not None and merged[0] is live_schema:
+            return merged
+
+        schema = dict(cls.schema)
+        schema['properties'] = dict(cls.schema['properties'])
+        schema['properties'].update(live_schema['properties'])
+        if "required" in cls.schema or "required" in live_schema:
+            schema['required'] = list(
+                set(cls.schema.get('required', ())) |
+                set(live_schema.get("required", ()))
+            )
+        if not schemas_trusted():
+            Draft4Validator.check_schema(schema)
+        plan = FormPlan(schema)
+        merged = (live_schema, schema, plan.validator, plan)
+        if len(_merged_schemas) >= _MERGED_SCHEMAS_LIMIT:
+            _merged_schemas.clear()
+        _merged_schemas[key] = merged
+        return merged
 
     def validate(self):
-        try:
-            self.validator.validate(self.data, self.schema)
+        """
+        Validate the data, all the errors are collected in one traversal.
+        If the form is in fail-fast mode, validation stops at the first error.
+        :rtype: bool
+        """
+        self.error_msg = None
+        self.errors = None
+        self.error_msg, errors = _make_errors(
+            self.validator.iter_errors(self.data), self.fail_fast
+        )
+        if self.error_msg is None:
             return True
-        except jsonschema.ValidationError as e:
-            self.error_msg = str(e)
-            self.errors = defaultdict(list)
-            for error in self.validator.iter_errors(self.data):
-                self.errors[
-                    ".".join(
-                        str(path_part) for path_part in error.absolute_path
-                    )
-                ].append(error.message)
-            return False
+        self.errors = errors
+        return False
 
-    def _filter_data(self, data, properties, output):
-        for key in data:
-            if data[key] in ("", None):
-                continue
-            if key in properties:
-                if "type" not in properties[key]:
-                    output[key] = data[key]
-                    continue
-                if properties[key]['type'].lower() == 'object':
-                    output[key] = {}
-                    self._filter_data(
-                        data[key], properties[key]['properties'],
-                        output[key]
-                    )
-                else:
-                    output[key] = convert_type(
-                        data[key],
-                        properties[key]['type']
-                    )
+    @classmethod
+    def validate_many(cls, records, live_schema=None, fail_fast=False,
+                      plan=None):
+        """
+        Validate a list of records against one compiled schema, in
+        non-strict mode.
+        :type records: list
+        :param plan: an already compiled `FormPlan` for the schema.
+        :return: (data_list, errors), errors is a dict like
+          {position: {field: [error_detail, ]}} of the invalid records.
+        """
+        for record in records:
+            if not isinstance(record, dict):
+                raise TypeError('records must be a list of dict.')
+        if plan is None:
+            if cls.schema and live_schema is not None:
+                plan = cls._merge_schema(live_schema)[3]
+            else:
+                schema = live_schema if live_schema is not None \
+                    else cls.schema
+                if not schema:
+                    raise NotImplementedError('schema not implemented!')
+                plan = _cached_plan(schema)
+
+        data_list, errors_list = plan.run_many(records, fail_fast)
+        errors = {}
+        for position, record_errors in enumerate(errors_list):
+            if record_errors:
+                errors[position] = _make_errors(record_errors, fail_fast)[1]
+        return data_list, errors
 
 # more adapter is required for "optional", "default", etc
 
@@ -192,6 +591,13 @@ def cli_arg_generator(arg_type):
     return ARG_CONV_MAP.get(arg_type, ARG_CONV_MAP['default'])
 
 
+# validation schema of operations without schema
+_DEFAULT_SCHEMA = {
+    "type": "object",
+    "properties": {},
+}
+
+
 class SugarConfig(object):
     _validation_schema = {
         "type": "object",
@@ -205,6 +611,13 @@ class SugarConfig(object):
             "version": {"type": "number"},
             "extra_actions": {"type": "object"},
             "out_fields": {"type": "object"},
+            "pagination": {
+                "type": "object",
+                "properties": {
+                    "limit": {"type": "integer", "minimum": 1},
+                    "max_limit": {"type": "integer", "minimum": 1},
+                },
+            },
         },
         "oneOf": [
             {"required": ['resources']},
@@ -227,38 +640,130 @@ class SugarConfig(object):
         "type": "array",
         "items": {"type": "string"},
     }
-
-    def __init__(self, config_dict):
+    # `schema_sugar.config_cache.ConfigCache`, configs recorded in it are
+    # not checked again
+    config_cache = None
+
+    __slots__ = (
+        "config", "validator_class", "trusted", "schema", "is_plural",
+        "resource_root", "resource_detail", "support_operations",
+        "extra_actions", "version", "cli_methods", "http_methods",
+        "pagination", "_out_fields", "_projectors", "_validation_schemas",
+        "_validators", "_plans",
+    )
+
+    def __init__(self, config_dict, validator_class=Draft4Validator,
+                 trusted=None, support_operations=None, extra_actions=None):
         """
+        The config is frozen, values used by requests are computed here
+        once, and given dict is copied, so nothing is shared with the caller.
         :type config_dict: dict
+        :param validator_class: class used to compile operation schemas,
+          `Draft4Validator` or `schema_sugar.compiler.CompiledValidator`.
+        :param trusted: skip checking the config and its schemas, defaults to
+          `schemas_trusted()`.
+        :param support_operations: operations implemented by the sugar,
+          defaults to `support_operations` of a dumped config.
+        :param extra_actions: {action_name: http_method} of the sugar.
         """
-        self.config = config_dict
-        if self.schema.get("extra_actions", None) is None:
-            self.config['extra_actions'] = {}
-        if self.config.get("out_fields", None) is None:
-            self.config['out_fields'] = {}
-        for operation_name in self.schema:
+        if trusted is None:
+            trusted = schemas_trusted()
+        config = copy.deepcopy(config_dict)
+        if config.get("extra_actions", None) is None:
+            config['extra_actions'] = {}
+        if config.get("out_fields", None) is None:
+            config['out_fields'] = {}
+        schema = config['schema']
+        for operation_name in schema:
             # TODO(winkidney): move support_operations to another place
             if operation_name != "support_operations":
-                if "properties" not in self.schema[operation_name]:
-                    self.schema[operation_name]['properties'] = {}
+                if "properties" not in schema[operation_name]:
+                    schema[operation_name]['properties'] = {}
+        page_config = config.get("pagination")
+        if page_config is not None:
+            if "resources" not in config:
+                raise ConfigError(
+                    "pagination requires plural `resources`, config is: %s"
+                    % config_dict
+                )
+            page_config = config["pagination"] = \
+                pagination.normalize(page_config)
+            index_schema = schema.setdefault(
+                INDEX_OP, {"type": "object", "properties": {}}
+            )
+            index_schema["properties"].update(
+                pagination.page_properties(page_config)
+            )
 
-        self._check_config(self.config)
+        if not trusted:
+            cache = self.config_cache
+            if cache is None or not cache.is_checked(type(self), config):
+                self._check_config(config)
+                if cache is not None:
+                    cache.add(type(self), config)
+
+        if support_operations is None:
+            support_operations = schema.get("support_operations") or ()
+        schema['support_operations'] = list(support_operations)
+        for action_name, http_method in (extra_actions or {}).iteritems():
+            config['extra_actions'][action_name] = {
+                "http_method": http_method,
+            }
+
+        is_plural = "resources" in config
+        name = config['resources'] if is_plural else config['resource']
+        init = super(SugarConfig, self).__setattr__
+        init("config", config)
+        init("validator_class", validator_class)
+        init("trusted", trusted)
+        init("schema", schema)
+        init("is_plural", is_plural)
+        init("resource_root", "/" + name)
+        init("resource_detail", {"is_singular": not is_plural, "name": name})
+        init("support_operations", tuple(support_operations))
+        init("extra_actions", config['extra_actions'])
+        init("version", config.get('version', 0))
+        init("pagination", page_config)
+        init("cli_methods", tuple(config.get('cli_methods', CLI2OP_MAP)))
+        init(
+            "http_methods",
+            tuple(config.get('http_methods', RESOURCES_HTTP2OP_MAP)),
+        )
+        init("_out_fields", dict(
+            (operation, frozenset(fields))
+            for operation, fields in config['out_fields'].iteritems()
+        ))
+        init("_projectors", dict(
+            (operation, Projector(fields))
+            for operation, fields in self._out_fields.iteritems()
+        ))
+        init("_validation_schemas", dict(
+            (operation, operation_schema)
+            for operation, operation_schema in schema.iteritems()
+            if operation != "support_operations"
+        ))
+        # compiled lazily, see `get_validator`
+        init("_validators", {})
+        init("_plans", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SugarConfig is frozen")
+
+    __delattr__ = __setattr__
 
     @classmethod
     def _check_config(cls, config_dict):
         try:
-            validator = Draft4Validator(cls._validation_schema)
+            validator, form_validator, out_fields_validator = \
+                cls._get_config_validators()
             validator.validate(config_dict)
 
             # check validation schema
-            form_validator = Draft4Validator(cls._form_schema)
             for key, method_schema in config_dict['schema'].iteritems():
                 # TODO(winkidney): move support_operations to another place
                 if key != "support_operations":
                     form_validator.validate(method_schema)
 
-            out_fields_validator = Draft4Validator(cls._out_fields_schema)
             for out_fields_obj in config_dict['out_fields'].values():
                 out_fields_validator.validate(out_fields_obj)
 
@@ -266,54 +771,44 @@ class SugarConfig(object):
             msg = "Syntax Error in your config_dict:\n" + str(e)
             raise ConfigError("%s\n Your config is: %s" % (msg, config_dict))
 
-    @property
-    def is_plural(self):
-        if "resources" in self.config:
-            return True
-        return False
+    @classmethod
+    def _get_config_validators(cls):
+        """
+        Validators of config, form and out_fields schemas, they are compiled
+        once for each config class.
+        :rtype: tuple
+        """
+        validators = cls.__dict__.get("_config_validators")
+        if validators is None:
+            validators = tuple(
+                Draft4Validator(schema)
+                for schema in (cls._validation_schema, cls._form_schema,
+                               cls._out_fields_schema)
+            )
+            cls._config_validators = validators
+        return validators
 
     def add_action(self, action_name, http_method):
+        """
+        Record an extra action, the sugar routes it by `extra_actions`,
+        see `SchemaSugarBase.add_action`.
+        """
         self.extra_actions[action_name] = {
             "http_method": http_method,
         }
 
     def get_out_fields(self, operation_name):
         """
-        :rtype : list or None
+        :rtype : frozenset or None
         """
-        return self.config['out_fields'].get(operation_name, None)
-
-    @property
-    def support_operations(self):
-        return self.schema.get("support_operations")
+        return self._out_fields.get(operation_name, None)
 
-    @property
-    def resource_root(self):
-        if self.config.get("resources"):
-            return "/" + self.config['resources']
-        else:
-            return "/" + self.config['resource']
-
-    @property
-    def resource_detail(self):
+    def get_projector(self, operation_name):
         """
-        Return resource type(Singular or  plurality)
-        :return: {"is_singular": True, "name": "resource_name"}
+        Get the compiled out fields of given operation.
+        :rtype: schema_sugar.projector.Projector or None
         """
-        if self.is_plural:
-            return {
-                "is_singular": False,
-                "name": self.config['resources']
-            }
-        else:
-            return {
-                "is_singular": True,
-                "name": self.config['resource']
-            }
-
-    @property
-    def schema(self):
-        return self.config['schema']
+        return self._projectors.get(operation_name, None)
 
     def get_validation_schema(self, operation):
         """
@@ -322,42 +817,86 @@ class SugarConfig(object):
         :type operation: str or unicode
         :rtype :dict
         """
-        return self.schema.get(
-            operation,
-            {
-                "type": "object",
-                "properties": {},
-            }
-        )
-
-    @property
-    def version(self):
-        return self.config.get('version', 0)
+        return self._validation_schemas.get(operation, _DEFAULT_SCHEMA)
 
-    @property
-    def extra_actions(self):
-        return self.config['extra_actions']
+    def get_validator(self, operation):
+        """
+        Get the compiled validator of given operation's validation schema.
+        The schema is checked and compiled only on first use, the validator
+        is cached and shared by all the later requests.
+        :type operation: str or unicode
+        :rtype: jsonschema.Draft4Validator
+        """
+        validator = self._validators.get(operation)
+        if validator is None:
+            schema = self.get_validation_schema(operation)
+            if not self.trusted:
+                self.validator_class.check_schema(schema)
+            validator = self.validator_class(
+                schema, resolver=schema_store.resolver_for(schema),
+            )
+            self._validators[operation] = validator
+        return validator
 
-    @property
-    def cli_methods(self):
-        return self.config.get('cli_methods', CLI2OP_MAP.keys())
+    def get_plan(self, operation):
+        """
+        Get the compiled filter-convert plan of given operation, it shares
+        the validator of `get_validator`.
+        The plan is compiled only on first use like `get_validator`.
+        :type operation: str or unicode
+        :rtype: FormPlan
+        """
+        plan = self._plans.get(operation)
+        if plan is None:
+            plan = FormPlan(
+                self.get_validation_schema(operation),
+                validator_class=self.validator_class,
+                validator=self.get_validator(operation),
+            )
+            self._plans[operation] = plan
+        return plan
 
-    @property
-    def http_methods(self):
-        return self.config.get('http_methods', RESOURCES_HTTP2OP_MAP.keys())
+    def get_items_plan(self, operation):
+        """
+        Get the compiled plan of given array operation schema's `items`,
+        which validates the elements of a streamed array one by one.
+        :type operation: str or unicode
+        :rtype: FormPlan
+        """
+        key = (operation, "items")
+        plan = self._plans.get(key)
+        if plan is None:
+            schema = self.get_validation_schema(operation)
+            if not self.trusted:
+                self.validator_class.check_schema(schema)
+            plan = FormPlan(
+                schema.get("items") or {"type": "object"},
+                validator_class=self.validator_class,
+                resolver=schema_store.resolver_for(schema),
+            )
+            self._plans[key] = plan
+        return plan
 
     @classmethod
-    def from_string(cls, config_string):
+    def from_string(cls, config_string, mimetype=JSON_MIMETYPE):
         """
         Create a new instance from given serialized schema string.
         :param config_string:
+        :param mimetype: format of the string, json or MessagePack.
         """
-        config = json.loads(config_string)
+        config = serialization.loads(config_string, mimetype)
         return cls(config)
 
     def dumps(self):
         return self.config
 
+    def to_string(self, mimetype=JSON_MIMETYPE):
+        """
+        Serialize the config, see `from_string`.
+        :rtype: str
+        """
+        return serialization.dumps(self.config, mimetype)
+
 
 def action(action_name, http_method=HTTP_GET):
     """
@@ -378,6 +917,36 @@ class SchemaSugarBase(object):
     Generate resource or blue print to web app and CLI app.
     """
     _default_operation = SHOW_OP
+    # set it to `schema_sugar.compiler.CompiledValidator` to validate
+    # requests by compiled python functions.
+    validator_class = Draft4Validator
+    # operations which stop validation at the first error, for endpoints
+    # whose callers don't need the full error map.
+    fail_fast_operations = ()
+    # set it to a positive number to memoize validated data of
+    # `validation_cache_operations` in a LRU cache keyed by the arguments,
+    # items expire after `validation_cache_ttl` seconds(None for never).
+    validation_cache_size = 0
+    validation_cache_ttl = None
+    # read operations whose validation only depends on the arguments
+    validation_cache_operations = (INDEX_OP, SHOW_OP)
+    # operations whose request body is a (maybe huge) json array, it's
+    # parsed incrementally and passed to the handler as a generator of
+    # validated elements, see `validate_stream`.
+    stream_operations = ()
+    # skip checking the config and schemas, None to follow
+    # `schemas_trusted()`
+    trust_schemas = None
+    # threads running the items of bulk requests of plural resources, see
+    # `bulk_result`.
+    bulk_max_workers = 8
+    # read operations answering conditional GETs by ETags, see
+    # `schema_sugar.etag` and `version`, the ETags made of versions of
+    # `etag_cache_size` requests are stored for `etag_ttl` seconds(None for
+    # ever) to skip the handler
+    etag_operations = ()
+    etag_cache_size = 1024
+    etag_ttl = None
 
     def __init__(self, config_dict=None):
         """
@@ -395,23 +964,103 @@ class SchemaSugarBase(object):
                 "config_dict can not be None,"
                 " expect dict, got %s" % config_dict
             )
-        self.config = SugarConfig(self.config_dict)
+        support_operations, extra_actions = self._collect_registry()
+        self.config = SugarConfig(
+            self.config_dict, validator_class=self.validator_class,
+            trusted=self.trust_schemas,
+            support_operations=support_operations,
+            extra_actions=extra_actions,
+        )
+        self.validation_cache = None
+        if self.validation_cache_size > 0:
+            self.validation_cache = LRUCache(
+                self.validation_cache_size, self.validation_cache_ttl
+            )
         self._make_registry()
-
-    def _make_registry(self):
-        # make extra action map
+        self.etag_store = None
+        if self.etag_operations:
+            self.etag_store = ETagStore(self.etag_cache_size, self.etag_ttl)
+        self.bulk_executor = None
+        if self.config.is_plural:
+            # threads are started by the first bulk request
+            self.bulk_executor = ThreadPoolExecutor(self.bulk_max_workers)
+
+    def _collect_registry(self):
+        """
+        Find the implemented operations and extra actions of the sugar.
+        :return: (support_operations, {action_name: http_method})
+        """
         operations = set(OPERATIONS)
-        self.config.schema['support_operations'] = []
+        support_operations = []
+        extra_actions = {}
         for name, method in \
                 inspect.getmembers(self, predicate=inspect.ismethod):
             if hasattr(method, "__is_action__"):
-                self.config.add_action(
-                    method.__action_name__,
-                    method.__http_method__,
-                )
+                extra_actions[method.__action_name__] = method.__http_method__
             if not is_abs_method(method):
                 if name in operations:
-                    self.config.schema['support_operations'].append(name)
+                    support_operations.append(name)
+        return support_operations, extra_actions
+
+    def _make_registry(self):
+        # compile validators at start up instead of the first request
+        self._routes = {}
+        for operation in OPERATIONS:
+            self._routes[operation] = self._make_route(operation)
+        for action_name in self.config.extra_actions:
+            self._routes[action_name] = self._make_route(action_name)
+        for operation in self.stream_operations:
+            self.config.get_items_plan(operation)
+
+        # (method, route kind) -> route, all the spellings accepted by
+        # `method2op` and `resources_method2op` are resolved here, so
+        # requests don't go through the conversion
+        self._dispatch = {}
+        aliases = [
+            (ROUTE_RESOURCE, operation, operation)
+            for operation in OPERATIONS
+        ]
+        aliases.extend(
+            (ROUTE_RESOURCE, method, operation)
+            for method, operation in
+            CLI2OP_MAP.items() + RESOURCE_HTTP2OP_MAP.items()
+        )
+        aliases.extend(
+            (ROUTE_RESOURCES, method, operation)
+            for method, operation in RESOURCES_HTTP2OP_MAP.items()
+        )
+        for kind, method, operation in aliases:
+            route = self._routes[operation]
+            self._dispatch[(method, kind)] = route
+            self._dispatch[(method.upper(), kind)] = route
+
+    def _make_route(self, operation):
+        """
+        Bind the handler, validator, plan and out fields of an operation.
+        :rtype: _Route
+        """
+        handler = getattr(self, operation, None)
+        if handler is None or is_abs_method(handler):
+            return _Route(
+                operation, None, None, None, None,
+                self.config.get_projector(operation),
+            )
+        return _Route(
+            operation,
+            handler,
+            self.config.get_validation_schema(operation),
+            self.config.get_validator(operation),
+            self.config.get_plan(operation),
+            self.config.get_projector(operation),
+        )
+
+    def add_action(self, action_name, http_method):
+        """
+        Add an extra action served by the method named `action_name`,
+        like the `action` decorator does for the sugar class.
+        """
+        self.config.add_action(action_name, http_method)
+        self._routes[action_name] = self._make_route(action_name)
 
     @abstractmethod
     def make_resources(self, *args, **kwargs):
@@ -446,58 +1095,453 @@ class SchemaSugarBase(object):
         pass
 
     def process(self, operation, data, web_request, **kwargs):
-        validate_schema = self.config.get_validation_schema(
-            operation)
-        processed_data = self.validate(validate_schema, data)
-        return getattr(self, operation)(processed_data, web_request, **kwargs)
+        processed_data = self.validate_operation(operation, data)
+        cursor = kwargs.get(CURSOR_PARAM)
+        if isinstance(cursor, Cursor):
+            cursor.load(processed_data)
+        route = self._routes.get(operation)
+        if route is None:
+            handler = getattr(self, operation)
+        else:
+            handler = route.handler
+        return handler(processed_data, web_request, **kwargs)
+
+    def validate_operation(self, operation, data):
+        """
+        Validate data of given operation with its cached validator and plan.
+        :type operation: str or unicode
+        :return: validated data
+        """
+        if operation in self.stream_operations:
+            return self.validate_stream(operation, data)
+
+        cache_key = None
+        if self.validation_cache is not None \
+                and operation in self.validation_cache_operations:
+            cache_key = _make_cache_key(operation, data)
+            if cache_key is not None:
+                processed_data = self.validation_cache.get(cache_key)
+                if processed_data is not None:
+                    # handler may change its data, nested values too
+                    return copy.deepcopy(processed_data)
+
+        route = self._routes.get(operation)
+        if route is None or route.handler is None:
+            route = _Route(
+                operation, None,
+                self.config.get_validation_schema(operation),
+                self.config.get_validator(operation),
+                self.config.get_plan(operation), None,
+            )
+        processed_data = self._validate_route(route, data)
+        if cache_key is not None:
+            self.validation_cache.set(cache_key, copy.deepcopy(processed_data))
+        return processed_data
 
     def crud_api(self, raw_method_name, data, web_request=None, **kwargs):
-        operation = method2op(raw_method_name)
-        return self._api_run(operation, data, web_request, **kwargs)
+        route = self._find_route(raw_method_name, ROUTE_RESOURCE)
+        return self._run_route(route, data, web_request, **kwargs)
 
     def resources_api(self, raw_method_name, data, web_request=None, **kwargs):
-        operation = resources_method2op(raw_method_name)
-        return self._api_run(operation, data, web_request, **kwargs)
+        route = self._find_route(raw_method_name, ROUTE_RESOURCES)
+        return self._run_route(route, data, web_request, **kwargs)
+
+    def bulk_api(self, raw_method_name, data, web_request=None, **kwargs):
+        """
+        Run the items of a bulk request, see `bulk_result`.
+        :param raw_method_name: not used, like the other `*_api`.
+        """
+        return self._respond(
+            self.bulk_result(data, web_request, **kwargs), web_request
+        )
+
+    def bulk_result(self, items, web_request=None, **kwargs):
+        """
+        Validate all the items of a bulk request first, then run the valid
+        ones by their handlers on `bulk_executor`.
+        :param items: list of dict like
+          {"operation": "update", "id": "1", "data": {...}}, operation is
+          one of `BULK_OPERATIONS`, id is required except for create.
+        :raise FormError: if items is not a list
+        :return: list of {"status": ..., "result": ...}, in the order of
+          items, status is a http status, failed items have `message`
+          (and `errors` if invalid) instead of `result`.
+        """
+        if not isinstance(items, list):
+            raise FormError(
+                None, "bulk request expects an array of items",
+                {"": ["%r is not of type 'array'" % (items, )]},
+            )
+        responses = [None] * len(items)
+        jobs = []
+        for index, item in enumerate(items):
+            try:
+                jobs.append(
+                    (index, self._prepare_bulk_item(item, web_request, kwargs))
+                )
+            except Exception as e:
+                responses[index] = _bulk_error(e)
+        futures = [
+            (index, self.submit_bulk_item(self._run_bulk_item, *job))
+            for index, job in jobs
+        ]
+        for index, future in futures:
+            responses[index] = future.result()
+        return responses
+
+    def _prepare_bulk_item(self, item, web_request, kwargs):
+        """
+        Validate an item of bulk request.
+        :return: (route, data, validated_data, web_request, kwargs, fields)
+          of the handler
+        """
+        if not isinstance(item, dict) \
+                or item.get("operation") not in BULK_OPERATIONS:
+            raise FormError(
+                None, "operation: expects one of %s" %
+                ", ".join(BULK_OPERATIONS),
+                {"operation": [
+                    "operation must be one of %s" % ", ".join(BULK_OPERATIONS)
+                ]},
+            )
+        route = self._routes[item["operation"]]
+        if route.handler is None:
+            raise MethodNotImplement(
+                "Operation `%s` not supported" % route.operation
+            )
+        kwargs = dict(kwargs)
+        if route.operation != CREATE_OP:
+            if item.get("id") is None:
+                raise FormError(
+                    None, "id: is required",
+                    {"id": ["'id' is a required property"]},
+                )
+            # like the id in url
+            kwargs["id"] = unicode(item["id"])
+        fields = kwargs.get(FIELDS_PARAM)
+        if fields is not None:
+            fields = kwargs[FIELDS_PARAM] = self.parse_fields(
+                route.operation, fields
+            )
+        data = self.pre_process(item.get("data") or {}, web_request, **kwargs)
+        validated = self.validate_operation(route.operation, data)
+        return route, data, validated, web_request, kwargs, fields
+
+    def submit_bulk_item(self, function, *args):
+        """
+        Submit an item of bulk request to `bulk_executor`, jars whose
+        `web_request` is bound to the request thread wrap function here.
+        :rtype: concurrent.futures.Future
+        """
+        return self.bulk_executor.submit(function, *args)
+
+    def _run_bulk_item(self, route, data, validated, web_request, kwargs,
+                       fields):
+        """
+        Run the item by `process` like the other requests, errors are
+        returned as the response of the item. The handler is called with
+        the validated data directly unless `process` is overridden.
+        :rtype: dict
+        """
+        try:
+            if type(self).process is not SchemaSugarBase.process:
+                result = self.process(
+                    route.operation, data, web_request, **kwargs
+                )
+            else:
+                result = route.handler(validated, web_request, **kwargs)
+            if isinstance(result, Future):
+                result = result.result()
+            if self.etag_store is not None:
+                self.etag_store.invalidate(kwargs.get("id"))
+            return {
+                "status": 200,
+                "result": self._filter_result(route, result, fields),
+            }
+        except Exception as e:
+            return _bulk_error(e)
 
     def action_api(self, raw_method_name):
         operation = raw_method_name
         return lambda passed_operation, data, web_request, **kwargs: \
             self._api_run(operation, data, web_request, **kwargs)
 
+    def future_api(self, raw_method_name, route_kind, data, web_request=None,
+                   **kwargs):
+        """
+        Like `crud_api`, `resources_api` and `action_api`, but never blocks
+        on handlers returning a `concurrent.futures.Future`.
+        :param raw_method_name: method name, or the action name for
+          `ROUTE_ACTION`.
+        :param route_kind: `ROUTE_RESOURCE`, `ROUTE_RESOURCES`,
+          `ROUTE_ACTION` or `ROUTE_BULK`.
+        :rtype: concurrent.futures.Future
+        """
+        return _chain_future(
+            self.future_result(
+                raw_method_name, route_kind, data, web_request, **kwargs
+            ),
+            lambda result: self._respond(result, web_request),
+        )
+
+    def future_result(self, raw_method_name, route_kind, data,
+                      web_request=None, **kwargs):
+        """
+        Like `future_api`, but the filtered result is not passed to
+        `web_response` or `cli_response`, for jars making responses
+        themselves.
+        :rtype: concurrent.futures.Future
+        """
+        try:
+            if route_kind == ROUTE_BULK:
+                result = self.bulk_result(data, web_request, **kwargs)
+            else:
+                route = self._find_route(raw_method_name, route_kind)
+                result = self._start_route(route, data, web_request, kwargs)
+        except Exception:
+            future = Future()
+            future.set_exception_info(*sys.exc_info()[1:])
+            return future
+        if isinstance(result, Future):
+            return result
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def _find_route(self, raw_method_name, route_kind):
+        """
+        :rtype: _Route
+        """
+        route = self._dispatch.get((raw_method_name, route_kind))
+        if route is not None:
+            return route
+        if route_kind == ROUTE_RESOURCE:
+            operation = method2op(raw_method_name)
+        elif route_kind == ROUTE_RESOURCES:
+            operation = resources_method2op(raw_method_name)
+        else:
+            operation = raw_method_name
+        route = self._routes.get(operation)
+        if route is None:
+            route = self._make_route(operation)
+        return route
+
     def _api_run(self, operation, data, web_request=None, **kwargs):
         """
         :param operation: in self.config.schema.keys()
            (index, create, show, delete, update, etc)
         """
-        data = self.pre_process(data, web_request, **kwargs)
-        if is_abs_method(getattr(self, operation)):
+        route = self._find_route(operation, ROUTE_ACTION)
+        return self._run_route(route, data, web_request, **kwargs)
+
+    def _run_route(self, route, data, web_request=None, **kwargs):
+        """
+        Run the route, waiting for the handler if it returns a future.
+        :type route: _Route
+        """
+        result = self._start_route(route, data, web_request, kwargs)
+        if isinstance(result, Future):
+            result = result.result()
+        return self._respond(result, web_request)
+
+    def _start_route(self, route, data, web_request, kwargs):
+        """
+        Validate the data and call the handler of route.
+        :type route: _Route
+        :return: the filtered result, or a future of it if the handler
+          returns a future, the output filter runs when the future is done
+          then.
+        """
+        if route.handler is None:
             raise MethodNotImplement(
-                "Operation `%s` not supported" % operation
+                "Operation `%s` not supported" % route.operation
+            )
+        fields = kwargs.get(FIELDS_PARAM)
+        if fields is not None:
+            # handler may skip loading the fields not requested
+            fields = kwargs[FIELDS_PARAM] = self.parse_fields(
+                route.operation, fields
+            )
+        cursor = None
+        if route.operation == INDEX_OP and self.config.pagination is not None:
+            # loaded from the validated data by `process`
+            cursor = kwargs[CURSOR_PARAM] = Cursor(
+                self.config.pagination["limit"]
+            )
+        data = self.pre_process(data, web_request, **kwargs)
+        tag = None
+        # checked after `pre_process`, which may reject the request
+        if web_request is not None and self.etag_store is not None \
+                and route.operation in self.etag_operations:
+            tag = self._check_etag(route, data, web_request, kwargs)
+            if isinstance(tag, NotModified):
+                return tag
+        result = self.process(route.operation, data, web_request, **kwargs)
+        if self.etag_store is not None \
+                and route.operation in WRITE_OPERATIONS:
+            self._invalidate_etags(result, kwargs.get("id"))
+        if isinstance(result, Future):
+            return _chain_future(
+                result,
+                lambda value: self._make_result(
+                    route, value, fields, cursor, web_request, tag
+                ),
+            )
+        return self._make_result(
+            route, result, fields, cursor, web_request, tag
+        )
+
+    def _make_result(self, route, result, fields, cursor, web_request, tag):
+        if cursor is not None:
+            if isinstance(result, Iterator):
+                # a page is bounded by its limit
+                result = list(result)
+            result = cursor.page(
+                self._filter_result(route, result, fields), web_request
             )
-        result = self.process(operation, data, web_request, **kwargs)
-        if isinstance(result, (dict, OrderedDict)):
-            result = self.out_filter(result, operation)
+        else:
+            result = self._filter_result(route, result, fields)
+        if tag is not None and isinstance(result, (dict, list)):
+            result = self._tag_result(result, tag, web_request)
+        return result
+
+    def _check_etag(self, route, data, web_request, kwargs):
+        """
+        The handler is skipped only if the `version` hook gives the ETag
+        stored for the request and no write of the sugar invalidated it
+        since, without a version the handler is called and the ETag is the
+        hash of its result.
+        :return: NotModified if the client has the current ETag, else
+          (key, resource_id, generation, etag) to tag the result, etag is
+          None if it's the hash of the result, or None if the request
+          can't be tagged.
+        """
+        resource_id = None
+        if route.operation != INDEX_OP:
+            resource_id = kwargs.get("id")
+        key = _make_cache_key(route.operation, data)
+        if key is None:
+            return None
+        key += (resource_id, kwargs.get(FIELDS_PARAM))
+        # taken before the handler, writes during the request invalidate
+        # the ETag stored after it
+        generation = self.etag_store.generation(resource_id)
+        version = self.version(route.operation, data, web_request, **kwargs)
+        if version is None:
+            return key, resource_id, generation, None
+        etag = make_etag(key, version)
+        if etag == self.etag_store.get(key, resource_id) and etag_matches(
+                web_request.headers.get("If-None-Match"), etag):
+            return NotModified(etag)
+        return key, resource_id, generation, etag
+
+    def _tag_result(self, result, tag, web_request):
+        key, resource_id, generation, etag = tag
+        body = None
+        if etag is None:
+            body = self.encode_json(result)
+            etag = make_etag(body)
+        else:
+            self.etag_store.set(key, etag, generation)
+        if etag_matches(web_request.headers.get("If-None-Match"), etag):
+            return NotModified(etag)
+        if body is None:
+            body = self.encode_json(result)
+        # the jars send the body, so it's the json the ETag is made of
+        return ETagged(result, etag, body)
+
+    def _invalidate_etags(self, result, resource_id):
+        """
+        Invalidate the stored ETags when the write succeeds.
+        """
+        if not isinstance(result, Future):
+            self.etag_store.invalidate(resource_id)
+            return
+
+        def done(future):
+            if future.exception() is None:
+                self.etag_store.invalidate(resource_id)
+        result.add_done_callback(done)
+
+    def _filter_result(self, route, result, fields):
+        if fields is not None:
+            if isinstance(result, (dict, list, Iterator)):
+                result = self.out_filter(result, route.operation, fields)
+        elif isinstance(result, dict) or (
+                route.projector is not None
+                and isinstance(result, (list, Iterator))):
+            result = self.out_filter(result, route.operation)
+        return result
+
+    def _respond(self, result, web_request):
         if web_request is not None:
             return self.web_response(result)
         else:
             return self.cli_response(result)
 
-    def out_filter(self, result, operation):
+    def parse_fields(self, operation, fields):
         """
-        :type result: dict
-        :type operation: str or unicode
-        :return: dict
+        Parse and check the sparse fieldset requested by client. Fields
+        must be covered by `out_fields` of the operation, or be the
+        properties of operation schema if there is no `out_fields`.
+        :param fields: comma separated dotted paths, or a list of them
+        :type fields: str or unicode or list
+        :raise FormError: if a field is not allowed
+        :rtype: frozenset
+        :return: None if no field is given(like `?fields=`), the
+          `out_fields` are kept then.
         """
-        out_dict = {}
-        out_fields = self.config.get_out_fields(operation)
-        if out_fields is None:
-            return result
+        if isinstance(fields, basestring):
+            fields = fields.split(",")
+        fields = frozenset(field.strip() for field in fields if field.strip())
+        if not fields:
+            return None
+        allowed = self.config.get_out_fields(operation)
+        if allowed is None:
+            properties = self.config.get_validation_schema(operation).get(
+                "properties"
+            )
+            allowed = frozenset(properties or ())
+        if allowed:
+            invalid = sorted(
+                field for field in fields
+                if not _is_covered(field, allowed)
+            )
+            if invalid:
+                raise FormError(
+                    None,
+                    "fields: %s not allowed" % ", ".join(invalid),
+                    {FIELDS_PARAM: [
+                        "%r is not an allowed field" % field
+                        for field in invalid
+                    ]},
+                )
+        return fields
 
-        out_fields = set(out_fields)
-        for key, value in result.items():
-            if key in out_fields:
-                out_dict[key] = value
-        return out_dict
+    def out_filter(self, result, operation, fields=None):
+        """
+        Keep only the `out_fields` of given operation, see
+        `schema_sugar.projector.Projector`.
+        :type result: dict or list or iterator
+        :type operation: str or unicode
+        :param fields: fields requested by client(see `parse_fields`),
+          instead of the `out_fields`.
+        :return: dict or list, or an iterator projecting the records of
+          an iterator result as they are consumed.
+        """
+        if fields is not None:
+            projector = Projector(fields)
+        else:
+            route = self._routes.get(operation)
+            if route is None:
+                projector = self.config.get_projector(operation)
+            else:
+                projector = route.projector
+            if projector is None:
+                return result
+        if isinstance(result, Iterator):
+            return imap(projector, result)
+        return projector(result)
 
     @staticmethod
     def validate(validate_schema, data):
@@ -507,18 +1551,202 @@ class SchemaSugarBase(object):
             raise FormError(form, form.error_msg, form.errors)
         return form.data
 
+    def _validate_route(self, route, data):
+        """
+        Validate data with the cached validator and plan of route, subclasses
+        overriding `validate` are still called by it.
+        :type route: _Route
+        """
+        if type(self).validate is not SchemaSugarBase.validate:
+            return self.validate(route.schema, data)
+        form = JsonForm(
+            data, live_schema=route.schema, validator=route.validator,
+            fail_fast=route.operation in self.fail_fast_operations,
+            plan=route.plan,
+        )
+        if not form.validate():
+            raise FormError(form, form.error_msg, form.errors)
+        return form.data
+
+    def validate_batch(self, operation, records):
+        """
+        Validate a list of records against given operation's schema,
+        the records share one compiled plan.
+        :type operation: str or unicode
+        :type records: list
+        :raise FormError: errors is a dict like
+          {position: {field: [error_detail, ]}}
+        :rtype: list
+        """
+        data_list, errors = JsonForm.validate_many(
+            records,
+            fail_fast=operation in self.fail_fast_operations,
+            plan=self.config.get_plan(operation),
+        )
+        if errors:
+            raise FormError(
+                None,
+                "%d of %d records are invalid" % (len(errors), len(records)),
+                errors,
+            )
+        return data_list
+
+    def validate_stream(self, operation, elements):
+        """
+        Validate elements of an array against given operation schema's
+        `items` one by one as they arrive.
+        :type operation: str or unicode
+        :param elements: iterable of elements(dict), it may raise
+          ValueError if the body is not a valid json array
+        :raise FormError: when an invalid element arrives, errors is a dict
+          like {"position.field": [error_detail, ]}
+        :return: generator of validated elements
+        """
+        plan = self.config.get_items_plan(operation)
+        fail_fast = operation in self.fail_fast_operations
+        elements = iter(elements)
+        position = 0
+        while True:
+            try:
+                element = next(elements)
+            except StopIteration:
+                return
+            except ValueError as e:
+                raise FormError(
+                    None, "Invalid json array: %s" % e, {"": [str(e)]},
+                )
+            if not isinstance(element, dict):
+                raise FormError(
+                    None,
+                    "Element %d is not an object" % position,
+                    {str(position): ["%r is not of type 'object'" % element]},
+                )
+            data, errors = plan.run(element, fail_fast)
+            if errors:
+                for error in errors:
+                    error.path.appendleft(position)
+                error_msg, errors = _make_errors(errors, fail_fast)
+                raise FormError(None, error_msg, errors)
+            yield data
+            position += 1
+
     def pre_process(self, data, web_request, **kwargs):
         return data
 
+    def version(self, operation, data, web_request, **kwargs):
+        """
+        Version of the resource read by an operation of `etag_operations`,
+        like its update time or revision, the ETag is made of it and the
+        handler is not called if the client has it and no write of the
+        sugar happened since.
+        :return: None if unknown, the handler is always called and the ETag
+          is the hash of the result then.
+        """
+        return None
+
+    def encode_json(self, value):
+        """
+        Encode a result as json, the body of the results tagged with ETags.
+        :rtype: str
+        """
+        return serialization.dumps(value)
+
     def get_doc(self, *args, **kwargs):
         return "This is the example doc data:\n" \
                + str(self.config.schema)
 
 
+def _chain_future(future, callback):
+    """
+    Make a future of `callback(future.result())`.
+    :type future: concurrent.futures.Future
+    :rtype: concurrent.futures.Future
+    """
+    chained = Future()
+
+    def done(finished):
+        try:
+            chained.set_result(callback(finished.result()))
+        except Exception:
+            chained.set_exception_info(*sys.exc_info()[1:])
+
+    future.add_done_callback(done)
+    return chained
+
+
+def _bulk_error(exception):
+    """
+    The response of a failed item of bulk request, call it in the except
+    clause.
+    :rtype: dict
+    """
+    if isinstance(exception, FormError):
+        return {
+            "status": 400,
+            "message": exception.error_msg,
+            "errors": exception.errors,
+        }
+    if isinstance(exception, MethodNotImplement):
+        return {"status": 501, "message": str(exception)}
+    logger.error("Exception on bulk item", exc_info=True)
+    return {"status": 500, "message": "Internal Server Error"}
+
+
+def _is_covered(field, allowed):
+    """
+    If the dotted path is one of the allowed paths or inside one of them.
+    """
+    parts = field.split(".")
+    return any(
+        ".".join(parts[:length]) in allowed
+        for length in range(1, len(parts) + 1)
+    )
+
+
+# handler is None if the operation is not implemented
+_Route = namedtuple(
+    "_Route",
+    ("operation", "handler", "schema", "validator", "plan", "projector"),
+)
+
+
+def _make_cache_key(operation, data):
+    """
+    Make a hashable key of the arguments, arguments order doesn't matter.
+    :type data: dict or werkzeug.datastructures.MultiDict
+    :return: None if the arguments are not hashable
+    """
+    if hasattr(data, "iterlists"):
+        items = [(key, tuple(values)) for key, values in data.iterlists()]
+    else:
+        items = data.items()
+    key = (operation, tuple(sorted(items)))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
 class SugarJarBase(object):
 
-    def __init__(self, name):
+    def __init__(self, name, trust_schemas=None):
+        """
+        :param trust_schemas: skip checking configs and schemas of the sugars
+          registered to this jar, None to follow `schemas_trusted()`.
+        """
         self.name = name
+        self.trust_schemas = trust_schemas
+
+    def make_sugar(self, schema_sugar_class, *args, **kwargs):
+        """
+        Create the sugar to register with the jar's `trust_schemas`.
+        :rtype: SchemaSugarBase
+        """
+        if self.trust_schemas is None:
+            return schema_sugar_class(*args, **kwargs)
+        with trusted_schemas(self.trust_schemas):
+            return schema_sugar_class(*args, **kwargs)
 
     @abstractmethod
     def run(self):
@@ -5,6 +5,7 @@ import json
 import logging
 import requests
 
+from schema_sugar import serialization
 from schema_sugar.client.config import ClientConfig
 from schema_sugar.client.constant import (
     DEFAULT_META_PATH,
@@ -30,7 +31,12 @@ class RestClient(object):
 
     def _fetch_meta(self, meta_path=DEFAULT_META_PATH):
         url = self.config.gen_url(meta_path)
-        response = requests.get(url)
+        response = requests.get(
+            url, headers={"Accept": serialization.accept_header()}
+        )
+        content_type = response.headers.get("Content-Type")
+        if content_type == serialization.MSGPACK_MIMETYPE:
+            return serialization.loads(response.content, content_type)
         return response.json()
 
     def send_request(
@@ -51,5 +57,23 @@ class RestClient(object):
             url, params=params, data=data, headers=headers
         )
 
+    def iter_pages(self, path, params=None, headers=None):
+        """
+        Iterate the records of a paginated index, following the `next`
+        links of pages, a page is fetched when the records before it are
+        consumed.
+        :raise requests.HTTPError: if a page is not fetched
+        """
+        while path is not None:
+            response = self.send_request(
+                path, "get", params=params, headers=headers
+            )
+            response.raise_for_status()
+            page = response.json()
+            for record in page["items"]:
+                yield record
+            # `next` carries the parameters of the first request
+            path, params = page.get("next"), None
+
     def before_request(self, method, params, data, headers):
         return method, params, data, headers
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # Copyright (c) 2013-2015, SMARTX
 # All rights reserved.
+from collections import Iterator
 import json
 import logging
 
@@ -66,11 +67,12 @@ def _mk_cmd_meta(sugar_config, prefix2ignore, prefix):
             "cmd_path": cmd_path,
             "raw_prefix": prefix,
             "is_singular": detail["is_singular"],
-            "operations": ['index', 'create']
+            "operations": ['index', 'create'],
+            "pagination": None,
         }
      ```
     """
-    operations = sugar_config.support_operations
+    operations = list(sugar_config.support_operations)
     detail = sugar_config.resource_detail
 
     handled_prefix = prefix.replace(prefix2ignore, "")
@@ -83,7 +85,8 @@ def _mk_cmd_meta(sugar_config, prefix2ignore, prefix):
         "is_singular": detail["is_singular"],
         "operations": operations,
         "name": detail['name'],
-        "operation_detail": sugar_config.schema
+        "operation_detail": sugar_config.schema,
+        "pagination": sugar_config.pagination,
     }
 
 
@@ -153,11 +156,13 @@ def _mk_request_json_body(data, schema):
 
 
 def _mk_cmd_func(
-    client, method, url, op_schema, headers=None,
+    client, method, url, op_schema, headers=None, paginated=False,
 ):
     """
     Make a cmd func that binds to a command.
     :type client: RestClient
+    :param paginated: the func returns an iterator of the records of all
+      pages instead of the response.
     """
     def request_func(**arguments):
         params, data = {}, {}
@@ -180,6 +185,10 @@ def _mk_cmd_func(
         else:
             data = _mk_request_json_body(args, op_schema)
 
+        if paginated:
+            return client.iter_pages(
+                formated_url, params, headers=headers or {}
+            )
         return client.send_request(
             formated_url, method, params, data, headers=headers or {}
         )
@@ -273,6 +282,9 @@ def add_operation_cmd(parent, meta, client):
             method=http_method,
             url=url,
             op_schema=operation_schema,
+            paginated=bool(
+                operation == INDEX_OP and meta.get("pagination")
+            ),
         )
 
         child = parent.add_cmd(cmd_name, help_msg, func=func)
@@ -413,6 +425,9 @@ def run_cmds(rest_client, prefix2ignore=None):
         add_operation_cmd(parent_node['cmd'], meta, rest_client)
 
     response = root_resource.run()
+    if isinstance(response, Iterator):
+        # records of all the pages of `list`, fetched as consumed
+        return response
     try:
         return response.json()
     except JSONDecodeError:
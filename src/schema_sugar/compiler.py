@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compile json-schema into plain python validation functions.
+
+The generated function does type, required, enum, pattern(and a few other
+simple keywords) checks inline, instead of walking the schema with the
+generic interpreter of jsonschema for each request. Errors are the same
+`ValidationError` objects(with the same order, message and path) that
+`Draft4Validator` yields, so `JsonForm` works with both of them.
+"""
+import numbers
+import re
+
+from jsonschema import Draft4Validator
+from jsonschema._utils import types_msg
+from jsonschema.compat import iteritems
+from jsonschema.exceptions import ValidationError
+
+__all__ = (
+    "CompiledValidator", "compile_schema",
+)
+
+_TYPE_CHECKS = {
+    "array": "isinstance(%(var)s, list)",
+    "boolean": "isinstance(%(var)s, bool)",
+    "integer": "(isinstance(%(var)s, (int, long))"
+               " and not isinstance(%(var)s, bool))",
+    "null": "%(var)s is None",
+    "number": "(isinstance(%(var)s, _Number)"
+              " and not isinstance(%(var)s, bool))",
+    "object": "isinstance(%(var)s, dict)",
+    "string": "isinstance(%(var)s, basestring)",
+}
+
+# keywords that never fail without a format checker or are just annotations
+_NOOP_KEYWORDS = ("format", )
+
+
+class CompileError(ValueError):
+    """
+    Raised when the schema uses a keyword the compiler does not support.
+    """
+    pass
+
+
+def _make_error(message, keyword, value, instance, schema, path,
+                schema_path):
+    return ValidationError(
+        message,
+        validator=keyword,
+        validator_value=value,
+        instance=instance,
+        schema=schema,
+        path=path,
+        schema_path=schema_path,
+    )
+
+
+class _SchemaCompiler(object):
+
+    def __init__(self):
+        self.lines = []
+        self.namespace = {
+            "_Number": numbers.Number,
+            "_types_msg": types_msg,
+            "_error": _make_error,
+        }
+        self._counter = 0
+
+    def _name(self, prefix):
+        self._counter += 1
+        return "%s%d" % (prefix, self._counter)
+
+    def _const(self, value, prefix="c"):
+        name = self._name(prefix)
+        self.namespace[name] = value
+        return name
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def emit_error(self, indent, message, keyword, schema_name, var, path,
+                   schema_path):
+        schema_path_name = self._const(tuple(schema_path), "sp")
+        self.emit(
+            indent,
+            "yield _error(%s, %r, %s[%r], %s, %s, %s, %s)" % (
+                message, keyword, schema_name, keyword, var,
+                schema_name, path, schema_path_name,
+            )
+        )
+
+    def compile(self, schema):
+        self.emit(0, "def validate(v0):")
+        self.compile_node(schema, "v0", "()", (), 1)
+        self.emit(1, "return")
+        self.emit(1, "yield")
+        code = "\n".join(self.lines)
+        exec(compile(code, "<compiled json-schema>", "exec"), self.namespace)
+        return self.namespace["validate"]
+
+    def compile_node(self, schema, var, path, schema_path, indent):
+        if not isinstance(schema, dict):
+            raise CompileError("schema must be a dict, got %r" % (schema, ))
+        if "$ref" in schema:
+            raise CompileError("$ref is not supported")
+        schema_name = self._const(schema, "s")
+        for keyword, value in iteritems(schema):
+            if keyword not in Draft4Validator.VALIDATORS \
+                    or keyword in _NOOP_KEYWORDS:
+                continue
+            handler = getattr(self, "_compile_" + keyword, None)
+            if handler is None:
+                raise CompileError("keyword %r is not supported" % keyword)
+            handler(
+                value, schema, schema_name, var, path,
+                schema_path + (keyword, ), indent,
+            )
+
+    def _compile_type(self, types, schema, schema_name, var, path,
+                      schema_path, indent):
+        if not isinstance(types, list):
+            types = [types]
+        checks = []
+        for type_ in types:
+            if type_ not in _TYPE_CHECKS:
+                raise CompileError("type %r is not supported" % (type_, ))
+            checks.append(_TYPE_CHECKS[type_] % {"var": var})
+        types_name = self._const(types)
+        self.emit(indent, "if not (%s):" % " or ".join(checks or ["False"]))
+        self.emit_error(
+            indent + 1, "_types_msg(%s, %s)" % (var, types_name),
+            "type", schema_name, var, path, schema_path,
+        )
+
+    def _compile_properties(self, properties, schema, schema_name, var, path,
+                            schema_path, indent):
+        self.emit(indent, "if isinstance(%s, dict):" % var)
+        self.emit(indent + 1, "pass")
+        for key, sub_schema in iteritems(properties):
+            sub_var = self._name("v")
+            key_name = self._const(key, "k")
+            self.emit(indent + 1, "if %s in %s:" % (key_name, var))
+            self.emit(indent + 2, "%s = %s[%s]" % (sub_var, var, key_name))
+            self.compile_node(
+                sub_schema, sub_var, "%s + (%s, )" % (path, key_name),
+                schema_path + (key, ), indent + 2,
+            )
+
+    def _compile_required(self, required, schema, schema_name, var, path,
+                          schema_path, indent):
+        self.emit(indent, "if isinstance(%s, dict):" % var)
+        self.emit(indent + 1, "pass")
+        for key in required:
+            key_name = self._const(key, "k")
+            message = self._const("%r is a required property" % key, "m")
+            self.emit(indent + 1, "if %s not in %s:" % (key_name, var))
+            self.emit_error(
+                indent + 2, message, "required", schema_name, var, path,
+                schema_path,
+            )
+
+    def _compile_enum(self, enums, schema, schema_name, var, path,
+                      schema_path, indent):
+        enums_name = self._const(enums, "e")
+        self.emit(indent, "if %s not in %s:" % (var, enums_name))
+        self.emit_error(
+            indent + 1, "'%%r is not one of %%r' %% (%s, %s)" % (
+                var, enums_name),
+            "enum", schema_name, var, path, schema_path,
+        )
+
+    def _compile_pattern(self, pattern, schema, schema_name, var, path,
+                         schema_path, indent):
+        regex_name = self._const(re.compile(pattern), "r")
+        self.emit(
+            indent,
+            "if isinstance(%s, basestring) and not %s.search(%s):" % (
+                var, regex_name, var)
+        )
+        self.emit_error(
+            indent + 1, "'%%r does not match %%r' %% (%s, %s.pattern)" % (
+                var, regex_name),
+            "pattern", schema_name, var, path, schema_path,
+        )
+
+    def _compile_items(self, items, schema, schema_name, var, path,
+                       schema_path, indent):
+        if not isinstance(items, dict):
+            raise CompileError("only single schema `items` is supported")
+        index_var = self._name("i")
+        item_var = self._name("v")
+        self.emit(indent, "if isinstance(%s, list):" % var)
+        self.emit(
+            indent + 1,
+            "for %s, %s in enumerate(%s):" % (index_var, item_var, var)
+        )
+        self.emit(indent + 2, "pass")
+        self.compile_node(
+            items, item_var, "%s + (%s, )" % (path, index_var),
+            schema_path, indent + 2,
+        )
+
+    def _compile_length(self, keyword, operator, word, limit, schema_name,
+                        var, path, schema_path, indent, type_check):
+        self.emit(
+            indent, "if %s and len(%s) %s %r:" % (
+                type_check % {"var": var}, var, operator, limit)
+        )
+        self.emit_error(
+            indent + 1, "'%%r is too %s' %% (%s, )" % (word, var),
+            keyword, schema_name, var, path, schema_path,
+        )
+
+    def _compile_minLength(self, limit, schema, schema_name, var, path,
+                           schema_path, indent):
+        self._compile_length(
+            "minLength", "<", "short", limit, schema_name, var, path,
+            schema_path, indent, _TYPE_CHECKS["string"],
+        )
+
+    def _compile_maxLength(self, limit, schema, schema_name, var, path,
+                           schema_path, indent):
+        self._compile_length(
+            "maxLength", ">", "long", limit, schema_name, var, path,
+            schema_path, indent, _TYPE_CHECKS["string"],
+        )
+
+    def _compile_minItems(self, limit, schema, schema_name, var, path,
+                          schema_path, indent):
+        self._compile_length(
+            "minItems", "<", "short", limit, schema_name, var, path,
+            schema_path, indent, _TYPE_CHECKS["array"],
+        )
+
+    def _compile_maxItems(self, limit, schema, schema_name, var, path,
+                          schema_path, indent):
+        self._compile_length(
+            "maxItems", ">", "long", limit, schema_name, var, path,
+            schema_path, indent, _TYPE_CHECKS["array"],
+        )
+
+    def _compile_range(self, keyword, operator, word, limit, schema_name,
+                       var, path, schema_path, indent):
+        limit_name = self._const(limit, "l")
+        self.emit(
+            indent, "if %s and %s %s %s:" % (
+                _TYPE_CHECKS["number"] % {"var": var}, var, operator,
+                limit_name)
+        )
+        self.emit_error(
+            indent + 1, "'%%r is %s the %s of %%r' %% (%s, %s)" % (
+                word, keyword, var, limit_name),
+            keyword, schema_name, var, path, schema_path,
+        )
+
+    def _compile_minimum(self, limit, schema, schema_name, var, path,
+                         schema_path, indent):
+        if schema.get("exclusiveMinimum", False):
+            operator, word = "<=", "less than or equal to"
+        else:
+            operator, word = "<", "less than"
+        self._compile_range(
+            "minimum", operator, word, limit, schema_name, var, path,
+            schema_path, indent,
+        )
+
+    def _compile_maximum(self, limit, schema, schema_name, var, path,
+                         schema_path, indent):
+        if schema.get("exclusiveMaximum", False):
+            operator, word = ">=", "greater than or equal to"
+        else:
+            operator, word = ">", "greater than"
+        self._compile_range(
+            "maximum", operator, word, limit, schema_name, var, path,
+            schema_path, indent,
+        )
+
+
+def compile_schema(schema):
+    """
+    Compile given json-schema into a generator function which yields
+    `ValidationError` for given instance just like
+    `Draft4Validator.iter_errors` does.
+    :type schema: dict
+    :raise CompileError: if the schema contains unsupported keywords
+    :rtype: callable
+    """
+    return _SchemaCompiler().compile(schema)
+
+
+class CompiledValidator(object):
+    """
+    A drop-in replacement of `Draft4Validator` which runs a compiled
+    validation function. Schemas the compiler can not handle fall back to
+    `Draft4Validator` silently.
+
+    Set `validator_class = CompiledValidator` on a `SchemaSugarBase`
+    subclass to enable it.
+    """
+
+    def __init__(self, schema, types=(), resolver=None, format_checker=None):
+        self.schema = schema
+        self._fallback = Draft4Validator(
+            schema, types=types, resolver=resolver,
+            format_checker=format_checker,
+        )
+        self._func = None
+        if not types and format_checker is None:
+            try:
+                self._func = compile_schema(schema)
+            except CompileError:
+                pass
+
+    @property
+    def is_compiled(self):
+        return self._func is not None
+
+    @staticmethod
+    def check_schema(schema):
+        Draft4Validator.check_schema(schema)
+
+    def iter_errors(self, instance, _schema=None):
+        if self._func is None \
+                or (_schema is not None and _schema is not self.schema
+                    and _schema != self.schema):
+            return self._fallback.iter_errors(instance, _schema)
+        return self._func(instance)
+
+    def validate(self, *args, **kwargs):
+        for error in self.iter_errors(*args, **kwargs):
+            raise error
+
+    def is_valid(self, instance, _schema=None):
+        error = next(self.iter_errors(instance, _schema), None)
+        return error is None
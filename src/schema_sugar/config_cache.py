@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+On-disk record of config dicts already checked by `SugarConfig`.
+
+Configs are keyed by the sha1 of their canonical json(with the schemas they
+are checked against), so an unchanged config skips `_check_config` on
+later starts, and any change of it is checked again.
+
+Enable it before the sugars are created:
+
+    SugarConfig.config_cache = ConfigCache("/var/cache/sugar-configs.json")
+
+and prebuild the file at deploy time:
+
+    sugar-config-cache /var/cache/sugar-configs.json my_app.resources
+"""
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+
+import click
+
+from schema_sugar import SchemaSugarBase, SugarConfig
+
+__all__ = (
+    "ConfigCache", "build_cache",
+)
+
+
+def config_digest(config_class, config_dict):
+    """
+    :type config_class: type
+    :type config_dict: dict
+    :rtype: str
+    """
+    content = json.dumps(
+        [
+            config_class._validation_schema,
+            config_class._form_schema,
+            config_class._out_fields_schema,
+            config_dict,
+        ],
+        sort_keys=True, default=repr,
+    )
+    return hashlib.sha1(content).hexdigest()
+
+
+class ConfigCache(object):
+
+    def __init__(self, path, autosave=True):
+        """
+        :param path: path of the cache file, created on first save.
+        :param autosave: save the file when a new config is added, disable it
+          and call `save` to write many configs at once.
+        """
+        self.path = path
+        self.autosave = autosave
+        self._lock = threading.Lock()
+        self._digests = None
+
+    @property
+    def digests(self):
+        if self._digests is None:
+            self._digests = self._load()
+        return self._digests
+
+    def _load(self):
+        try:
+            with open(self.path) as cache_fp:
+                return set(json.load(cache_fp)["digests"])
+        except (IOError, ValueError, KeyError, TypeError):
+            # missing or broken cache file, configs are just checked again
+            return set()
+
+    def is_checked(self, config_class, config_dict):
+        return config_digest(config_class, config_dict) in self.digests
+
+    def add(self, config_class, config_dict):
+        digest = config_digest(config_class, config_dict)
+        with self._lock:
+            if digest in self.digests:
+                return
+            self.digests.add(digest)
+        if self.autosave:
+            self.save()
+
+    def save(self):
+        """
+        Write the cache file atomically, digests in the file written by other
+        processes are kept.
+        """
+        with self._lock:
+            digests = self._load() | self.digests
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as tmp_fp:
+                json.dump({"digests": sorted(digests)}, tmp_fp, indent=0)
+            os.rename(tmp_path, self.path)
+            self._digests = digests
+
+
+def _iter_sugar_classes(module):
+    for _, member in inspect.getmembers(module, inspect.isclass):
+        if issubclass(member, SchemaSugarBase) \
+                and member.__module__ == module.__name__ \
+                and getattr(member, "config_dict", None) is not None:
+            yield member
+
+
+@click.command()
+@click.argument("path")
+@click.argument("modules", nargs=-1, required=True)
+def build_cache(path, modules):
+    """
+    Check the config of every sugar defined in given MODULES and record them
+    in the cache file at PATH.
+    """
+    cache = ConfigCache(path, autosave=False)
+    SugarConfig.config_cache = cache
+    try:
+        for module_name in modules:
+            module = importlib.import_module(module_name)
+            for sugar_class in _iter_sugar_classes(module):
+                # checked configs are added to the cache
+                SugarConfig(sugar_class.config_dict, trusted=False)
+                click.echo("%s.%s" % (module_name, sugar_class.__name__))
+    finally:
+        SugarConfig.config_cache = None
+    cache.save()
+    click.echo("%d configs recorded in %s" % (len(cache.digests), path))
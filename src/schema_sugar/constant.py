@@ -55,6 +55,25 @@ RESOURCES_HTTP2OP_MAP = {
     HTTP_GET: INDEX_OP,
 }
 
+# route kinds of a sugar, `/disks/<id>` and `/disks` for resources
+ROUTE_RESOURCE = "resource"
+ROUTE_RESOURCES = "resources"
+# routes of `@action`, looked up by the action name
+ROUTE_ACTION = "action"
+# bulk requests of plural resources, `/disks/_bulk`
+ROUTE_BULK = "bulk"
+BULK_URL = "_bulk"
+# operations changing resources
+WRITE_OPERATIONS = (CREATE_OP, UPDATE_OP, DELETE_OP)
+# operations allowed in the items of bulk requests
+BULK_OPERATIONS = WRITE_OPERATIONS
+
+# query string parameter of sparse fieldsets, like `?fields=id,owner.name`
+FIELDS_PARAM = "fields"
+# parameters of paginated index, see `schema_sugar.pagination`
+LIMIT_PARAM = "limit"
+CURSOR_PARAM = "cursor"
+
 
 def method2op(method_string):
     """
@@ -2,18 +2,30 @@
 # Copyright (c) 2013-2015, SMARTX
 # All rights reserved.
 
-from collections import namedtuple
+from collections import Iterator, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import time
+
 import flask
 from flask import (
     request,
     jsonify,
     Blueprint,
     Response,
+    stream_with_context,
 )
+from werkzeug.urls import iri_to_uri, url_unquote
 
-from schema_sugar import SugarJarBase, SchemaSugarBase, MethodNotImplement
-from schema_sugar.client.parser import _mk_url
-from schema_sugar.constant import RESOURCES_HTTP2OP_MAP, RESOURCE_HTTP2OP_MAP, OP2HTTP_MAP
+from schema_sugar import (
+    SchemaSugarBase, MethodNotImplement, FormError, serialization,
+)
+from schema_sugar.constant import ROUTE_RESOURCE, ROUTE_RESOURCES, ROUTE_BULK
+from schema_sugar.etag import ETagged, NotModified
+from schema_sugar.contrib.routing import (
+    ROUTE_META, RoutedJarBase, request_arguments, sugar_routes,
+)
 
 __all__ = (
     "FlaskSugar", "FlaskJar"
@@ -21,6 +33,16 @@ __all__ = (
 
 ResRule = namedtuple("UrlRule", ("url", "methods", "res_func"))
 
+BATCH_URL = "/_batch"
+BATCH_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+# environ of the batch request not passed to its sub-requests: its body,
+# uri and hop-by-hop headers, the sub-responses are always json
+_BATCH_SKIPPED_ENVIRON = frozenset((
+    "CONTENT_TYPE", "CONTENT_LENGTH", "HTTP_ACCEPT", "HTTP_TRANSFER_ENCODING",
+    "HTTP_CONNECTION", "HTTP_CONTENT_ENCODING", "HTTP_CONTENT_MD5",
+    "REQUEST_URI", "RAW_URI", "wsgi.input_terminated", "werkzeug.request",
+))
+
 
 class FlaskSugar(SchemaSugarBase):
 
@@ -33,14 +55,10 @@ class FlaskSugar(SchemaSugarBase):
         """
         rules = []
 
-        def make_resource(api_function):
+        def make_resource(api_function, route):
             def resource(**kwargs):
-                if request.method in ("POST", "PUT", "PATCH", "DELETE"):
-                    # TODO(winkidney): To improve. User should always
-                    # know if the  data is "request body" or just "query string"
-                    data = request.get_json(force=True, silent=True) or {}
-                else:
-                    data = request.args
+                data, api_kwargs = request_arguments(self, route, request)
+                kwargs.update(api_kwargs)
                 return api_function(
                     request.method, data,
                     web_request=request, **kwargs
@@ -51,86 +69,129 @@ class FlaskSugar(SchemaSugarBase):
                     resource = decorator(resource)
             return resource
 
-        if self.config.is_plural:
-            rules.append(
-                ResRule(
-                    url=self.config.resource_root,
-                    methods=[x.upper() for x in RESOURCES_HTTP2OP_MAP.keys()],
-                    res_func=make_resource(self.resources_api)
-                )
-            )
+        for route in sugar_routes(self):
+            if route.kind == ROUTE_META:
+                res_func = self.get_doc
+            elif route.kind == ROUTE_RESOURCES:
+                res_func = make_resource(self.resources_api, route)
+            elif route.kind == ROUTE_RESOURCE:
+                res_func = make_resource(self.crud_api, route)
+            elif route.kind == ROUTE_BULK:
+                res_func = make_resource(self.bulk_api, route)
+            else:
+                res_func = make_resource(self.action_api(route.name), route)
             rules.append(
-                ResRule(
-                    url=self.config.resource_root + "/<id>",
-                    methods=[x.upper() for x in RESOURCE_HTTP2OP_MAP.keys()],
-                    res_func=make_resource(self.crud_api)
-                )
-            )
-            for name, action in self.config.extra_actions.items():
-                rules.append(
-                    ResRule(
-                        url=self.config.resource_root + "/<id>/" + name,
-                        methods=(action['http_method'], ),
-                        res_func=make_resource(self.action_api(name)),
-                    )
-                )
-        else:
-            rules.append(
-                ResRule(
-                    url=self.config.resource_root,
-                    methods=[x.upper() for x in RESOURCE_HTTP2OP_MAP.keys()],
-                    res_func=make_resource(self.crud_api)
-                )
-            )
-            for name, action in self.config.extra_actions.items():
-                rules.append(
-                    ResRule(
-                        url=self.config.resource_root + "/" + name,
-                        methods=(action['http_method'], ),
-                        res_func=make_resource(self.action_api(name)),
-                    )
-                )
-
-        rules.append(
-            ResRule(
-                url=self.config.resource_root + "/meta",
-                methods=('GET', ), res_func=self.get_doc
+                ResRule(url=route.url, methods=route.methods,
+                        res_func=res_func)
             )
-        )
-
         return rules
 
     def web_response(self, result, http_code=200):
+        """
+        An iterator result(like the generator returned by a handler) is
+        streamed as a json array or NDJSON chosen by `Accept`, records are
+        filtered and serialized as they are sent, in the request context.
+        Results of `etag_operations` are sent with their ETags.
+        """
         if isinstance(result, Response):
             return result
+        if isinstance(result, NotModified):
+            return Response(status=304, headers={"ETag": result.etag})
+        if isinstance(result, ETagged):
+            if result.body is None:
+                response = jsonify(result.value)
+                response.status_code = http_code
+            else:
+                response = Response(
+                    result.body, status=http_code,
+                    mimetype=serialization.JSON_MIMETYPE,
+                )
+            response.headers["ETag"] = result.etag
+            return response
+        if isinstance(result, Iterator):
+            mimetype = serialization.best_stream_mimetype(
+                request.accept_mimetypes
+            )
+            # the records are encoded like `jsonify` does, by one encoder
+            chunks = serialization.iter_dumps(
+                result, mimetype, _app_json_encode()
+            )
+            return Response(
+                stream_with_context(chunks),
+                status=http_code, mimetype=mimetype,
+            )
         return jsonify(result), http_code
 
+    def encode_json(self, value):
+        """
+        Encode by the encoder of the current app like `jsonify`.
+        """
+        return _app_json_encode()(value)
 
-class FlaskJar(SugarJarBase):
-
-    def __init__(self, name, flask_app):
+    def submit_bulk_item(self, function, *args):
+        """
+        Items run in a copy of the request context, so handlers can read
+        `web_request` on the bulk threads.
+        """
+        if flask.has_request_context():
+            function = flask.copy_current_request_context(function)
+        return super(FlaskSugar, self).submit_bulk_item(function, *args)
+
+
+def _app_json_encode():
+    """
+    The encode function of `flask.json.dumps` with the encoder and json
+    settings of the current app, `flask.json.dumps` builds an encoder on
+    each call.
+    :return: function encoding a value as utf-8 json
+    """
+    kwargs = {"separators": (",", ":")}
+    flask.json._dump_arg_defaults(kwargs)
+    encode = kwargs.pop("cls")(**kwargs).encode
+
+    def encode_utf8(value):
+        body = encode(value)
+        if isinstance(body, unicode):
+            body = body.encode("utf-8")
+        return body
+    return encode_utf8
+
+
+class FlaskJar(RoutedJarBase):
+    # threads running the consecutive GET sub-requests of `/_batch`
+    batch_max_workers = 8
+
+    def __init__(self, name, flask_app, trust_schemas=None):
         """
         :type flask_app: flask.Flask
+        :param trust_schemas: see `SugarJarBase`
         """
-        super(FlaskJar, self).__init__(name)
-        self.registry = set()
-        self._registry = set()
+        super(FlaskJar, self).__init__(name, trust_schemas=trust_schemas)
         self.app = flask_app
         self.app.add_url_rule(
             "/meta", endpoint="site_map",
             view_func=self.sitemap_view
         )
+        # threads are started by the first batch request
+        self.batch_executor = ThreadPoolExecutor(self.batch_max_workers)
+        self.app.add_url_rule(
+            BATCH_URL, endpoint="batch",
+            view_func=self.batch_view, methods=["POST"],
+        )
 
         self.app.register_error_handler(
             MethodNotImplement, self.not_support_view
         )
-
-        self._sitemap = {}
+        self.app.register_error_handler(FormError, self.form_error_view)
 
     @staticmethod
     def not_support_view(exception):
         return str(exception), 501
 
+    def form_error_view(self, exception):
+        status, mimetype, body = self.error_response(exception)
+        return Response(body, status=status, mimetype=mimetype)
+
     def run(self, *args, **kwags):
         self.app.run(*args, **kwags)
 
@@ -162,14 +223,16 @@ class FlaskJar(SugarJarBase):
 
             def wrapper(schema_class):
                 self._register(
-                    schema_class(*args, **kwargs),
+                    self.make_sugar(schema_class, *args, **kwargs),
                     blue_print=blue_print,
                     decorators=decorators,
                 )
                 return schema_class
             return wrapper
         else:
-            return self._register(schema_sugar_class(), decorators=decorators)
+            return self._register(
+                self.make_sugar(schema_sugar_class), decorators=decorators
+            )
 
     @staticmethod
     def _get_end_point(url):
@@ -186,10 +249,8 @@ class FlaskJar(SugarJarBase):
         :type blue_print: Blueprint
         """
         schema_sugar = schema_sugar_instance
-        if str(schema_sugar.__class__) in self._registry:
+        if not self._claim(schema_sugar):
             return
-        self._registry.add(str(schema_sugar.__class__))
-        self.registry.add(schema_sugar)
 
         rules = schema_sugar.make_resources(decorators=decorators)
 
@@ -206,23 +267,7 @@ class FlaskJar(SugarJarBase):
                 methods=rule.methods,
                 view_func=rule.res_func,
             )
-        res_name = schema_sugar.config.resource_detail["name"]
-        is_singular = schema_sugar.config.resource_detail["is_singular"]
-        self._add2index(
-            url_prefix,
-            res_name,
-            schema_sugar.config.dumps(),
-            dict(
-                (
-                    op,
-                    {
-                        "url": _mk_url(res_name, url_prefix, is_singular, op),
-                        "method": OP2HTTP_MAP[op]
-                    }
-                ) for op in schema_sugar.config.support_operations
-            )
-        )
-
+        self._index_sugar(schema_sugar, url_prefix)
         return rules
 
     def has_no_empty_params(self, rule):
@@ -230,24 +275,140 @@ class FlaskJar(SugarJarBase):
         arguments = rule.arguments if rule.arguments is not None else ()
         return len(defaults) >= len(arguments)
 
-    def _add2index(self, prefix, resource_name, sugar_dump, rules):
+    def sitemap_view(self):
         """
-        Put the rule into the index.
+        The site map in json or MessagePack(chosen by `Accept` header), the
+        serialized payload is cached until next register.
         """
-        self._sitemap[self._get_key(prefix, resource_name)] = {
-            "name": resource_name,
-            "instance": sugar_dump,
-            "url_prefix": prefix,
-            "rules": rules
-        }
+        mimetype = serialization.best_mimetype(request.accept_mimetypes)
+        response = Response(self.sitemap_payload(mimetype), mimetype=mimetype)
+        response.vary.add("Accept")
+        return response
 
-    @staticmethod
-    def _get_key(prefix, resource_name):
+    def batch_view(self):
         """
-        Get index key for given resource
-        :rtype: str
+        Run a list of sub-requests like
+        {"method": "GET", "url": "/disks/1?fields=id", "body": {...}}
+        in process, through the url rules of the app. Consecutive GETs run
+        concurrently, a sub-request of other methods runs alone after the
+        previous ones are done.
+        The response is {"responses": [{"status": ..., "body": ...}],
+        "meta": {"elapsed_ms": ..., "timings": [{"started_ms": ...,
+        "elapsed_ms": ...}]}}, in the order of sub-requests.
         """
-        return "%s %s" % (prefix, resource_name)
+        sub_requests = request.get_json(force=True, silent=True)
+        _check_batch(sub_requests)
+        # sub-requests keep the client address, scheme, script root and
+        # headers of the batch request
+        environ = dict(
+            (key, value) for key, value in request.environ.iteritems()
+            if key not in _BATCH_SKIPPED_ENVIRON
+        )
+        start = time.time()
+
+        def run(sub_request):
+            return self._run_sub_request(sub_request, environ, start)
+
+        results = []
+        for group in _batch_groups(sub_requests):
+            if len(group) == 1:
+                results.append(run(group[0]))
+            else:
+                results.extend(self.batch_executor.map(run, group))
+        return jsonify({
+            "responses": [response for response, _ in results],
+            "meta": {
+                "elapsed_ms": _elapsed_ms(start),
+                "timings": [timing for _, timing in results],
+            },
+        })
+
+    def _run_sub_request(self, sub_request, batch_environ, batch_start):
+        """
+        :param batch_environ: environ of the batch request without the
+          `_BATCH_SKIPPED_ENVIRON` keys
+        :return: (response, timing) of the sub-request
+        """
+        method = sub_request.get("method", "GET").upper()
+        url = sub_request["url"]
+        body = sub_request.get("body")
+        path, _, query_string = iri_to_uri(url).partition("?")
+        environ = dict(batch_environ)
+        environ["REQUEST_METHOD"] = method
+        environ["PATH_INFO"] = url_unquote(path, charset=None)
+        environ["QUERY_STRING"] = query_string
+        data = ""
+        if body is not None:
+            data = json.dumps(body)
+            environ["CONTENT_TYPE"] = serialization.JSON_MIMETYPE
+        environ["CONTENT_LENGTH"] = str(len(data))
+        environ["wsgi.input"] = io.BytesIO(data)
+        started = time.time()
+        try:
+            with self.app.request_context(environ):
+                response = self.app.full_dispatch_request()
+            status = response.status_code
+            if response.is_json:
+                payload = response.get_json()
+            else:
+                payload = response.get_data(as_text=True)
+        except Exception:
+            self.app.logger.exception(
+                "Exception on batch sub-request %s %s", method, url,
+            )
+            status, payload = 500, "Internal Server Error"
+        timing = {
+            "started_ms": round((started - batch_start) * 1000, 3),
+            "elapsed_ms": _elapsed_ms(started),
+        }
+        return {"status": status, "body": payload}, timing
 
-    def sitemap_view(self):
-        return jsonify(self._sitemap)
+
+def _elapsed_ms(start):
+    return round((time.time() - start) * 1000, 3)
+
+
+def _check_batch(sub_requests):
+    """
+    :raise FormError: if the body of batch request is invalid
+    """
+    if not isinstance(sub_requests, list):
+        raise FormError(
+            None, "batch request expects an array of sub-requests",
+            {"": ["%r is not of type 'array'" % (sub_requests, )]},
+        )
+    errors = {}
+    for index, sub_request in enumerate(sub_requests):
+        if not isinstance(sub_request, dict) \
+                or not isinstance(sub_request.get("url"), basestring) \
+                or not sub_request["url"].startswith("/"):
+            errors[index] = ["'url' must be an absolute path"]
+        elif sub_request["url"].split("?")[0] == BATCH_URL:
+            errors[index] = ["batch requests can not be nested"]
+        elif sub_request.get("method", "GET").upper() not in BATCH_METHODS:
+            errors[index] = [
+                "'method' must be one of %s" % ", ".join(BATCH_METHODS)
+            ]
+    if errors:
+        raise FormError(
+            None,
+            "%d of %d sub-requests are invalid" %
+            (len(errors), len(sub_requests)),
+            errors,
+        )
+
+
+def _batch_groups(sub_requests):
+    """
+    Split sub-requests to the groups running one after another, a group
+    is consecutive GETs or a single write.
+    :rtype: list of list
+    """
+    groups = []
+    for sub_request in sub_requests:
+        is_read = sub_request.get("method", "GET").upper() == "GET"
+        if is_read and groups and groups[-1][0] is True:
+            groups[-1][1].append(sub_request)
+        else:
+            groups.append((is_read, [sub_request]))
+    return [group for _, group in groups]
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+A jar serving sugars without a web framework or a thread per request.
+
+Requests are handled by `FutureJar.handle`, which returns a future of the
+response at once. Handlers run on a bounded thread pool, a handler
+returning a `concurrent.futures.Future` gives its thread back right away
+and the response is made when its future is done, so requests waiting on
+other services hold no thread.
+
+The jar is embedded only, it has no server of its own(`run` does nothing):
+the program owning the connections calls `handle` for each request and
+writes the `JarResponse` back.
+
+    jar = FutureJar("disks", max_workers=16)
+    jar.register(DiskSugar)
+    response = jar.handle("GET", "/disks/1").result()
+"""
+from collections import Iterator, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import io
+import json
+import logging
+
+from werkzeug.datastructures import Headers, MIMEAccept
+from werkzeug.http import parse_accept_header
+from werkzeug.urls import url_decode
+
+from schema_sugar import serialization
+from schema_sugar.constant import ROUTE_ACTION
+from schema_sugar.contrib.routing import (
+    ROUTE_META, RouteTable, RoutedJarBase, request_arguments, etag_response,
+)
+
+__all__ = (
+    "FutureJar", "JarRequest", "JarResponse",
+)
+
+logger = logging.getLogger(__name__)
+
+# body is str, or an iterator of str chunks for streamed results
+JarResponse = namedtuple("JarResponse", ("status", "headers", "body"))
+
+
+class JarRequest(object):
+    """
+    The `web_request` passed to handlers, with the attributes of a flask
+    request the sugars use.
+    """
+
+    def __init__(self, method, path, query_string="", body="", headers=None):
+        self.method = method
+        self.path = path
+        self.args = url_decode(query_string)
+        self.headers = Headers(headers or ())
+        self.data = body
+        self.stream = io.BytesIO(body)
+
+    @property
+    def accept_mimetypes(self):
+        return parse_accept_header(self.headers.get("Accept"), MIMEAccept)
+
+    def get_json(self, force=False, silent=False):
+        try:
+            return json.loads(self.data)
+        except ValueError:
+            if silent:
+                return None
+            raise
+
+
+class FutureJar(RoutedJarBase):
+
+    def __init__(self, name, max_workers=16, trust_schemas=None):
+        """
+        :param max_workers: size of the thread pool running handlers.
+        :param trust_schemas: see `SugarJarBase`
+        """
+        super(FutureJar, self).__init__(name, trust_schemas=trust_schemas)
+        self.routes = RouteTable()
+        self.executor = ThreadPoolExecutor(max_workers)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait)
+
+    def register(self, schema_sugar_class=None, url_prefix=None, args=None,
+                 kwargs=None):
+        """
+        :param url_prefix: prefix of the urls, like a flask blue print's.
+        :param args: args passed to schema_sugar_class
+        :param kwargs: kwargs passed to schema_sugar_class
+        :type schema_sugar_class: schema_sugar.SchemaSugarBase
+        """
+        return self._make_sugars(
+            schema_sugar_class, args, kwargs,
+            lambda sugar: self._register(sugar, url_prefix),
+        )
+
+    def _register(self, schema_sugar, url_prefix=None):
+        if not self._claim(schema_sugar):
+            return
+        self.routes.add(schema_sugar, url_prefix)
+        self._index_sugar(schema_sugar, url_prefix or "/")
+        return schema_sugar
+
+    def handle(self, method, path, query_string="", body="", headers=None):
+        """
+        Handle a request.
+        :param headers: list of (name, value) or dict
+        :rtype: concurrent.futures.Future
+        :return: future of `JarResponse`
+        """
+        request = JarRequest(method.upper(), path, query_string, body, headers)
+        if request.path == "/meta" and request.method == "GET":
+            return _done(self.sitemap_response(request))
+        methods, url_kwargs = self.routes.match(request.path)
+        if methods is None:
+            return _done(_text_response(404, "Not Found"))
+        target = methods.get(request.method)
+        if target is None:
+            return _done(_text_response(405, "Method Not Allowed"))
+        sugar, route = target
+        if route.kind == ROUTE_META:
+            return _done(_text_response(200, sugar.get_doc()))
+
+        response = Future()
+
+        def result_done(result):
+            try:
+                response.set_result(self.make_response(result.result()))
+            except Exception as e:
+                response.set_result(self.exception_response(e))
+
+        def submitted(outer):
+            try:
+                outer.result().add_done_callback(result_done)
+            except Exception as e:
+                response.set_result(self.exception_response(e))
+
+        try:
+            data, kwargs = request_arguments(sugar, route, request)
+        except Exception as e:
+            return _done(self.exception_response(e))
+        kwargs.update(url_kwargs)
+        raw_method_name = request.method
+        if route.kind == ROUTE_ACTION:
+            raw_method_name = route.name
+        self.executor.submit(
+            sugar.future_result, raw_method_name, route.kind, data, request,
+            **kwargs
+        ).add_done_callback(submitted)
+        return response
+
+    def sitemap_response(self, request):
+        """
+        :type request: JarRequest
+        :rtype: JarResponse
+        """
+        mimetype = serialization.best_mimetype(request.accept_mimetypes)
+        return JarResponse(
+            200,
+            [("Content-Type", mimetype), ("Vary", "Accept")],
+            self.sitemap_payload(mimetype),
+        )
+
+    @staticmethod
+    def make_response(result):
+        """
+        Make the response of a handler's result.
+        :rtype: JarResponse
+        """
+        if isinstance(result, JarResponse):
+            return result
+        tagged = etag_response(result)
+        if tagged is not None:
+            return JarResponse(*tagged)
+        if isinstance(result, Iterator):
+            return JarResponse(
+                200,
+                [("Content-Type", serialization.JSON_MIMETYPE)],
+                serialization.iter_dumps(result),
+            )
+        return JarResponse(
+            200,
+            [("Content-Type", serialization.JSON_MIMETYPE)],
+            serialization.dumps(result),
+        )
+
+    def exception_response(self, exception):
+        """
+        :rtype: JarResponse
+        """
+        mapped = self.error_response(exception)
+        if mapped is None:
+            logger.error("Exception on request", exc_info=True)
+            return _text_response(500, "Internal Server Error")
+        status, mimetype, body = mapped
+        return JarResponse(status, [("Content-Type", mimetype)], body)
+
+
+def _text_response(status, text):
+    return JarResponse(status, [("Content-Type", "text/html")], text)
+
+
+def _done(response):
+    future = Future()
+    future.set_result(response)
+    return future
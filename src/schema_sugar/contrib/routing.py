@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Routes of sugars and the parts shared by the jars: the route table, the
+site map and the mapping of exceptions to responses.
+"""
+from collections import namedtuple
+import re
+
+from schema_sugar import (
+    SugarJarBase, SchemaSugarBase, MethodNotImplement, FormError,
+    serialization,
+)
+from schema_sugar.client.parser import _mk_url
+from schema_sugar.constant import (
+    RESOURCES_HTTP2OP_MAP, RESOURCE_HTTP2OP_MAP, OP2HTTP_MAP,
+    ROUTE_RESOURCE, ROUTE_RESOURCES, ROUTE_ACTION, ROUTE_BULK, BULK_URL,
+    BULK_OPERATIONS, FIELDS_PARAM,
+    method2op, resources_method2op,
+)
+from schema_sugar.etag import ETagged, NotModified
+from schema_sugar.utils import iter_json_array
+
+__all__ = (
+    "SugarRoute", "ROUTE_META", "sugar_routes", "route_operation",
+    "request_arguments", "etag_response", "RouteTable", "RoutedJarBase",
+)
+
+# the doc of a sugar, `/disks/meta`
+ROUTE_META = "meta"
+
+SugarRoute = namedtuple("SugarRoute", ("url", "methods", "kind", "name"))
+
+_URL_ARGUMENT = re.compile(r"<(\w+)>")
+
+
+def sugar_routes(sugar):
+    """
+    All the routes of a sugar, url arguments look like `<id>`.
+    :type sugar: schema_sugar.SchemaSugarBase
+    :rtype: list of SugarRoute
+    """
+    config = sugar.config
+    routes = []
+    if config.is_plural:
+        routes.append(SugarRoute(
+            config.resource_root,
+            [x.upper() for x in RESOURCES_HTTP2OP_MAP.keys()],
+            ROUTE_RESOURCES, None,
+        ))
+        if any(op in config.support_operations for op in BULK_OPERATIONS):
+            routes.append(SugarRoute(
+                config.resource_root + "/" + BULK_URL, ("POST", ),
+                ROUTE_BULK, None,
+            ))
+        routes.append(SugarRoute(
+            config.resource_root + "/<id>",
+            [x.upper() for x in RESOURCE_HTTP2OP_MAP.keys()],
+            ROUTE_RESOURCE, None,
+        ))
+        action_root = config.resource_root + "/<id>/"
+    else:
+        routes.append(SugarRoute(
+            config.resource_root,
+            [x.upper() for x in RESOURCE_HTTP2OP_MAP.keys()],
+            ROUTE_RESOURCE, None,
+        ))
+        action_root = config.resource_root + "/"
+    for name, action in config.extra_actions.items():
+        routes.append(SugarRoute(
+            action_root + name, (action['http_method'].upper(), ),
+            ROUTE_ACTION, name,
+        ))
+    routes.append(SugarRoute(
+        config.resource_root + "/meta", ("GET", ), ROUTE_META, None,
+    ))
+    return routes
+
+
+def route_operation(route, method):
+    """
+    :type route: SugarRoute
+    :rtype: str
+    """
+    if route.kind == ROUTE_RESOURCES:
+        return resources_method2op(method)
+    if route.kind == ROUTE_RESOURCE:
+        return method2op(method)
+    return route.name
+
+
+def request_arguments(sugar, route, request):
+    """
+    Get the data and keyword arguments of the api call from a request.
+    :param request: a flask request, or anything with `method`, `args`,
+      `stream` and `get_json` like it.
+    :return: (data, kwargs)
+    """
+    kwargs = {}
+    if request.method in ("POST", "PUT", "PATCH", "DELETE"):
+        if route_operation(route, request.method) in sugar.stream_operations:
+            # parse the json array body incrementally
+            data = iter_json_array(request.stream.read)
+        elif route.kind == ROUTE_BULK:
+            # an empty array is a valid bulk request
+            data = request.get_json(force=True, silent=True)
+        else:
+            # TODO(winkidney): To improve. User should always
+            # know if the  data is "request body" or just
+            # "query string"
+            data = request.get_json(force=True, silent=True) or {}
+    else:
+        data = request.args
+    fields = request.args.get(FIELDS_PARAM)
+    if fields is not None:
+        kwargs[FIELDS_PARAM] = fields
+    return data, kwargs
+
+
+def etag_response(result, encode=None):
+    """
+    The response of a result tagged by `schema_sugar.etag`.
+    :param encode: see `serialization.dumps`
+    :return: (status, headers, body), None if the result is not tagged
+    """
+    if isinstance(result, NotModified):
+        return 304, [("ETag", result.etag)], ""
+    if isinstance(result, ETagged):
+        body = result.body
+        if body is None:
+            body = serialization.dumps(result.value, encode=encode)
+        return (
+            200,
+            [("Content-Type", serialization.JSON_MIMETYPE),
+             ("ETag", result.etag)],
+            body,
+        )
+    return None
+
+
+def form_error_body(exception):
+    """
+    :type exception: FormError
+    :rtype: dict
+    """
+    return {"message": exception.error_msg, "errors": exception.errors}
+
+
+class RouteTable(object):
+    """
+    Precompiled routes of sugars, static urls are found by one dict lookup,
+    urls with arguments are matched by the regexes of the same depth only.
+    """
+
+    def __init__(self):
+        # url -> {METHOD: (sugar, route)}
+        self._static = {}
+        # url depth -> [(regex, {METHOD: (sugar, route)})]
+        self._dynamic = {}
+
+    def add(self, sugar, url_prefix=None):
+        """
+        Add all the routes of given sugar.
+        :type sugar: schema_sugar.SchemaSugarBase
+        :param url_prefix: prefix of the urls, like a flask blue print's.
+        """
+        for route in sugar_routes(sugar):
+            url = route.url
+            if url_prefix and url_prefix != "/":
+                url = url_prefix.rstrip("/") + url
+            if _URL_ARGUMENT.search(url) is None:
+                methods = self._static.setdefault(url, {})
+            else:
+                methods = self._add_pattern(url)
+            for method in route.methods:
+                methods[method] = (sugar, route)
+
+    def _add_pattern(self, url):
+        patterns = self._dynamic.setdefault(url.count("/"), [])
+        escaped = re.escape(url).replace("\\<", "<").replace("\\>", ">")
+        regex = re.compile(
+            "^%s$" % _URL_ARGUMENT.sub(r"(?P<\1>[^/]+)", escaped)
+        )
+        for known_regex, methods in patterns:
+            if known_regex.pattern == regex.pattern:
+                return methods
+        methods = {}
+        patterns.append((regex, methods))
+        return methods
+
+    def match(self, path):
+        """
+        :type path: str
+        :return: ({METHOD: (sugar, route)}, url_arguments), methods is None
+          if no route matches.
+        """
+        methods = self._static.get(path)
+        if methods is not None:
+            return methods, {}
+        for regex, methods in self._dynamic.get(path.count("/"), ()):
+            match = regex.match(path)
+            if match is not None:
+                return methods, match.groupdict()
+        return None, {}
+
+
+class RoutedJarBase(SugarJarBase):
+    """
+    Registry and site map of jars serving sugars themselves.
+    """
+
+    def __init__(self, name, trust_schemas=None):
+        super(RoutedJarBase, self).__init__(name, trust_schemas=trust_schemas)
+        self.registry = set()
+        self._registry = set()
+        self._sitemap = {}
+        # mimetype -> serialized site map, cleared on register
+        self._sitemap_payloads = {}
+
+    def _make_sugars(self, schema_sugar_class, args, kwargs, register):
+        """
+        Make the sugar of `register(sugar_class)` or the decorator of
+        `register(args=..., kwargs=...)`.
+        """
+        if schema_sugar_class is not None \
+                and not issubclass(schema_sugar_class, SchemaSugarBase):
+            raise TypeError(
+                "schema_sugar_class parameter expects %s, got %s" %
+                (SchemaSugarBase, schema_sugar_class)
+            )
+        if schema_sugar_class is None or args or kwargs:
+            args = args or []
+            kwargs = kwargs or {}
+
+            def wrapper(schema_class):
+                register(self.make_sugar(schema_class, *args, **kwargs))
+                return schema_class
+            return wrapper
+        return register(self.make_sugar(schema_sugar_class))
+
+    def _claim(self, schema_sugar):
+        """
+        Add the sugar to registry, False if its class is registered.
+        """
+        if str(schema_sugar.__class__) in self._registry:
+            return False
+        self._registry.add(str(schema_sugar.__class__))
+        self.registry.add(schema_sugar)
+        return True
+
+    def _index_sugar(self, schema_sugar, url_prefix):
+        res_name = schema_sugar.config.resource_detail["name"]
+        is_singular = schema_sugar.config.resource_detail["is_singular"]
+        self._add2index(
+            url_prefix,
+            res_name,
+            schema_sugar.config.dumps(),
+            dict(
+                (
+                    op,
+                    {
+                        "url": _mk_url(res_name, url_prefix, is_singular, op),
+                        "method": OP2HTTP_MAP[op]
+                    }
+                ) for op in schema_sugar.config.support_operations
+            )
+        )
+
+    def _add2index(self, prefix, resource_name, sugar_dump, rules):
+        """
+        Put the rule into the index.
+        """
+        self._sitemap[self._get_key(prefix, resource_name)] = {
+            "name": resource_name,
+            "instance": sugar_dump,
+            "url_prefix": prefix,
+            "rules": rules
+        }
+        self._sitemap_payloads.clear()
+
+    @staticmethod
+    def _get_key(prefix, resource_name):
+        """
+        Get index key for given resource
+        :rtype: str
+        """
+        return "%s %s" % (prefix, resource_name)
+
+    def sitemap_payload(self, mimetype):
+        """
+        The serialized site map, cached until next register.
+        :rtype: str
+        """
+        payload = self._sitemap_payloads.get(mimetype)
+        if payload is None:
+            payload = serialization.dumps(self._sitemap, mimetype)
+            self._sitemap_payloads[mimetype] = payload
+        return payload
+
+    @staticmethod
+    def error_response(exception):
+        """
+        Map the known exceptions of sugars to responses.
+        :return: (status, mimetype, body), None for unknown exceptions
+        """
+        if isinstance(exception, MethodNotImplement):
+            return 501, "text/html", str(exception)
+        if isinstance(exception, FormError):
+            return (
+                400, serialization.JSON_MIMETYPE,
+                serialization.dumps(form_error_body(exception)),
+            )
+        return None
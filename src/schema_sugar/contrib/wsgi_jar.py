@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+A jar which is a plain WSGI application.
+
+It serves the same urls as `FlaskJar`, without the request context,
+werkzeug routing and `jsonify` of flask: routes are looked up in a
+precompiled `RouteTable` and results are dumped by a compact json
+encoder, `serialization.JSONEncoder` by default, which encodes the values
+flask's encoder does.
+
+    jar = WsgiJar("disks")
+    jar.register(DiskSugar)
+    application = jar
+"""
+from collections import Iterator
+import json
+import logging
+
+from werkzeug.datastructures import EnvironHeaders, MIMEAccept
+from werkzeug.http import HTTP_STATUS_CODES, parse_accept_header
+from werkzeug.urls import url_decode
+from werkzeug.wsgi import get_input_stream
+
+from schema_sugar import serialization
+from schema_sugar.constant import ROUTE_ACTION
+from schema_sugar.contrib.routing import (
+    ROUTE_META, RouteTable, RoutedJarBase, request_arguments, etag_response,
+)
+
+__all__ = (
+    "WsgiJar", "WsgiRequest",
+)
+
+logger = logging.getLogger(__name__)
+
+_TEXT_HEADERS = [("Content-Type", "text/html; charset=utf-8")]
+
+
+class WsgiRequest(object):
+    """
+    The `web_request` passed to handlers, with the attributes of a flask
+    request the sugars use, parsed only when used.
+    """
+
+    def __init__(self, environ):
+        self.environ = environ
+        self.method = environ["REQUEST_METHOD"].upper()
+        self.path = environ.get("PATH_INFO") or "/"
+        self._args = None
+        self._data = None
+
+    @property
+    def args(self):
+        if self._args is None:
+            self._args = url_decode(self.environ.get("QUERY_STRING", ""))
+        return self._args
+
+    @property
+    def headers(self):
+        return EnvironHeaders(self.environ)
+
+    @property
+    def stream(self):
+        return get_input_stream(self.environ)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.stream.read()
+        return self._data
+
+    @property
+    def accept_mimetypes(self):
+        return parse_accept_header(self.environ.get("HTTP_ACCEPT"), MIMEAccept)
+
+    def get_json(self, force=False, silent=False):
+        try:
+            return json.loads(self.data)
+        except ValueError:
+            if silent:
+                return None
+            raise
+
+
+class WsgiJar(RoutedJarBase):
+    # encoder class of the results, like `flask.Flask.json_encoder`
+    json_encoder = serialization.JSONEncoder
+
+    def __init__(self, name, trust_schemas=None, json_encoder=None):
+        """
+        :param trust_schemas: see `SugarJarBase`
+        :param json_encoder: encoder class of the results, defaults to
+          `json_encoder` of the jar class.
+        """
+        super(WsgiJar, self).__init__(name, trust_schemas=trust_schemas)
+        self.routes = RouteTable()
+        if json_encoder is not None:
+            self.json_encoder = json_encoder
+        self.json_encode = serialization.json_encode(self.json_encoder)
+
+    def run(self, host="127.0.0.1", port=5000):
+        from wsgiref.simple_server import make_server
+        make_server(host, port, self).serve_forever()
+
+    def register(self, schema_sugar_class=None, url_prefix=None, args=None,
+                 kwargs=None):
+        """
+        :param url_prefix: prefix of the urls, like a flask blue print's.
+        :param args: args passed to schema_sugar_class
+        :param kwargs: kwargs passed to schema_sugar_class
+        :type schema_sugar_class: schema_sugar.SchemaSugarBase
+        """
+        return self._make_sugars(
+            schema_sugar_class, args, kwargs,
+            lambda sugar: self._register(sugar, url_prefix),
+        )
+
+    def _register(self, schema_sugar, url_prefix=None):
+        if not self._claim(schema_sugar):
+            return
+        self.routes.add(schema_sugar, url_prefix)
+        self._index_sugar(schema_sugar, url_prefix or "/")
+        return schema_sugar
+
+    def __call__(self, environ, start_response):
+        request = WsgiRequest(environ)
+        status, headers, body = self.dispatch(request)
+        status = "%d %s" % (status, HTTP_STATUS_CODES.get(status, "UNKNOWN"))
+        if isinstance(body, Iterator):
+            # streamed without Content-Length
+            start_response(status, headers)
+            if request.method == "HEAD":
+                return []
+            return body
+        if isinstance(body, unicode):
+            body = body.encode("utf-8")
+        start_response(
+            status, headers + [("Content-Length", str(len(body)))],
+        )
+        if request.method == "HEAD":
+            return []
+        return [body]
+
+    def dispatch(self, request):
+        """
+        :type request: WsgiRequest
+        :return: (status, headers, body)
+        """
+        method = request.method
+        if method == "HEAD":
+            method = "GET"
+        if request.path == "/meta" and method == "GET":
+            return self.sitemap_response(request)
+        methods, url_kwargs = self.routes.match(request.path)
+        if methods is None:
+            return 404, _TEXT_HEADERS, "Not Found"
+        target = methods.get(method)
+        if target is None:
+            return (
+                405, _TEXT_HEADERS + [("Allow", ", ".join(sorted(methods)))],
+                "Method Not Allowed",
+            )
+        sugar, route = target
+        if route.kind == ROUTE_META:
+            return 200, _TEXT_HEADERS, sugar.get_doc()
+        raw_method_name = method
+        if route.kind == ROUTE_ACTION:
+            raw_method_name = route.name
+        try:
+            data, kwargs = request_arguments(sugar, route, request)
+            kwargs.update(url_kwargs)
+            result = sugar.future_result(
+                raw_method_name, route.kind, data, request, **kwargs
+            ).result()
+            tagged = etag_response(result, self.json_encode)
+            if tagged is not None:
+                return tagged
+            if isinstance(result, Iterator):
+                mimetype = serialization.best_stream_mimetype(
+                    request.accept_mimetypes
+                )
+                return (
+                    200, [("Content-Type", mimetype)],
+                    serialization.iter_dumps(
+                        result, mimetype, self.json_encode
+                    ),
+                )
+            body = serialization.dumps(result, encode=self.json_encode)
+        except Exception as e:
+            mapped = self.error_response(e)
+            if mapped is None:
+                logger.error("Exception on %s %s", method, request.path,
+                             exc_info=True)
+                return 500, _TEXT_HEADERS, "Internal Server Error"
+            status, mimetype, body = mapped
+            return status, [("Content-Type", mimetype)], body
+        return 200, [("Content-Type", serialization.JSON_MIMETYPE)], body
+
+    def sitemap_response(self, request):
+        """
+        :type request: WsgiRequest
+        :return: (status, headers, body)
+        """
+        mimetype = serialization.best_mimetype(request.accept_mimetypes)
+        return (
+            200,
+            [("Content-Type", mimetype), ("Vary", "Accept")],
+            self.sitemap_payload(mimetype),
+        )
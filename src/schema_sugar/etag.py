@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+ETags and conditional GETs of sugars, see `SchemaSugarBase.etag_operations`.
+
+The ETag of a response is made of the `version` hook of the sugar if it
+returns one, else it's the hash of the serialized body, a request whose
+`If-None-Match` matches it is answered by `NotModified` without the body.
+ETags made of versions are remembered in an `ETagStore`, a request
+matching the stored ETag is answered without calling the handler.
+Successful writes of the sugar(create, update, delete) invalidate the
+stored ETags of the record written and of the index.
+"""
+from collections import namedtuple
+import hashlib
+import threading
+
+from schema_sugar.utils import LRUCache
+
+__all__ = (
+    "ETagged", "NotModified", "ETagStore", "make_etag", "etag_matches",
+)
+
+# a result and its ETag, body is the serialized json result if the ETag
+# is the hash of it, so it's not serialized again
+ETagged = namedtuple("ETagged", ("value", "etag", "body"))
+# the response of a matched `If-None-Match`
+NotModified = namedtuple("NotModified", ("etag", ))
+
+# generation key of the index of resources
+_COLLECTION = ("collection", )
+
+
+def make_etag(*parts):
+    """
+    :rtype: str
+    """
+    return '"%s"' % hashlib.sha1(repr(parts)).hexdigest()[:32]
+
+
+def etag_matches(if_none_match, etag):
+    """
+    :param if_none_match: value of `If-None-Match` header, like
+      `"a", W/"b"` or `*`
+    :rtype: bool
+    """
+    if not if_none_match or etag is None:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ETagStore(object):
+    """
+    ETags sent by a sugar, keyed by the arguments of requests.
+    Every record has a generation bumped by writes, a stored ETag is
+    valid only while the generation of its record is unchanged, so
+    invalidation doesn't walk the stored ETags. Generations of the `size`
+    records written last are kept, records evicted are treated as bumped.
+    """
+
+    def __init__(self, size=1024, ttl=None):
+        """
+        :param size: max count of stored ETags and of record generations
+        :param ttl: seconds an ETag is trusted without calling the handler,
+          None means forever.
+        """
+        self._etags = LRUCache(size, ttl)
+        self._generations = LRUCache(size)
+        # generation of the records not in `_generations`, bumped when one
+        # is evicted, generations are unique in the store
+        self._floor = 0
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def generation(self, resource_id=None):
+        """
+        :param resource_id: id of the record, None for the index
+        """
+        if resource_id is None:
+            resource_id = _COLLECTION
+        return self._generations.get(resource_id, self._floor)
+
+    def get(self, key, resource_id=None):
+        """
+        :return: the valid ETag stored, or None
+        """
+        item = self._etags.get(key)
+        if item is None or item[1] != self.generation(resource_id):
+            return None
+        return item[0]
+
+    def set(self, key, etag, generation):
+        """
+        :param generation: the generation of the record before the handler
+          was called, so writes during the request invalidate the ETag.
+        """
+        self._etags.set(key, (etag, generation))
+
+    def invalidate(self, resource_id=None):
+        """
+        Invalidate the ETags of a record and the index.
+        :param resource_id: id of the record written, None if the index is
+          changed only(by create).
+        """
+        with self._lock:
+            for key in (resource_id, _COLLECTION):
+                if key is None:
+                    continue
+                if self._generations.get(key) is None \
+                        and len(self._generations) >= self._generations.size:
+                    # the least recently used record will be evicted
+                    self._last += 1
+                    self._floor = self._last
+                self._last += 1
+                self._generations.set(key, self._last)
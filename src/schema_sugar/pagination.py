@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Cursor based pagination of `index`.
+
+A plural sugar whose config has `pagination` gets `limit` and `cursor` in
+its index schema. Its index handler receives a `Cursor` as the keyword
+argument `cursor`, returns the records of the page and tells where the
+next page starts:
+
+    def index(self, data, web_request, cursor, **kwargs):
+        disks = load_disks(after=cursor.position, count=cursor.limit + 1)
+        if len(disks) > cursor.limit:
+            disks = disks[:cursor.limit]
+            cursor.set_next(disks[-1]["id"])
+        return disks
+
+The response is {"items": [...], "cursor": ..., "next": ...}, `cursor` is
+the opaque token of next page and `next` is its url, both are None on the
+last page.
+"""
+import base64
+import json
+import urllib
+
+from schema_sugar.constant import LIMIT_PARAM, CURSOR_PARAM
+from schema_sugar.exceptions import FormError
+
+__all__ = (
+    "DEFAULT_LIMIT", "DEFAULT_MAX_LIMIT", "Cursor", "normalize",
+    "page_properties", "encode_cursor", "decode_cursor",
+)
+
+DEFAULT_LIMIT = 20
+DEFAULT_MAX_LIMIT = 1000
+
+
+def normalize(pagination):
+    """
+    Fill the defaults of the `pagination` of a config.
+    :type pagination: dict
+    :rtype: dict
+    """
+    pagination = dict(pagination)
+    pagination.setdefault("max_limit", DEFAULT_MAX_LIMIT)
+    pagination.setdefault(
+        "limit", min(DEFAULT_LIMIT, pagination["max_limit"])
+    )
+    return pagination
+
+
+def page_properties(pagination):
+    """
+    Properties added to the index schema.
+    :param pagination: normalized `pagination` of a config
+    :rtype: dict
+    """
+    return {
+        LIMIT_PARAM: {
+            "type": "integer",
+            "minimum": 1,
+            "maximum": pagination["max_limit"],
+            "help": "records per page, %d by default" % pagination["limit"],
+        },
+        CURSOR_PARAM: {
+            "type": "string",
+            "help": "where the page starts, from the last page",
+        },
+    }
+
+
+def encode_cursor(position):
+    """
+    :param position: json serializable position of a page
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps(position, separators=(",", ":"))
+    ).rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    :type token: str or unicode
+    :raise ValueError: if the token is invalid
+    """
+    try:
+        token = str(token)
+        return json.loads(
+            base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        )
+    except (TypeError, UnicodeError):
+        raise ValueError("invalid cursor %r" % token)
+
+
+def _utf8(value):
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    return str(value)
+
+
+class Cursor(object):
+    """
+    The page of an index request.
+    """
+
+    def __init__(self, limit, position=None):
+        """
+        :param limit: max count of records in the page
+        :param position: where the page starts, set by `set_next` of the
+          last page, None for the first page.
+        """
+        self.limit = limit
+        self.position = position
+        self.has_next = False
+        self.next_position = None
+
+    def load(self, data):
+        """
+        Pop the page parameters from validated data of index.
+        :type data: dict
+        :raise FormError: if the cursor is invalid
+        """
+        limit = data.pop(LIMIT_PARAM, None)
+        if limit is not None:
+            self.limit = limit
+        token = data.pop(CURSOR_PARAM, None)
+        if token:
+            try:
+                self.position = decode_cursor(token)
+            except ValueError:
+                raise FormError(
+                    None, "cursor: invalid",
+                    {CURSOR_PARAM: ["%r is not a valid cursor" % token]},
+                )
+
+    def set_next(self, position):
+        """
+        Tell there are records after this page, next page starts at
+        position(like the id of last record in this page).
+        """
+        self.has_next = True
+        self.next_position = position
+
+    def page(self, items, web_request=None):
+        """
+        Make the response of the page.
+        :type items: list
+        :param web_request: anything with `path` and `args` like a flask
+          request, the url of next page is made of it.
+        :rtype: dict
+        """
+        token = None
+        next_url = None
+        if self.has_next:
+            token = encode_cursor(self.next_position)
+            if web_request is not None:
+                next_url = self._page_url(web_request, token)
+        return {"items": items, CURSOR_PARAM: token, "next": next_url}
+
+    @staticmethod
+    def _page_url(web_request, token):
+        args = web_request.args
+        if hasattr(args, "getlist"):
+            args = args.items(multi=True)
+        else:
+            args = args.items()
+        params = [
+            (_utf8(key), _utf8(value)) for key, value in args
+            if key != CURSOR_PARAM
+        ]
+        params.append((CURSOR_PARAM, token))
+        return "%s?%s" % (web_request.path, urllib.urlencode(params))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Compiled `out_fields` of an operation.
+
+Fields are dotted paths like `owner.name`, a list in the result(the
+records of `index`, or a list value of a field) is projected record by
+record. Only the requested keys are looked up, so the cost doesn't grow
+with the width of the result.
+"""
+
+__all__ = (
+    "Projector",
+)
+
+
+class Projector(object):
+
+    def __init__(self, fields):
+        """
+        :param fields: out fields, dotted paths select nested fields, a
+          field selects the whole value even if its sub paths are listed.
+        :type fields: list or tuple or frozenset
+        """
+        self.fields = frozenset(fields)
+        whole_keys = set()
+        sub_paths = {}
+        for field in self.fields:
+            key, _, sub_path = field.partition(".")
+            if sub_path:
+                sub_paths.setdefault(key, []).append(sub_path)
+            else:
+                whole_keys.add(key)
+        self._keys = tuple(whole_keys)
+        self._children = tuple(
+            (key, Projector(paths))
+            for key, paths in sub_paths.items() if key not in whole_keys
+        )
+
+    def __call__(self, result):
+        """
+        Project a record, a list of records or other values(returned as is).
+        """
+        if isinstance(result, dict):
+            return self.project_record(result)
+        if isinstance(result, list):
+            project_record = self.project_record
+            return [
+                project_record(record) if isinstance(record, dict)
+                else self(record)
+                for record in result
+            ]
+        return result
+
+    def project_record(self, record):
+        """
+        :type record: dict
+        :rtype: dict
+        """
+        output = {key: record[key] for key in self._keys if key in record}
+        for key, child in self._children:
+            if key in record:
+                output[key] = child(record[key])
+        return output
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Process-wide store of shared json-schema definitions.
+
+Schemas refer to shared definitions like
+`{"$ref": "common.json#/definitions/name"}`, definitions in the store are
+resolved only once per process. Resolvers keep their scope stacks per
+thread, so a cached validator and its resolver can be shared by all the
+request threads.
+"""
+import json
+import os
+import threading
+
+from jsonschema import RefResolver
+from jsonschema.exceptions import RefResolutionError
+from jsonschema.compat import lru_cache, urldefrag, urljoin
+
+__all__ = (
+    "SchemaStore", "SharedRefResolver", "schema_store",
+)
+
+
+class SharedRefResolver(RefResolver):
+    """
+    `RefResolver` that resolves refs to documents of a `SchemaStore` with
+    the store's shared cache, its scope stack is thread local.
+    """
+
+    def __init__(self, base_uri, referrer, schema_store, **kwargs):
+        kwargs.setdefault("urljoin_cache", schema_store.urljoin_cache)
+        super(SharedRefResolver, self).__init__(base_uri, referrer, **kwargs)
+        self.schema_store = schema_store
+        self._local = threading.local()
+
+    def _scopes(self):
+        scopes = getattr(self._local, "scopes", None)
+        if scopes is None:
+            scopes = self._local.scopes = [self._scopes_stack[0]]
+        return scopes
+
+    def push_scope(self, scope):
+        self._scopes().append(
+            self._urljoin_cache(self.resolution_scope, scope),
+        )
+
+    def pop_scope(self):
+        try:
+            self._scopes().pop()
+        except IndexError:
+            raise RefResolutionError(
+                "Failed to pop the scope from an empty stack. "
+                "`pop_scope()` should only be called once for every "
+                "`push_scope()`"
+            )
+
+    @property
+    def resolution_scope(self):
+        return self._scopes()[-1]
+
+    def resolve_from_url(self, url):
+        document_url = urldefrag(url)[0]
+        if document_url and document_url in self.schema_store:
+            return self.schema_store.resolve(url, self)
+        return super(SharedRefResolver, self).resolve_from_url(url)
+
+
+class SchemaStore(object):
+
+    def __init__(self):
+        self.schemas = {}
+        # url(with fragment) -> resolved sub-schema
+        self._resolved = {}
+        self.urljoin_cache = lru_cache(1024)(urljoin)
+
+    def __contains__(self, uri):
+        return uri in self.schemas
+
+    def add(self, uri, schema):
+        """
+        Add a schema document, refs like `uri#/definitions/name` will be
+        resolved from it. If the schema has an `id`, it's added by its id
+        too.
+        :type uri: str or unicode
+        :type schema: dict
+        """
+        self.schemas[uri] = schema
+        if schema.get("id"):
+            self.schemas[urldefrag(schema["id"])[0]] = schema
+        self._resolved.clear()
+
+    def load_dir(self, path):
+        """
+        Preload all the `.json` files in given directory, each of them is
+        added by its file name(`common.json`, etc).
+        :type path: str
+        """
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".json"):
+                with open(os.path.join(path, name)) as schema_fp:
+                    self.add(name, json.load(schema_fp))
+
+    def resolve(self, url, resolver):
+        """
+        Resolve a url of a document in the store.
+        :type resolver: jsonschema.RefResolver
+        """
+        resolved = self._resolved.get(url)
+        if resolved is None:
+            document_url, fragment = urldefrag(url)
+            resolved = resolver.resolve_fragment(
+                self.schemas[document_url], fragment
+            )
+            self._resolved[url] = resolved
+        return resolved
+
+    def resolver_for(self, schema):
+        """
+        Make a new resolver for given root schema.
+        :rtype: SharedRefResolver
+        """
+        return SharedRefResolver.from_schema(schema, schema_store=self)
+
+
+# the store shared by all the sugars and forms
+schema_store = SchemaStore()
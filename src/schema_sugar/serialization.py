@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+"""
+Serialize configs and the site map as json or MessagePack.
+
+MessagePack is used only if the `msgpack` package is installed, the format
+is negotiated by the `Accept` header of the request.
+
+Streamed results are serialized record by record, as a json array or
+NDJSON(a json document per line).
+
+Results are encoded by `JSONEncoder`, which encodes the values flask's
+encoder does, so a sugar answers the same json in all the jars.
+"""
+from datetime import date, datetime
+import json
+import uuid
+
+from werkzeug.http import http_date
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+__all__ = (
+    "JSON_MIMETYPE", "MSGPACK_MIMETYPE", "mimetypes", "dumps", "loads",
+    "best_mimetype", "accept_header", "NDJSON_MIMETYPE", "iter_dumps",
+    "best_stream_mimetype", "JSONEncoder", "json_encode",
+)
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/x-msgpack"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# records of a streamed response are joined up to this size per chunk
+_CHUNK_SIZE = 8192
+
+
+class JSONEncoder(json.JSONEncoder):
+    """
+    Encode datetime and date as http dates, UUID as str and objects with
+    `__html__` as their html, like `flask.json.JSONEncoder`.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return http_date(o.utctimetuple())
+        if isinstance(o, date):
+            return http_date(o.timetuple())
+        if isinstance(o, uuid.UUID):
+            return str(o)
+        if hasattr(o, "__html__"):
+            return unicode(o.__html__())
+        return json.JSONEncoder.default(self, o)
+
+
+def json_encode(encoder_class=JSONEncoder):
+    """
+    The compact `encode` function of given encoder class, `json.dumps` with
+    arguments builds a new encoder on each call.
+    """
+    return encoder_class(separators=(",", ":")).encode
+
+
+_json_encode = json_encode()
+
+
+def mimetypes():
+    """
+    Supported mimetypes, json first.
+    :rtype: list
+    """
+    if msgpack is None:
+        return [JSON_MIMETYPE]
+    return [JSON_MIMETYPE, MSGPACK_MIMETYPE]
+
+
+def dumps(obj, mimetype=JSON_MIMETYPE, encode=None):
+    """
+    :param encode: function encoding obj as json, see `json_encode`.
+    :rtype: str
+    """
+    if mimetype == MSGPACK_MIMETYPE:
+        # python2 str is packed as msgpack str, not bin, like json does
+        return msgpack.packb(obj, use_bin_type=False)
+    return (encode or _json_encode)(obj)
+
+
+def loads(data, mimetype=JSON_MIMETYPE):
+    """
+    :type data: str
+    :param mimetype: mimetype of data, a `Content-Type` header with
+      parameters is accepted too.
+    """
+    if mimetype and mimetype.split(";")[0].strip() == MSGPACK_MIMETYPE:
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+def best_mimetype(accept_mimetypes):
+    """
+    Choose the response mimetype of a request.
+    :type accept_mimetypes: werkzeug.datastructures.MIMEAccept
+    :rtype: str
+    """
+    return accept_mimetypes.best_match(mimetypes(), default=JSON_MIMETYPE)
+
+
+def accept_header():
+    """
+    `Accept` header of requests preferring the compact format.
+    :rtype: str
+    """
+    if msgpack is None:
+        return JSON_MIMETYPE
+    return "%s, %s;q=0.5" % (MSGPACK_MIMETYPE, JSON_MIMETYPE)
+
+
+def iter_dumps(records, mimetype=JSON_MIMETYPE, encode=None):
+    """
+    Serialize records one by one, for streamed responses, the records are
+    consumed as the chunks are.
+    :type records: iterable
+    :param mimetype: JSON_MIMETYPE for a json array, NDJSON_MIMETYPE for a
+      record per line.
+    :param encode: function encoding a record as json, see `json_encode`.
+    :return: generator of str chunks
+    """
+    if encode is None:
+        encode = _json_encode
+    ndjson = mimetype == NDJSON_MIMETYPE
+    chunk = [] if ndjson else ["["]
+    size = 0
+    first = True
+    for record in records:
+        encoded = encode(record)
+        if ndjson:
+            chunk.append(encoded)
+            chunk.append("\n")
+        else:
+            if not first:
+                chunk.append(",")
+            chunk.append(encoded)
+        first = False
+        size += len(encoded) + 1
+        if size >= _CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    if not ndjson:
+        chunk.append("]")
+    if chunk:
+        yield "".join(chunk)
+
+
+def best_stream_mimetype(accept_mimetypes):
+    """
+    Choose the mimetype of a streamed response, json array by default.
+    :type accept_mimetypes: werkzeug.datastructures.MIMEAccept
+    :rtype: str
+    """
+    return accept_mimetypes.best_match(
+        [JSON_MIMETYPE, NDJSON_MIMETYPE], default=JSON_MIMETYPE
+    )
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+from concurrent.futures import Future
+import json
+import threading
+
+from flask import Flask
+import pytest
+
+from schema_sugar import SchemaSugarBase, ROUTE_BULK
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+
+
+class DiskSugar(FlaskSugar):
+    bulk_max_workers = 4
+    config_dict = {
+        "schema": {
+            "create": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "size": {"type": "integer"},
+                },
+                "required": ["name"],
+            },
+            "update": {
+                "type": "object",
+                "properties": {"size": {"type": "integer"}},
+            },
+        },
+        "resources": "disks",
+        "out_fields": {"create": ["name", "size"]},
+    }
+
+    def __init__(self):
+        super(DiskSugar, self).__init__()
+        self.threads = set()
+
+    def create(self, data, web_request, **kwargs):
+        self.threads.add(threading.current_thread().name)
+        return dict(data, secret=1)
+
+    def update(self, data, web_request, id, **kwargs):
+        future = Future()
+        future.set_result(dict(data, id=id))
+        return future
+
+    def delete(self, data, web_request, id, **kwargs):
+        if id == "0":
+            raise ValueError(id)
+        return {"deleted": id}
+
+
+def test00_should_run_items_in_input_order():
+    sugar = DiskSugar()
+    items = [
+        {"operation": "create", "data": {"name": "disk%d" % i, "size": "1"}}
+        for i in range(20)
+    ]
+    items.append({"operation": "update", "id": 1, "data": {"size": "2"}})
+    items.append({"operation": "delete", "id": "2"})
+    responses = sugar.bulk_result(items)
+    assert responses[:20] == [
+        {"status": 200, "result": {"name": "disk%d" % i, "size": 1}}
+        for i in range(20)
+    ]
+    assert responses[20:] == [
+        {"status": 200, "result": {"id": "1", "size": 2}},
+        {"status": 200, "result": {"deleted": "2"}},
+    ]
+    assert threading.current_thread().name not in sugar.threads
+
+
+def test01_should_report_errors_per_item():
+    sugar = DiskSugar()
+    responses = sugar.bulk_result([
+        {"operation": "create", "data": {"size": 1}},
+        {"operation": "index"},
+        {"operation": "update", "data": {}},
+        {"operation": "delete", "id": "0"},
+        {"operation": "create", "data": {"name": "disk1"}},
+    ])
+    assert [response["status"] for response in responses] == \
+        [400, 400, 400, 500, 200]
+    assert responses[0]["errors"] == {"": ["'name' is a required property"]}
+    assert "id" in responses[2]["errors"]
+
+
+def test02_should_reject_non_array():
+    sugar = DiskSugar()
+    future = sugar.future_result("POST", ROUTE_BULK, {"operation": "create"})
+    with pytest.raises(ValueError):
+        future.result()
+
+
+def test03_should_skip_bulk_route_without_write_operations():
+    class UserSugar(SchemaSugarBase):
+        config_dict = {"schema": {}, "resources": "users"}
+
+        def index(self, data, web_request, **kwargs):
+            return []
+
+    from schema_sugar.contrib.routing import sugar_routes
+    assert ROUTE_BULK not in [route.kind for route in sugar_routes(UserSugar())]
+    assert ROUTE_BULK in [route.kind for route in sugar_routes(DiskSugar())]
+
+
+def test04_should_run_items_by_overridden_process():
+    class AuditedDiskSugar(DiskSugar):
+
+        def __init__(self):
+            super(AuditedDiskSugar, self).__init__()
+            self.processed = []
+
+        def process(self, operation, data, web_request, **kwargs):
+            self.processed.append((operation, kwargs.get("id")))
+            return super(AuditedDiskSugar, self).process(
+                operation, data, web_request, **kwargs
+            )
+
+    sugar = AuditedDiskSugar()
+    responses = sugar.bulk_result([
+        {"operation": "create", "data": {"name": "disk1", "size": "1"}},
+        {"operation": "update", "id": 2, "data": {"size": "3"}},
+        {"operation": "create", "data": {}},
+    ])
+    assert responses[:2] == [
+        {"status": 200, "result": {"name": "disk1", "size": 1}},
+        {"status": 200, "result": {"id": "2", "size": 3}},
+    ]
+    assert responses[2]["status"] == 400
+    assert sorted(sugar.processed) == [("create", None), ("update", "2")]
+
+
+def test10_should_serve_bulk_route():
+    app = Flask(__name__)
+    FlaskJar(__name__, app).register(DiskSugar)
+    app.testing = True
+    response = app.test_client().post(
+        "/disks/_bulk", content_type="application/json",
+        data=json.dumps([
+            {"operation": "create", "data": {"name": "disk1"}},
+            {"operation": "create", "data": {}},
+        ]),
+    )
+    assert response.status_code == 200
+    assert [item["status"] for item in json.loads(response.data)] == [200, 400]
+    response = app.test_client().post(
+        "/disks/_bulk", content_type="application/json", data="{}",
+    )
+    assert response.status_code == 400
+    response = app.test_client().post(
+        "/disks/_bulk", content_type="application/json", data="[]",
+    )
+    assert json.loads(response.data) == []
+
+
+def test11_should_read_web_request_in_items():
+    class AgentDiskSugar(DiskSugar):
+
+        def create(self, data, web_request, **kwargs):
+            return dict(data, name=web_request.headers["User-Agent"])
+
+    app = Flask(__name__)
+    FlaskJar(__name__, app).register(AgentDiskSugar)
+    app.testing = True
+    response = app.test_client().post(
+        "/disks/_bulk", content_type="application/json",
+        headers={"User-Agent": "tester"},
+        data=json.dumps([
+            {"operation": "create", "data": {"name": "disk%d" % i}}
+            for i in range(8)
+        ]),
+    )
+    assert response.status_code == 200
+    assert [item["status"] for item in json.loads(response.data)] == [200] * 8
+    assert json.loads(response.data)[0]["result"] == {"name": "tester"}
@@ -35,6 +35,25 @@ def test00_should_fetch_meta(mocked_parse):
         assert client.meta == return_meta
 
 
+def test01_should_fetch_meta_in_msgpack(mocked_parse):
+    from schema_sugar import serialization
+    from schema_sugar.client import RestClient
+
+    if serialization.msgpack is None:
+        pytest.skip("msgpack is not installed")
+    return_meta = {u"/api/v2 datastores": {u"name": u"datastores"}}
+    with patch("requests.get") as get:
+        response = get.return_value = Mock()
+        response.headers = {"Content-Type": serialization.MSGPACK_MIMETYPE}
+        response.content = serialization.dumps(
+            return_meta, serialization.MSGPACK_MIMETYPE
+        )
+        client = RestClient(mocked_parse)
+        assert client.meta == return_meta
+        assert "application/x-msgpack" in \
+            get.call_args[1]["headers"]["Accept"]
+
+
 def test10_should_use_correct_method(mocked_parse):
     from schema_sugar.client import RestClient
 
@@ -59,4 +78,4 @@ def test10_should_use_correct_method(mocked_parse):
         client.send_request(
             "/api/v2", "PosT"
         )
-        assert status["method"] == "post"
\ No newline at end of file
+        assert status["method"] == "post"
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+from jsonschema import Draft4Validator
+import pytest
+
+from schema_sugar import JsonForm, SchemaSugarBase, FormError
+from schema_sugar.compiler import CompiledValidator
+
+
+DISK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "pattern": "^disk-[0-9]+$"},
+        "size": {"type": "integer", "minimum": 1, "maximum": 1024},
+        "ratio": {"type": "number", "exclusiveMaximum": True, "maximum": 1},
+        "thin": {"type": "boolean"},
+        "replica": {"enum": [1, 2, 3]},
+        "tag": {"type": ["string", "null"], "minLength": 2, "maxLength": 4},
+        "format": {"type": "string", "format": "ipv4"},
+        "owner": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "integer"},
+                "name": {"type": "string"},
+            },
+            "required": ["id"],
+        },
+        "labels": {
+            "type": "array",
+            "items": {"type": "string", "pattern": "^[a-z]+$"},
+            "minItems": 1,
+            "maxItems": 3,
+        },
+    },
+    "required": ["name", "size"],
+}
+
+CONFORMANCE_CASES = [
+    (DISK_SCHEMA, {"name": "disk-1", "size": 10}),
+    (DISK_SCHEMA, {}),
+    (DISK_SCHEMA, {"name": 1, "size": "10"}),
+    (DISK_SCHEMA, {"name": "disk-x", "size": True}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 0, "ratio": 1}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 2048, "ratio": 0.5}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "replica": 4}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "replica": True}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "tag": None}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "tag": "a"}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "tag": "abcde"}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "tag": 12}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "format": "not-an-ip"}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "owner": {}}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "owner": {"id": "1"}}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "owner": []}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "labels": []}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "labels": ["a", "B", 1]}),
+    (DISK_SCHEMA, {"name": "disk-1", "size": 1, "labels": list("abcd")}),
+    (DISK_SCHEMA, "not an object"),
+    ({"type": "object", "properties": {}}, {"anything": 1}),
+    ({}, None),
+    ({"type": "array", "items": {"type": "integer"}}, [1, "2", 3.0, None]),
+]
+
+
+def _describe(errors):
+    return [
+        (
+            list(error.absolute_path),
+            error.message,
+            error.validator,
+            list(error.schema_path),
+            str(error),
+        )
+        for error in errors
+    ]
+
+
+@pytest.mark.parametrize("schema, instance", CONFORMANCE_CASES)
+def test00_should_compiled_errors_conform_to_draft4(schema, instance):
+    compiled = CompiledValidator(schema)
+    assert compiled.is_compiled
+    assert _describe(compiled.iter_errors(instance)) == \
+        _describe(Draft4Validator(schema).iter_errors(instance))
+
+
+@pytest.mark.parametrize("schema, instance", [
+    case for case in CONFORMANCE_CASES if isinstance(case[1], dict)
+])
+def test01_should_form_errors_conform_to_draft4(schema, instance):
+    draft4_form = JsonForm(
+        instance, strict=True, live_schema=schema,
+        validator=Draft4Validator(schema),
+    )
+    compiled_form = JsonForm(
+        instance, strict=True, live_schema=schema,
+        validator=CompiledValidator(schema),
+    )
+    assert compiled_form.validate() == draft4_form.validate()
+    assert compiled_form.errors == draft4_form.errors
+    assert compiled_form.error_msg == draft4_form.error_msg
+
+
+def test02_should_fallback_for_unsupported_keywords():
+    schema = {
+        "type": "object",
+        "properties": {"name": {"type": "string"}},
+        "additionalProperties": False,
+    }
+    validator = CompiledValidator(schema)
+    assert not validator.is_compiled
+    assert not validator.is_valid({"name": "a", "extra": 1})
+    assert validator.is_valid({"name": "a"})
+
+
+def test03_should_sugar_use_compiled_validator():
+
+    class CompiledSugar(SchemaSugarBase):
+        validator_class = CompiledValidator
+        config_dict = {
+            "schema": {"create": DISK_SCHEMA},
+            "resources": "disks",
+        }
+
+        def create(self, data, web_request, **kwargs):
+            return data
+
+        def cli_response(self, result, **kwargs):
+            return result
+
+    sugar = CompiledSugar()
+    validator = sugar.config.get_validator("create")
+    assert isinstance(validator, CompiledValidator)
+    assert validator.is_compiled
+    assert sugar.crud_api("create", {"name": "disk-1", "size": 1}) == \
+        {"name": "disk-1", "size": 1}
+    with pytest.raises(FormError) as excinfo:
+        sugar.crud_api("create", {"name": "disk-1"})
+    assert dict(excinfo.value.errors) == {"": ["'size' is a required property"]}
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+import copy
+import json
+import os
+import shutil
+import tempfile
+
+from click.testing import CliRunner
+from mock import patch
+import pytest
+
+from schema_sugar import SchemaSugarBase, SugarConfig, ConfigError
+from schema_sugar.config_cache import ConfigCache, build_cache
+
+
+class DiskSugarBase(SchemaSugarBase):
+    """
+    An intermediate base class without config.
+    """
+
+
+class CachedDiskSugar(DiskSugarBase):
+    config_dict = {
+        "schema": {"create": {"type": "object"}},
+        "resources": "disks",
+    }
+
+    def create(self, data, web_request, **kwargs):
+        return data
+
+
+@pytest.fixture
+def cache_path(request):
+    path = tempfile.mkdtemp()
+    request.addfinalizer(lambda: shutil.rmtree(path))
+    return os.path.join(path, "configs.json")
+
+
+@pytest.fixture
+def config_cache(request, cache_path):
+    cache = ConfigCache(cache_path)
+    SugarConfig.config_cache = cache
+    request.addfinalizer(lambda: setattr(SugarConfig, "config_cache", None))
+    return cache
+
+
+def _config():
+    return copy.deepcopy(CachedDiskSugar.config_dict)
+
+
+def test00_should_skip_check_of_recorded_config(config_cache, cache_path):
+    with patch.object(SugarConfig, "_check_config") as check_config:
+        SugarConfig(_config())
+        assert check_config.call_count == 1
+        assert os.path.exists(cache_path)
+        # a new process reads the recorded digests from the file
+        SugarConfig.config_cache = ConfigCache(cache_path)
+        SugarConfig(_config())
+        assert check_config.call_count == 1
+
+        changed = _config()
+        changed["version"] = 2
+        SugarConfig(changed)
+        assert check_config.call_count == 2
+
+
+def test01_should_not_record_invalid_config(config_cache):
+    with pytest.raises(ConfigError):
+        SugarConfig({"schema": {}})
+    assert not config_cache.digests
+
+
+def test02_should_ignore_broken_cache_file(cache_path):
+    with open(cache_path, "w") as cache_fp:
+        cache_fp.write("{broken")
+    cache = ConfigCache(cache_path)
+    assert not cache.is_checked(SugarConfig, _config())
+    cache.add(SugarConfig, _config())
+    assert len(ConfigCache(cache_path).digests) == 1
+
+
+def test03_should_cli_prebuild_cache(cache_path):
+    result = CliRunner().invoke(
+        build_cache, [cache_path, "schema_sugar.tests.test_config_cache"],
+    )
+    assert result.exit_code == 0, result.output
+    assert "test_config_cache.CachedDiskSugar" in result.output
+    assert len(json.load(open(cache_path))["digests"]) == 1
+    assert CachedDiskSugar.config_dict == _config()
+
+    SugarConfig.config_cache = ConfigCache(cache_path)
+    try:
+        with patch.object(SugarConfig, "_check_config") as check_config:
+            CachedDiskSugar()
+        assert not check_config.called
+    finally:
+        SugarConfig.config_cache = None
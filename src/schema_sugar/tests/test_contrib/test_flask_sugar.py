@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+from datetime import datetime
+from decimal import Decimal
+import json
+import threading
+
+from flask import Flask, request
+from flask.json import JSONEncoder
+import pytest
+
+from schema_sugar import SugarConfig, serialization
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+
+
+@pytest.fixture
+def app():
+    flask_app = Flask(__name__)
+    jar = FlaskJar(__name__, flask_app)
+
+    @jar.register
+    class DiskSugar(FlaskSugar):
+        stream_operations = ("create", )
+        config_dict = {
+            "schema": {
+                "create": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "size": {"type": "integer"},
+                        },
+                        "required": ["name"],
+                    },
+                },
+            },
+            "resources": "disks",
+        }
+
+        def create(self, data, web_request, **kwargs):
+            sizes = 0
+            for disk in data:
+                sizes += disk.get("size", 0)
+            return {"sizes": sizes}
+
+        def show(self, data, web_request, id, **kwargs):
+            return {"id": id}
+
+    flask_app.testing = True
+    return flask_app
+
+
+def test00_should_stream_operation_validate_elements(app):
+    body = json.dumps([{"name": "disk%d" % i, "size": "1"} for i in range(100)])
+    response = app.test_client().post(
+        "/disks", data=body, content_type="application/json",
+    )
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"sizes": 100}
+
+
+def test01_should_stream_operation_raise_form_error(app):
+    body = json.dumps([{"name": "disk1"}, {"size": 1}])
+    response = app.test_client().post(
+        "/disks", data=body, content_type="application/json",
+    )
+    assert response.status_code == 400
+    assert json.loads(response.data)["errors"] == {
+        "1": ["'name' is a required property"],
+    }
+
+
+@pytest.mark.parametrize("body", ['[{"name": "disk1"}, {', "nope"])
+def test02_should_stream_operation_reject_invalid_json(app, body):
+    response = app.test_client().post(
+        "/disks", data=body, content_type="application/json",
+    )
+    assert response.status_code == 400
+    assert list(json.loads(response.data)["errors"]) == [""]
+
+
+@pytest.mark.parametrize("accept, mimetype", [
+    (None, "application/json"),
+    ("*/*", "application/json"),
+    ("application/json", "application/json"),
+    ("application/x-msgpack, application/json;q=0.5",
+     "application/x-msgpack"),
+])
+def test10_should_sitemap_negotiate_format(app, accept, mimetype):
+    if mimetype == serialization.MSGPACK_MIMETYPE \
+            and serialization.msgpack is None:
+        pytest.skip("msgpack is not installed")
+    headers = {"Accept": accept} if accept else {}
+    response = app.test_client().get("/meta", headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert "Accept" in response.headers["Vary"]
+    sitemap = serialization.loads(response.data, mimetype)
+    assert sitemap["/ disks"]["rules"]["create"] == \
+        {"url": "/disks", "method": "post"}
+    config = SugarConfig.from_string(
+        serialization.dumps(sitemap["/ disks"]["instance"], mimetype),
+        mimetype,
+    )
+    assert config.support_operations == ("create", "show")
+
+
+def test20_should_pass_fields_from_query_string(app):
+    response = app.test_client().get("/disks/1?fields=id")
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"id": "1"}
+    # an empty value is like no fields requested
+    response = app.test_client().get("/disks/1?fields=")
+    assert json.loads(response.data) == {"id": "1"}
+
+
+@pytest.fixture
+def batch_app():
+    flask_app = Flask(__name__)
+    jar = FlaskJar(__name__, flask_app)
+    both_running = threading.Event()
+    running = []
+
+    @jar.register
+    class UserSugar(FlaskSugar):
+        config_dict = {"schema": {}, "resources": "users"}
+
+        def show(self, data, web_request, id, **kwargs):
+            running.append(id)
+            if len(running) == 2:
+                both_running.set()
+            both_running.wait(5)
+            return {"id": id, "token": web_request.headers.get("X-Token")}
+
+    @jar.register
+    class DiskSugar(FlaskSugar):
+        config_dict = {
+            "schema": {
+                "create": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string"}},
+                    "required": ["name"],
+                },
+            },
+            "resources": "disks",
+        }
+
+        def create(self, data, web_request, **kwargs):
+            return dict(data, running=len(running))
+
+    flask_app.testing = True
+    return flask_app
+
+
+def test30_should_batch_run_sub_requests(batch_app):
+    response = batch_app.test_client().post(
+        "/_batch", headers={"X-Token": "abc"}, data=json.dumps([
+            {"url": "/users/1"},
+            {"method": "get", "url": "/users/2"},
+            {"method": "POST", "url": "/disks", "body": {"name": "disk1"}},
+            {"method": "POST", "url": "/disks", "body": {}},
+            {"url": "/volumes"},
+        ]),
+    )
+    assert response.status_code == 200
+    batch = json.loads(response.data)
+    assert [sub["status"] for sub in batch["responses"]] == \
+        [200, 200, 200, 400, 404]
+    assert batch["responses"][0]["body"] == {"id": "1", "token": "abc"}
+    # the write runs after the concurrent reads
+    assert batch["responses"][2]["body"] == {"name": "disk1", "running": 2}
+    assert len(batch["meta"]["timings"]) == 5
+    assert batch["meta"]["elapsed_ms"] >= \
+        batch["meta"]["timings"][-1]["started_ms"]
+
+
+def test31_should_batch_reject_invalid_sub_requests(batch_app):
+    client = batch_app.test_client()
+    assert client.post("/_batch", data="{}").status_code == 400
+    response = client.post("/_batch", data=json.dumps([
+        {"url": "/users/1"}, {"url": "/_batch"}, {"url": "users"},
+    ]))
+    assert response.status_code == 400
+    assert sorted(json.loads(response.data)["errors"]) == ["1", "2"]
+
+
+def test32_should_batch_read_sub_request_bodies_of_chunked_request(
+        batch_app):
+    # the server decoded the chunks of the batch request
+    response = batch_app.test_client().post(
+        "/_batch", headers={"Transfer-Encoding": "chunked"},
+        environ_overrides={"wsgi.input_terminated": True},
+        data=json.dumps([
+            {"method": "POST", "url": "/disks", "body": {"name": "disk1"}},
+        ]),
+    )
+    assert response.status_code == 200
+    sub, = json.loads(response.data)["responses"]
+    assert sub == {"status": 200, "body": {"name": "disk1", "running": 0}}
+
+
+def test33_should_batch_keep_client_of_sub_requests():
+    flask_app = Flask(__name__)
+    jar = FlaskJar(__name__, flask_app)
+
+    @jar.register
+    class ClientSugar(FlaskSugar):
+        config_dict = {"schema": {}, "resources": "clients"}
+
+        def show(self, data, web_request, id, **kwargs):
+            return {
+                "id": id, "remote_addr": web_request.remote_addr,
+                "scheme": web_request.scheme, "url": web_request.url,
+            }
+
+    response = flask_app.test_client().post(
+        "/_batch", base_url="https://example.com/api",
+        environ_overrides={"REMOTE_ADDR": "10.0.0.7"},
+        data=json.dumps([{"url": "/clients/a%20b?x=1"}]),
+    )
+    assert response.status_code == 200
+    sub, = json.loads(response.data)["responses"]
+    assert sub["body"] == {
+        "id": "a b", "remote_addr": "10.0.0.7", "scheme": "https",
+        "url": "https://example.com/api/clients/a%20b?x=1",
+    }
+
+
+@pytest.fixture
+def stream_app():
+    flask_app = Flask(__name__)
+    jar = FlaskJar(__name__, flask_app)
+    consumed = []
+
+    @jar.register
+    class DiskSugar(FlaskSugar):
+        config_dict = {
+            "schema": {},
+            "resources": "disks",
+            "out_fields": {"index": ["id", "name"]},
+        }
+
+        def index(self, data, web_request, **kwargs):
+            for i in range(int(web_request.args.get("count", 3))):
+                consumed.append(i)
+                # records are made in the request context
+                yield {"id": i, "name": "disk%d" % i, "path": request.path}
+
+    flask_app.testing = True
+    flask_app.consumed = consumed
+    return flask_app
+
+
+@pytest.mark.parametrize("accept, mimetype, body", [
+    (None, "application/json",
+     '[{"id":0,"name":"disk0"},{"id":1,"name":"disk1"},'
+     '{"id":2,"name":"disk2"}]'),
+    ("application/x-ndjson", "application/x-ndjson",
+     '{"id":0,"name":"disk0"}\n{"id":1,"name":"disk1"}\n'
+     '{"id":2,"name":"disk2"}\n'),
+])
+def test40_should_stream_iterator_result(stream_app, accept, mimetype, body):
+    headers = {"Accept": accept} if accept else {}
+    response = stream_app.test_client().get(
+        "/disks", headers=headers, buffered=False,
+    )
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert response.get_data() == body
+
+
+def test41_should_stream_records_as_sent(stream_app):
+    response = stream_app.test_client().get(
+        "/disks?count=10000", buffered=False,
+    )
+    assert response.is_streamed
+    # only the first chunk is made
+    assert 0 < len(stream_app.consumed) < 10000
+    records = json.loads(response.get_data())
+    assert records[-1] == {"id": 9999, "name": "disk9999"}
+    assert len(stream_app.consumed) == 10000
+
+
+def test42_should_stream_requested_fields(stream_app):
+    response = stream_app.test_client().get("/disks?fields=name")
+    assert json.loads(response.data) == [
+        {"name": "disk%d" % i} for i in range(3)
+    ]
+
+
+def test43_should_stream_records_by_app_encoder():
+    class DecimalEncoder(JSONEncoder):
+
+        def default(self, o):
+            if isinstance(o, Decimal):
+                return str(o)
+            return super(DecimalEncoder, self).default(o)
+
+    flask_app = Flask(__name__)
+    flask_app.json_encoder = DecimalEncoder
+    jar = FlaskJar(__name__, flask_app)
+
+    @jar.register
+    class EventSugar(FlaskSugar):
+        config_dict = {"schema": {}, "resources": "events"}
+
+        def index(self, data, web_request, **kwargs):
+            for i in range(3):
+                yield {
+                    "id": i, "price": Decimal(i) / 4,
+                    "at": datetime(2015, 1, 2, 3, 4, 5),
+                }
+
+    response = flask_app.test_client().get("/events", buffered=False)
+    assert response.status_code == 200
+    assert json.loads(response.get_data()) == [
+        {"id": i, "price": str(Decimal(i) / 4),
+         "at": "Fri, 02 Jan 2015 03:04:05 GMT"}
+        for i in range(3)
+    ]
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+from concurrent.futures import Future
+import json
+
+import pytest
+
+from schema_sugar import SchemaSugarBase, action, serialization
+from schema_sugar.contrib.future_jar import FutureJar
+
+
+class DiskSugar(SchemaSugarBase):
+    config_dict = {
+        "schema": {
+            "create": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "size": {"type": "integer"},
+                },
+                "required": ["name"],
+            },
+        },
+        "resources": "disks",
+    }
+
+    def __init__(self):
+        super(DiskSugar, self).__init__()
+        self.pending = []
+
+    def create(self, data, web_request, **kwargs):
+        return dict(data)
+
+    def show(self, data, web_request, id, **kwargs):
+        future = Future()
+        self.pending.append((future, {"id": id, "name": "disk" + id}))
+        return future
+
+    def index(self, data, web_request, **kwargs):
+        return [{"id": "1", "name": "disk1"}]
+
+    def delete(self, data, web_request, id, **kwargs):
+        raise ValueError(id)
+
+    @action("resize", "POST")
+    def resize(self, data, web_request, id, **kwargs):
+        return {"resized": id}
+
+
+@pytest.fixture
+def jar():
+    future_jar = FutureJar(__name__, max_workers=2)
+    future_jar.register(DiskSugar, url_prefix="/api")
+    yield future_jar
+    future_jar.shutdown()
+
+
+def handle(jar, *args, **kwargs):
+    return jar.handle(*args, **kwargs).result(5)
+
+
+def test00_should_route_resources_and_actions(jar):
+    response = handle(jar, "POST", "/api/disks",
+                      body=json.dumps({"name": "disk1", "size": "10"}))
+    assert response.status == 200
+    assert json.loads(response.body) == {"name": "disk1", "size": 10}
+    response = handle(jar, "GET", "/api/disks")
+    assert json.loads(response.body) == [{"id": "1", "name": "disk1"}]
+    response = handle(jar, "POST", "/api/disks/2/resize")
+    assert json.loads(response.body) == {"resized": "2"}
+
+
+def test01_should_respond_when_handler_future_is_done(jar):
+    sugar, = jar.registry
+    response = jar.handle("GET", "/api/disks/3", query_string="fields=id")
+    while not sugar.pending:
+        pass
+    assert not response.done()
+    future, result = sugar.pending.pop()
+    future.set_result(result)
+    assert json.loads(response.result(5).body) == {"id": "3"}
+
+
+def test02_should_map_errors_to_status(jar):
+    assert handle(jar, "GET", "/api/volumes").status == 404
+    assert handle(jar, "PATCH", "/api/disks").status == 405
+    assert handle(jar, "PUT", "/api/disks/1").status == 501
+    assert handle(jar, "DELETE", "/api/disks/1").status == 500
+    response = handle(jar, "POST", "/api/disks", body="{}")
+    assert response.status == 400
+    assert json.loads(response.body)["errors"] == {
+        "": ["'name' is a required property"],
+    }
+    response = handle(jar, "POST", "/api/disks", query_string="fields=owner",
+                      body=json.dumps({"name": "disk1"}))
+    assert response.status == 400
+
+
+def test03_should_serve_meta(jar):
+    response = handle(jar, "GET", "/api/disks/meta")
+    assert response.status == 200
+    assert "support_operations" in response.body
+    response = handle(jar, "GET", "/meta")
+    assert dict(response.headers)["Content-Type"] == "application/json"
+    assert json.loads(response.body)["/api disks"]["rules"]["create"] == \
+        {"url": "/api/disks", "method": "post"}
+    if serialization.msgpack is not None:
+        response = handle(jar, "GET", "/meta",
+                          headers={"Accept": serialization.MSGPACK_MIMETYPE})
+        sitemap = serialization.loads(
+            response.body, serialization.MSGPACK_MIMETYPE,
+        )
+        assert "/api disks" in sitemap
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+from datetime import date, datetime
+from decimal import Decimal
+import json
+import uuid
+
+from flask import Flask, Markup
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from schema_sugar import SchemaSugarBase, action, serialization
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+from schema_sugar.contrib.wsgi_jar import WsgiJar
+
+
+class DiskSugar(SchemaSugarBase):
+    stream_operations = ("create", )
+    config_dict = {
+        "schema": {
+            "create": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "size": {"type": "integer"},
+                    },
+                    "required": ["name"],
+                },
+            },
+        },
+        "resources": "disks",
+    }
+
+    def create(self, data, web_request, **kwargs):
+        return {"sizes": sum(disk.get("size", 0) for disk in data)}
+
+    def show(self, data, web_request, id, **kwargs):
+        return {"id": id, "name": "disk" + id}
+
+    def delete(self, data, web_request, id, **kwargs):
+        raise ValueError(id)
+
+    @action("resize", "POST")
+    def resize(self, data, web_request, id, **kwargs):
+        return {"resized": id}
+
+
+@pytest.fixture
+def client():
+    jar = WsgiJar(__name__)
+    jar.register(DiskSugar)
+    return Client(jar, Response)
+
+
+def test00_should_route_resources_and_actions(client):
+    body = json.dumps([{"name": "disk%d" % i, "size": "1"} for i in range(10)])
+    response = client.post("/disks", data=body)
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert json.loads(response.data) == {"sizes": 10}
+    response = client.get("/disks/1", query_string="fields=id")
+    assert json.loads(response.data) == {"id": "1"}
+    response = client.post("/disks/1/resize")
+    assert json.loads(response.data) == {"resized": "1"}
+
+
+def test01_should_map_errors_to_status(client):
+    assert client.get("/volumes").status_code == 404
+    response = client.patch("/disks")
+    assert response.status_code == 405
+    assert "POST" in response.headers["Allow"]
+    assert client.put("/disks/1").status_code == 501
+    assert client.delete("/disks/1").status_code == 500
+    response = client.post("/disks", data=json.dumps([{"name": "a"}, {}]))
+    assert response.status_code == 400
+    assert json.loads(response.data)["errors"] == {
+        "1": ["'name' is a required property"],
+    }
+
+
+def test02_should_serve_meta(client):
+    response = client.get("/disks/meta")
+    assert response.status_code == 200
+    assert "support_operations" in response.data
+    response = client.get("/meta")
+    assert response.mimetype == "application/json"
+    assert json.loads(response.data)["/ disks"]["rules"]["create"] == \
+        {"url": "/disks", "method": "post"}
+    if serialization.msgpack is not None:
+        response = client.get(
+            "/meta", headers={"Accept": serialization.MSGPACK_MIMETYPE},
+        )
+        assert response.mimetype == serialization.MSGPACK_MIMETYPE
+        assert "/ disks" in serialization.loads(
+            response.data, serialization.MSGPACK_MIMETYPE,
+        )
+
+
+class EventSugar(FlaskSugar):
+    config_dict = {"schema": {}, "resources": "events"}
+
+    def show(self, data, web_request, id, **kwargs):
+        return {
+            "id": uuid.UUID(int=int(id)),
+            "at": datetime(2015, 1, 2, 3, 4, 5),
+            "day": date(2015, 1, 2),
+            "note": Markup("<b>%s</b>") % id,
+        }
+
+
+def test03_should_encode_results_like_flask_jar():
+    app = Flask(__name__)
+    FlaskJar(__name__, app).register(EventSugar)
+    jar = WsgiJar(__name__)
+    jar.register(EventSugar)
+    flask_response = app.test_client().get("/events/7")
+    response = Client(jar, Response).get("/events/7")
+    assert response.status_code == flask_response.status_code == 200
+    assert json.loads(response.data) == json.loads(flask_response.data)
+    assert json.loads(response.data)["at"] == "Fri, 02 Jan 2015 03:04:05 GMT"
+
+
+def test04_should_use_given_json_encoder():
+    class DecimalEncoder(serialization.JSONEncoder):
+
+        def default(self, o):
+            if isinstance(o, Decimal):
+                return str(o)
+            return super(DecimalEncoder, self).default(o)
+
+    class PriceSugar(SchemaSugarBase):
+        config_dict = {"schema": {}, "resources": "prices"}
+
+        def show(self, data, web_request, id, **kwargs):
+            return {"price": Decimal(id) / 4}
+
+    jar = WsgiJar(__name__)
+    jar.register(PriceSugar)
+    assert Client(jar, Response).get("/prices/1").status_code == 500
+    jar = WsgiJar(__name__, json_encoder=DecimalEncoder)
+    jar.register(PriceSugar)
+    response = Client(jar, Response).get("/prices/1")
+    assert json.loads(response.data) == {"price": "0.25"}
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+from datetime import datetime
+from decimal import Decimal
+import json
+
+from flask import Flask
+from flask.json import JSONEncoder
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from schema_sugar import FormError, SchemaSugarBase
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+from schema_sugar.contrib.wsgi_jar import WsgiJar
+from schema_sugar.etag import ETagStore, etag_matches
+
+CONFIG = {
+    "schema": {
+        "update": {
+            "type": "object",
+            "properties": {"size": {"type": "integer"}},
+        },
+    },
+    "resources": "disks",
+}
+
+
+class DiskMixin(object):
+    etag_operations = ("show", "index")
+    config_dict = CONFIG
+
+    def __init__(self):
+        super(DiskMixin, self).__init__()
+        self.disks = {"1": {"id": "1", "size": 1}}
+        self.calls = []
+
+    def show(self, data, web_request, id, **kwargs):
+        self.calls.append(("show", id))
+        return self.disks[id]
+
+    def index(self, data, web_request, **kwargs):
+        self.calls.append(("index", None))
+        return self.disks.values()
+
+    def update(self, data, web_request, id, **kwargs):
+        self.disks[id] = dict(self.disks[id], **data)
+        return self.disks[id]
+
+
+class FlaskDiskSugar(DiskMixin, FlaskSugar):
+    pass
+
+
+class VersionedDiskSugar(DiskMixin, FlaskSugar):
+
+    def version(self, operation, data, web_request, **kwargs):
+        self.calls.append(("version", operation))
+        return sum(disk["size"] for disk in self.disks.values())
+
+
+class WsgiDiskSugar(DiskMixin, SchemaSugarBase):
+    pass
+
+
+@pytest.fixture(params=["flask", "wsgi"])
+def jar_client(request):
+    if request.param == "flask":
+        app = Flask(__name__)
+        jar = FlaskJar(__name__, app)
+        jar.register(FlaskDiskSugar)
+        app.testing = True
+        client = app.test_client()
+    else:
+        jar = WsgiJar(__name__)
+        jar.register(WsgiDiskSugar)
+        client = Client(jar, Response)
+    sugar, = jar.registry
+    return client, sugar
+
+
+def test00_should_match_if_none_match():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test01_should_invalidate_by_generation():
+    store = ETagStore()
+    store.set("show 1", '"a"', store.generation("1"))
+    store.set("show 2", '"b"', store.generation("2"))
+    store.set("index", '"c"', store.generation())
+    store.invalidate("1")
+    assert store.get("show 1", "1") is None
+    assert store.get("show 2", "2") == '"b"'
+    assert store.get("index") is None
+
+
+def test02_should_bound_generations():
+    store = ETagStore(size=4)
+    store.invalidate("0")
+    store.set("show 0", '"a"', store.generation("0"))
+    store.set("show new", '"b"', store.generation("new"))
+    for i in range(1, 5000):
+        store.invalidate(str(i))
+    assert len(store._generations) == 4
+    # evicted and never written records are treated as bumped
+    assert store.get("show 0", "0") is None
+    assert store.get("show new", "new") is None
+    store.set("show 4999", '"c"', store.generation("4999"))
+    assert store.get("show 4999", "4999") == '"c"'
+
+
+def test10_should_answer_not_modified(jar_client):
+    client, sugar = jar_client
+    response = client.get("/disks/1")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert json.loads(response.data) == {"id": "1", "size": 1}
+    response = client.get("/disks/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.data == ""
+    # changed by others than the sugar
+    sugar.disks["1"] = {"id": "1", "size": 2}
+    response = client.get("/disks/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"id": "1", "size": 2}
+    # without a version, the handler is always called
+    assert sugar.calls == [("show", "1")] * 3
+
+
+def test11_should_write_invalidate_etags(jar_client):
+    client, sugar = jar_client
+    show_etag = client.get("/disks/1").headers["ETag"]
+    index_etag = client.get("/disks").headers["ETag"]
+    response = client.put("/disks/1", data=json.dumps({"size": 2}))
+    assert response.status_code == 200
+    response = client.get("/disks/1", headers={"If-None-Match": show_etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != show_etag
+    response = client.get("/disks", headers={"If-None-Match": index_etag})
+    assert response.status_code == 200
+    assert json.loads(response.data) == [{"id": "1", "size": 2}]
+
+
+def test12_should_version_skip_handler():
+    app = Flask(__name__)
+    jar = FlaskJar(__name__, app)
+    jar.register(VersionedDiskSugar)
+    sugar, = jar.registry
+    client = app.test_client()
+    etag = client.get("/disks/1").headers["ETag"]
+    sugar.calls[:] = []
+    response = client.get("/disks/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert sugar.calls == [("version", "show")]
+    sugar.disks["1"]["size"] = 3
+    response = client.get("/disks/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test13_should_pre_process_before_etag():
+    class AuthDiskSugar(VersionedDiskSugar):
+
+        def pre_process(self, data, web_request, **kwargs):
+            if web_request.headers.get("Authorization") != "token":
+                raise FormError(None, "unauthorized", {})
+            return data
+
+    app = Flask(__name__)
+    jar = FlaskJar(__name__, app)
+    jar.register(AuthDiskSugar)
+    client = app.test_client()
+    etag = client.get(
+        "/disks/1", headers={"Authorization": "token"}
+    ).headers["ETag"]
+    response = client.get(
+        "/disks/1", headers={"If-None-Match": etag, "Authorization": "token"}
+    )
+    assert response.status_code == 304
+    response = client.get("/disks/1", headers={"If-None-Match": etag})
+    assert response.status_code == 400
+
+
+def test14_should_tag_the_json_of_app_encoder():
+    class DecimalEncoder(JSONEncoder):
+
+        def default(self, o):
+            if isinstance(o, Decimal):
+                return str(o)
+            return super(DecimalEncoder, self).default(o)
+
+    class EventSugar(DiskMixin, FlaskSugar):
+
+        def show(self, data, web_request, id, **kwargs):
+            return {
+                "id": id, "price": Decimal("0.25"),
+                "at": datetime(2015, 1, 2, 3, 4, 5),
+            }
+
+    app = Flask(__name__)
+    app.json_encoder = DecimalEncoder
+    FlaskJar(__name__, app).register(EventSugar)
+    client = app.test_client()
+    response = client.get("/disks/1")
+    assert response.status_code == 200
+    assert json.loads(response.data) == {
+        "id": "1", "price": "0.25", "at": "Fri, 02 Jan 2015 03:04:05 GMT",
+    }
+    etag = response.headers["ETag"]
+    response = client.get("/disks/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
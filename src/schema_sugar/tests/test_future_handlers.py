@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+
+import pytest
+
+from schema_sugar import (
+    SchemaSugarBase, FormError, action, ROUTE_ACTION, ROUTE_RESOURCE,
+    ROUTE_RESOURCES,
+)
+
+executor = ThreadPoolExecutor(2)
+
+
+class DiskSugar(SchemaSugarBase):
+    config_dict = {
+        "schema": {
+            "create": {
+                "type": "object",
+                "properties": {"size": {"type": "integer"}},
+                "required": ["size"],
+            },
+        },
+        "resources": "disks",
+        "out_fields": {"create": ["size"], "index": ["id"]},
+    }
+
+    def __init__(self):
+        super(DiskSugar, self).__init__()
+        self.release = threading.Event()
+
+    def create(self, data, web_request, **kwargs):
+        def load():
+            self.release.wait(5)
+            return dict(data, secret=1)
+        return executor.submit(load)
+
+    def index(self, data, web_request, **kwargs):
+        return [{"id": 1, "secret": 1}]
+
+    def show(self, data, web_request, **kwargs):
+        return executor.submit(lambda: 1 / 0)
+
+    @action("resize", "POST")
+    def resize(self, data, web_request, **kwargs):
+        return executor.submit(lambda: {"resized": True})
+
+    def cli_response(self, result, **kwargs):
+        return result
+
+
+def test00_should_sync_api_wait_for_future():
+    sugar = DiskSugar()
+    sugar.release.set()
+    assert sugar.resources_api("POST", {"size": "1"}) == {"size": 1}
+    assert sugar.action_api("resize")("resize", {}, None) == {"resized": True}
+
+
+def test01_should_future_api_not_block():
+    sugar = DiskSugar()
+    future = sugar.future_api("POST", ROUTE_RESOURCES, {"size": "2"})
+    assert isinstance(future, Future)
+    assert not future.done()
+    sugar.release.set()
+    assert future.result(5) == {"size": 2}
+    # sync handlers are wrapped in done futures
+    future = sugar.future_api("GET", ROUTE_RESOURCES, {})
+    assert future.done()
+    assert future.result() == [{"id": 1}]
+    future = sugar.future_api("resize", ROUTE_ACTION, {})
+    assert future.result(5) == {"resized": True}
+
+
+def test02_should_future_api_report_errors():
+    sugar = DiskSugar()
+    with pytest.raises(FormError):
+        sugar.future_api("POST", ROUTE_RESOURCES, {}).result()
+    with pytest.raises(ZeroDivisionError):
+        sugar.future_api("GET", ROUTE_RESOURCE, {}).result(5)
+    with pytest.raises(ZeroDivisionError):
+        sugar.crud_api("GET", {})
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+import json
+
+from flask import Flask
+from mock import Mock, patch
+import pytest
+
+from schema_sugar import SugarConfig, ConfigError
+from schema_sugar.client import RestClient
+from schema_sugar.contrib import FlaskJar, FlaskSugar
+from schema_sugar.pagination import Cursor, encode_cursor, decode_cursor
+
+
+class DiskSugar(FlaskSugar):
+    config_dict = {
+        "schema": {
+            "index": {
+                "type": "object",
+                "properties": {"pool": {"type": "string"}},
+            },
+        },
+        "resources": "disks",
+        "out_fields": {"index": ["id"]},
+        "pagination": {"limit": 2, "max_limit": 5},
+    }
+    disks = [{"id": i, "pool": "p%d" % (i % 2)} for i in range(5)]
+
+    def index(self, data, web_request, cursor, **kwargs):
+        disks = [
+            disk for disk in self.disks
+            if disk["id"] > cursor.position
+            and data.get("pool") in (None, disk["pool"])
+        ]
+        if len(disks) > cursor.limit:
+            disks = disks[:cursor.limit]
+            cursor.set_next(disks[-1]["id"])
+        return iter(disks)
+
+
+@pytest.fixture
+def app():
+    flask_app = Flask(__name__)
+    FlaskJar(__name__, flask_app).register(DiskSugar)
+    flask_app.testing = True
+    return flask_app
+
+
+def test00_should_add_page_parameters_to_index_schema():
+    config = SugarConfig(DiskSugar.config_dict)
+    assert config.pagination == {"limit": 2, "max_limit": 5}
+    properties = config.get_validation_schema("index")["properties"]
+    assert sorted(properties) == ["cursor", "limit", "pool"]
+    assert properties["limit"]["maximum"] == 5
+    dumped = SugarConfig.from_string(config.to_string())
+    assert dumped.get_validation_schema("index") == \
+        config.get_validation_schema("index")
+    with pytest.raises(ConfigError):
+        SugarConfig({"schema": {}, "resource": "host", "pagination": {}})
+
+
+def test01_should_cursor_round_trip():
+    assert decode_cursor(encode_cursor([1, u"disk"])) == [1, u"disk"]
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+    cursor = Cursor(10)
+    data = {"limit": 3, "cursor": encode_cursor(7), "pool": "p0"}
+    cursor.load(data)
+    assert (cursor.limit, cursor.position, data) == (3, 7, {"pool": "p0"})
+
+
+def test10_should_follow_next_links(app):
+    client = app.test_client()
+    response = client.get("/disks?pool=p0&limit=1")
+    page = json.loads(response.data)
+    assert page["items"] == [{"id": 0}]
+    assert page["next"].startswith("/disks?")
+    page = json.loads(client.get(page["next"]).data)
+    assert page["items"] == [{"id": 2}]
+    page = json.loads(client.get(page["next"]).data)
+    assert page == {"items": [{"id": 4}], "cursor": None, "next": None}
+
+
+def test11_should_reject_invalid_page_parameters(app):
+    client = app.test_client()
+    assert client.get("/disks?limit=6").status_code == 400
+    response = client.get("/disks?cursor=abc")
+    assert response.status_code == 400
+    assert "cursor" in json.loads(response.data)["errors"]
+
+
+def test20_should_rest_client_iter_pages_lazily(app):
+    test_client = app.test_client()
+    paths = []
+
+    def send_request(path, method, params=None, data=None, headers=None):
+        paths.append(path)
+        response = test_client.get(path, query_string=params)
+        return Mock(json=Mock(return_value=json.loads(response.data)))
+
+    with patch.object(RestClient, "_fetch_meta", Mock()):
+        client = RestClient(Mock())
+    client.send_request = send_request
+    records = client.iter_pages("/disks", {"limit": 2})
+    assert next(records) == {"id": 0}
+    assert len(paths) == 1
+    assert list(records) == [{"id": i} for i in range(1, 5)]
+    assert len(paths) == 3
+
+
+def test21_should_list_command_iter_pages():
+    from schema_sugar.client.parser import _mk_cmd_func
+
+    client = Mock()
+    client.iter_pages.return_value = iter([{"id": 0}])
+    config = SugarConfig(DiskSugar.config_dict)
+    list_func = _mk_cmd_func(
+        client, "get", "/disks", config.get_validation_schema("index"),
+        paginated=True,
+    )
+    assert list(list_func(limit="2", _func=list_func)) == [{"id": 0}]
+    client.iter_pages.assert_called_once_with(
+        "/disks", {"limit": "2"}, headers={},
+    )
+    assert not client.send_request.called
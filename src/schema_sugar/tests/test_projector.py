@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+import pytest
+
+from schema_sugar import SchemaSugarBase, FormError
+from schema_sugar.projector import Projector
+
+RECORD = {
+    "id": 1,
+    "name": "disk",
+    "owner": {"id": 2, "name": "admin", "token": "secret"},
+    "snapshots": [
+        {"id": 3, "size": 10, "data": "x"},
+        {"id": 4, "size": 20},
+    ],
+    "size": 100,
+}
+
+
+def test00_should_project_flat_and_nested_fields():
+    project = Projector(["id", "owner.name", "snapshots.id", "missing.x"])
+    assert project(RECORD) == {
+        "id": 1,
+        "owner": {"name": "admin"},
+        "snapshots": [{"id": 3}, {"id": 4}],
+    }
+
+
+def test01_should_whole_field_win_over_sub_paths():
+    project = Projector(["owner", "owner.name"])
+    assert project(RECORD) == {"owner": RECORD["owner"]}
+
+
+def test02_should_project_list_of_records():
+    project = Projector(["id", "owner.id"])
+    assert project([RECORD, {"name": "other"}, None]) == [
+        {"id": 1, "owner": {"id": 2}}, {}, None,
+    ]
+    # values not being records are returned as is
+    assert Projector(["owner.id"])({"owner": "admin"}) == {"owner": "admin"}
+
+
+def test10_should_sugar_project_index_records():
+
+    class DiskSugar(SchemaSugarBase):
+        config_dict = {
+            "schema": {},
+            "resources": "disks",
+            "out_fields": {
+                "index": ["id", "owner.name"],
+                "show": ["id", "name"],
+            },
+        }
+
+        def index(self, data, web_request, **kwargs):
+            return [RECORD, RECORD]
+
+        def show(self, data, web_request, **kwargs):
+            return RECORD
+
+        def cli_response(self, result, **kwargs):
+            return result
+
+    sugar = DiskSugar()
+    assert sugar.resources_api("GET", {}) == \
+        [{"id": 1, "owner": {"name": "admin"}}] * 2
+    assert sugar.crud_api("GET", {}) == {"id": 1, "name": "disk"}
+    assert sugar.out_filter(RECORD, "update") is RECORD
+
+
+def test20_should_pass_requested_fields_to_handler():
+    requested = []
+
+    class DiskSugar(SchemaSugarBase):
+        config_dict = {
+            "schema": {},
+            "resources": "disks",
+            "out_fields": {"show": ["id", "name", "owner"]},
+        }
+
+        def show(self, data, web_request, fields=None, **kwargs):
+            requested.append(fields)
+            return RECORD
+
+        def cli_response(self, result, **kwargs):
+            return result
+
+    sugar = DiskSugar()
+    assert sugar.crud_api("GET", {}, fields="id, owner.name") == \
+        {"id": 1, "owner": {"name": "admin"}}
+    assert requested[-1] == frozenset(["id", "owner.name"])
+    assert sugar.crud_api("GET", {}) == \
+        {"id": 1, "name": "disk", "owner": RECORD["owner"]}
+    assert requested[-1] is None
+    with pytest.raises(FormError) as excinfo:
+        sugar.crud_api("GET", {}, fields="id,size,snapshots.id")
+    assert excinfo.value.errors == {"fields": [
+        "'size' is not an allowed field",
+        "'snapshots.id' is not an allowed field",
+    ]}
+    assert len(requested) == 2
+
+
+def test21_should_check_fields_against_schema_properties():
+
+    class DiskSugar(SchemaSugarBase):
+        config_dict = {
+            "schema": {
+                "index": {
+                    "type": "object",
+                    "properties": {"id": {"type": "integer"}},
+                },
+            },
+            "resources": "disks",
+        }
+
+        def index(self, data, web_request, **kwargs):
+            return [RECORD]
+
+        def cli_response(self, result, **kwargs):
+            return result
+
+    sugar = DiskSugar()
+    assert sugar.resources_api("GET", {}, fields=["id"]) == [{"id": 1}]
+    with pytest.raises(FormError):
+        sugar.resources_api("GET", {}, fields="name")
+
+
+def test22_should_ignore_empty_fields():
+
+    class DiskSugar(SchemaSugarBase):
+        config_dict = {
+            "schema": {},
+            "resources": "disks",
+            "out_fields": {"show": ["id", "name"]},
+        }
+
+        def show(self, data, web_request, fields=None, **kwargs):
+            assert fields is None
+            return RECORD
+
+        def cli_response(self, result, **kwargs):
+            return result
+
+    sugar = DiskSugar()
+    for fields in ("", " , ", []):
+        assert sugar.crud_api("GET", {}, fields=fields) == \
+            {"id": 1, "name": "disk"}
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+import json
+import shutil
+import tempfile
+import threading
+
+from mock import patch
+import pytest
+
+from schema_sugar import JsonForm, SugarConfig, FormError, SchemaSugarBase
+from schema_sugar.refs import SchemaStore, SharedRefResolver, schema_store
+
+COMMON_SCHEMA = {
+    "definitions": {
+        "name": {"type": "string", "pattern": "^[a-z]+$"},
+        "size": {"type": "integer", "minimum": 1},
+    },
+}
+
+DISK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"$ref": "common.json#/definitions/name"},
+        "size": {"$ref": "common.json#/definitions/size"},
+    },
+}
+
+
+@pytest.fixture
+def schema_dir(request):
+    path = tempfile.mkdtemp()
+    request.addfinalizer(lambda: shutil.rmtree(path))
+    with open(path + "/common.json", "w") as schema_fp:
+        json.dump(COMMON_SCHEMA, schema_fp)
+    with open(path + "/README", "w") as readme_fp:
+        readme_fp.write("not a schema")
+    return path
+
+
+@pytest.fixture
+def shared_store(request, schema_dir):
+    schema_store.load_dir(schema_dir)
+
+    def remove():
+        schema_store.schemas.pop("common.json")
+        schema_store._resolved.clear()
+
+    request.addfinalizer(remove)
+    return schema_store
+
+
+def test00_should_load_dir_add_json_files():
+    store = SchemaStore()
+    store.add("common.json", dict(COMMON_SCHEMA, id="http://x/common.json"))
+    assert "common.json" in store
+    assert "http://x/common.json" in store
+
+
+def test01_should_resolve_shared_refs_once(schema_dir):
+    store = SchemaStore()
+    store.load_dir(schema_dir)
+    assert list(store.schemas) == ["common.json"]
+    resolvers = [store.resolver_for(DISK_SCHEMA) for _ in range(2)]
+    assert resolvers[0] is not resolvers[1]
+    with patch.object(
+        SharedRefResolver, "resolve_fragment",
+        side_effect=SharedRefResolver.resolve_fragment, autospec=True,
+    ) as resolve_fragment:
+        for resolver in resolvers:
+            with resolver.resolving("common.json#/definitions/name") as res:
+                assert res == COMMON_SCHEMA["definitions"]["name"]
+    assert resolve_fragment.call_count == 1
+
+
+def test02_should_forms_and_sugars_use_shared_store(shared_store):
+    form = JsonForm(
+        {"name": "disk", "size": "0", "extra": 1}, live_schema=DISK_SCHEMA,
+    )
+    assert not form.validate()
+    assert dict(form.errors) == {"size": ["0 is less than the minimum of 1"]}
+
+    config = SugarConfig({"schema": {"create": DISK_SCHEMA},
+                          "resources": "disks"})
+    assert config.get_validator("create").is_valid({"name": "a", "size": 1})
+
+    class DiskSugar(SchemaSugarBase):
+        config_dict = {"schema": {"create": DISK_SCHEMA},
+                       "resources": "disks"}
+
+        def create(self, data, web_request, **kwargs):
+            return data
+
+        def cli_response(self, result, **kwargs):
+            return result
+
+    sugar = DiskSugar()
+    assert sugar.crud_api("create", {"name": "abc", "size": "2"}) == \
+        {"name": "abc", "size": 2}
+    with pytest.raises(FormError) as excinfo:
+        sugar.crud_api("create", {"name": "ABC", "size": "2"})
+    assert list(excinfo.value.errors) == ["name"]
+
+
+def test03_should_share_validator_between_threads(shared_store):
+    config = SugarConfig({
+        "schema": {
+            "create": {
+                "type": "object",
+                "definitions": {"label": {"type": "string"}},
+                "properties": {
+                    "name": {"$ref": "common.json#/definitions/name"},
+                    "label": {"$ref": "#/definitions/label"},
+                },
+            },
+        },
+        "resources": "disks",
+    })
+    validator = config.get_validator("create")
+    # paused inside the scope of the shared ref
+    errors = validator.iter_errors({"name": "ABC"})
+    assert next(errors).validator == "pattern"
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(validator.is_valid({"label": 1}))
+    )
+    thread.start()
+    thread.join()
+    assert results == [False]
+    assert list(errors) == []
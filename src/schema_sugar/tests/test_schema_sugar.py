@@ -1,6 +1,8 @@
 from abc import abstractmethod
 
 import unittest2 as unittest
+from mock import patch, Mock
+from werkzeug.datastructures import MultiDict
 
 from schema_sugar import (
     method2op,
@@ -8,7 +10,15 @@ from schema_sugar import (
     is_abs_method,
     JsonForm,
     cli_arg_generator,
+    SchemaSugarBase,
+    Draft4Validator,
+    FormError,
+    FormPlan,
+    convert_type,
+    convert_column,
+    converter_map,
 )
+import schema_sugar
 
 
 class TestMethod2OPCONV(unittest.TestCase):
@@ -146,6 +156,30 @@ class TestJsonForm(unittest.TestCase):
             }
         )
 
+    def test_both_schema_merged_once(self):
+
+        class MyForm(self.JsonForm):
+            schema = self.base_schema
+
+        live_schema = {
+            "type": "object",
+            "properties": {
+                "field2": {"type": "number"},
+            },
+            "required": ["field2", ],
+        }
+        form1 = MyForm({"field1": "a", "field2": "1"}, live_schema=live_schema)
+        form2 = MyForm({"field1": "b"}, live_schema=live_schema)
+        self.assertIs(form1.schema, form2.schema)
+        self.assertIs(form1.validator, form2.validator)
+        # class level schema is untouched
+        self.assertEqual(
+            self.base_schema["properties"]["field2"], {"type": "string"}
+        )
+        self.assertEqual(self.base_schema["required"], ["field1"])
+        self.assertTrue(form1.validate())
+        self.assertFalse(form2.validate())
+
     def test_validation_success(self):
         class MyForm(self.JsonForm):
             schema = self.base_schema
@@ -237,6 +271,351 @@ class TestJsonForm(unittest.TestCase):
         self.assertEqual(len(form.errors[field_key]), 1)
         self.assertIsInstance(form.errors[field_key][0], basestring)
 
+    def test_errors_collected_in_one_pass(self):
+        class MyForm(self.JsonForm):
+            schema = self.base_schema
+        form = MyForm({"field2": 1})
+        with patch.object(form.validator, "validate") as validate:
+            self.assertFalse(form.validate())
+            self.assertFalse(validate.called)
+        self.assertEqual(set(form.errors), {"", "field2"})
+        self.assertIn("'field1' is a required property", form.error_msg)
+
+    def test_fail_fast(self):
+        class MyForm(self.JsonForm):
+            schema = self.base_schema
+        form = MyForm({"field2": 1}, fail_fast=True)
+        self.assertFalse(form.validate())
+        self.assertEqual(len(form.errors), 1)
+        self.assertEqual(sum(len(e) for e in form.errors.values()), 1)
+        self.assertIsNotNone(form.error_msg)
+
+
+class TestFormPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "size": {"type": "integer", "minimum": 1},
+                "thin": {"type": "boolean"},
+                "owner": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "ratio": {"type": "number"},
+                    },
+                    "required": ["id"],
+                },
+            },
+            "required": ["name"],
+        }
+
+    def test_filter_and_convert(self):
+        data, errors = FormPlan(self.schema).run({
+            "name": "disk",
+            "size": "10",
+            "thin": "true",
+            "unknown": "dropped",
+            "owner": {"id": "1", "ratio": "0.5", "unknown": 1},
+        })
+        self.assertEqual(errors, [])
+        self.assertEqual(data, {
+            "name": "disk",
+            "size": 10,
+            "thin": True,
+            "owner": {"id": 1, "ratio": 0.5},
+        })
+
+    def test_empty_values_dropped(self):
+        data, errors = FormPlan(self.schema).run({"name": "disk", "size": ""})
+        self.assertEqual(data, {"name": "disk"})
+
+    def test_errors_conform_to_draft4(self):
+        instances = [
+            {},
+            {"size": "0", "owner": {}},
+            {"name": 1, "size": "x", "owner": {"ratio": "a"}},
+            {"name": "disk", "owner": "not an object"},
+        ]
+        validator = Draft4Validator(self.schema)
+        for instance in instances:
+            data, errors = FormPlan(self.schema).run(instance)
+            expected = sorted(
+                (list(e.absolute_path), list(e.schema_path), e.message)
+                for e in validator.iter_errors(data)
+            )
+            self.assertEqual(expected, sorted(
+                (list(e.absolute_path), list(e.schema_path), e.message)
+                for e in errors
+            ))
+
+    def test_fail_fast(self):
+        data, errors = FormPlan(self.schema).run(
+            {"name": 1, "size": "x", "owner": {}}, fail_fast=True,
+        )
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(data, {"name": 1, "size": "x", "owner": {}})
+
+    def test_unsplittable_schema(self):
+        schema = {
+            "type": "object",
+            "properties": {"name": {"type": "string"}},
+            "additionalProperties": False,
+        }
+        data, errors = FormPlan(schema).run({"name": 1, "extra": 1})
+        self.assertEqual(data, {"name": 1})
+        self.assertEqual(
+            [e.message for e in errors], ["1 is not of type 'string'"]
+        )
+
+    def test_nested_errors_in_form(self):
+        form = JsonForm({"name": "disk", "owner": {}}, live_schema=self.schema)
+        self.assertFalse(form.validate())
+        self.assertEqual(
+            dict(form.errors), {"owner": ["'id' is a required property"]}
+        )
+
+    def test_array_items_converted(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "sizes": {"type": "array", "items": {"type": "number"}},
+                "flags": {"type": "array", "items": {"type": "boolean"}},
+                "disks": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"size": {"type": "integer"}},
+                    },
+                },
+                "matrix": {
+                    "type": "array",
+                    "items": {"type": "array", "items": {"type": "integer"}},
+                },
+            },
+        }
+        data, errors = FormPlan(schema).run({
+            "sizes": ["1", "2.5"],
+            "flags": ["true", "0"],
+            "disks": [{"size": "1", "unknown": 1}, "not an object"],
+            "matrix": [["1", "2"], ["3"]],
+        })
+        self.assertEqual(data, {
+            "sizes": [1, 2.5],
+            "flags": [True, False],
+            "disks": [{"size": 1}, "not an object"],
+            "matrix": [[1, 2], [3]],
+        })
+        self.assertEqual(
+            [(list(e.absolute_path), e.message) for e in errors],
+            [(["disks", 1], "'not an object' is not of type 'object'")],
+        )
+
+    def test_array_from_query_string(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "ids": {"type": "array", "items": {"type": "integer"}},
+                "name": {"type": "string"},
+            },
+        }
+        form = JsonForm(
+            MultiDict([("ids", "1"), ("ids", "2"), ("name", "a")]),
+            live_schema=schema,
+        )
+        self.assertTrue(form.validate())
+        self.assertEqual(form.data, {"ids": [1, 2], "name": "a"})
+
+    def test_numeric_array_fast_path(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "sizes": {"type": "array", "items": {"type": "number"}},
+            },
+        }
+        plan = FormPlan(schema)
+        converter = Mock(side_effect=converter_map["number"])
+        with patch.dict(converter_map, {"number": converter}):
+            data, errors = plan.run(
+                {"sizes": [str(i) for i in range(10000)]}
+            )
+        self.assertFalse(converter.called)
+        self.assertEqual(data["sizes"], range(10000))
+
+
+class TestConvertColumn(unittest.TestCase):
+
+    columns = [
+        ("number", [1, 2.5, 3L]),
+        ("number", ["1", "22", u"333"]),
+        ("number", ["1.5", u"-2", "1e3", "abc"]),
+        ("number", ["1.5", "2"]),
+        ("number", [True, "1", 2]),
+        ("integer", ["1", "2"]),
+        ("integer", ["-1", "x", 1.5]),
+        ("integer", [u"1", u"\xb2"]),
+        ("number", [u"\xb2", u"3"]),
+        ("boolean", ["true", "False", "1", "0", "yes"]),
+        ("boolean", [True, "true"]),
+        ("string", ["1", 2]),
+    ]
+
+    def _check_columns(self):
+        for type_, values in self.columns:
+            expected = [convert_type(value, type_) for value in values]
+            converted = convert_column(values, type_)
+            self.assertEqual(converted, expected)
+            self.assertEqual(
+                [type(value) for value in converted],
+                [type(value) for value in expected],
+            )
+
+    def test_same_as_convert_type(self):
+        self._check_columns()
+
+    def test_same_as_convert_type_without_numpy(self):
+        with patch.object(schema_sugar, "numpy", None):
+            self._check_columns()
+
+    def test_non_ascii_digits_invalid(self):
+        form = JsonForm(
+            MultiDict([("ids", u"1"), ("ids", u"\xb2")]),
+            live_schema={
+                "type": "object",
+                "properties": {
+                    "ids": {"type": "array", "items": {"type": "integer"}},
+                },
+            },
+        )
+        self.assertFalse(form.validate())
+        self.assertEqual(list(form.errors), ["ids.1"])
+
+
+class TestValidateMany(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "size": {"type": "number"},
+                "thin": {"type": "boolean"},
+            },
+            "required": ["name", "size"],
+        }
+
+    def test_same_as_json_form(self):
+        records = [
+            {"name": "a", "size": "1", "thin": "true", "extra": 1},
+            {"name": "b", "size": "1.5", "thin": "0"},
+            {"name": "c", "size": "", "thin": "x"},
+            {"size": "abc"},
+        ]
+        data_list, errors = JsonForm.validate_many(
+            records, live_schema=self.schema
+        )
+        for position, record in enumerate(records):
+            form = JsonForm(record, live_schema=self.schema)
+            self.assertEqual(data_list[position], form.data)
+            if form.validate():
+                self.assertNotIn(position, errors)
+            else:
+                self.assertEqual(errors[position], form.errors)
+        self.assertEqual(sorted(errors), [2, 3])
+
+    def test_validate_batch(self):
+        schema = self.schema
+
+        class MySugar(SchemaSugarBase):
+            config_dict = {
+                "schema": {"create": schema},
+                "resources": "disks",
+            }
+
+        sugar = MySugar()
+        self.assertEqual(
+            sugar.validate_batch("create", [{"name": "a", "size": "2"}]),
+            [{"name": "a", "size": 2}],
+        )
+        with self.assertRaises(FormError) as context:
+            sugar.validate_batch("create", [{"name": "a", "size": "2"}, {}])
+        self.assertEqual(list(context.exception.errors), [1])
+
+
+class TestValidationCache(unittest.TestCase):
+
+    def setUp(self):
+
+        class MySugar(SchemaSugarBase):
+            validation_cache_size = 2
+            config_dict = {
+                "schema": {
+                    "index": {
+                        "type": "object",
+                        "properties": {
+                            "size": {"type": "number"},
+                            "ids": {
+                                "type": "array",
+                                "items": {"type": "integer"},
+                            },
+                        },
+                    },
+                    "create": {
+                        "type": "object",
+                        "properties": {"size": {"type": "number"}},
+                    },
+                },
+                "resources": "disks",
+            }
+
+            def index(self, data, web_request, **kwargs):
+                data["touched"] = True
+                if "ids" in data:
+                    data["ids"].append(99)
+                return data
+
+            def create(self, data, web_request, **kwargs):
+                return data
+
+            def cli_response(self, result, **kwargs):
+                return result
+
+        self.sugar = MySugar()
+        self.cache = self.sugar.validation_cache
+
+    def test_read_operation_cached(self):
+        args = MultiDict([("size", "1"), ("unknown", "x")])
+        self.assertEqual(
+            self.sugar.resources_api("get", args), {"size": 1, "touched": True}
+        )
+        self.assertEqual(
+            self.sugar.resources_api("get", args), {"size": 1, "touched": True}
+        )
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.sugar.resources_api("get", MultiDict([("size", "2")]))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_cached_data_not_shared(self):
+        args = MultiDict([("ids", "1"), ("ids", "2")])
+        for _ in range(3):
+            self.assertEqual(
+                self.sugar.resources_api("get", args)["ids"], [1, 2, 99]
+            )
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_write_operation_not_cached(self):
+        self.sugar.resources_api("post", {"size": "1"})
+        self.sugar.resources_api("post", {"size": "1"})
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalid_data_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(FormError):
+                self.sugar.resources_api("get", {"size": "x"})
+        self.assertEqual(len(self.cache), 0)
+
 
 class TestArgGenerator(unittest.TestCase):
 
@@ -251,3 +630,275 @@ class TestArgGenerator(unittest.TestCase):
         except ValueError as e:
             pass
         self.assertIsNotNone(e)
+
+
+class TestValidatorCache(unittest.TestCase):
+
+    def setUp(self):
+
+        class MySugar(SchemaSugarBase):
+            config_dict = {
+                "schema": {
+                    "create": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                        },
+                        "required": ["name", ],
+                    },
+                },
+                "resources": "disks",
+            }
+
+            def create(self, data, web_request, **kwargs):
+                return data
+
+            def cli_response(self, result, **kwargs):
+                return result
+
+        self.MySugar = MySugar
+
+    def test_validator_compiled_once(self):
+        sugar = self.MySugar()
+        validator = sugar.config.get_validator("create")
+        self.assertIs(validator, sugar.config.get_validator("create"))
+        with patch.object(Draft4Validator, "check_schema") as check_schema:
+            sugar.crud_api("create", {"name": "disk1"})
+            sugar.crud_api("create", {"name": "disk2"})
+            self.assertEqual(check_schema.call_count, 0)
+
+    def test_validator_cache_bound_to_config(self):
+        sugar1 = self.MySugar()
+        sugar2 = self.MySugar()
+        self.assertIsNot(
+            sugar1.config.get_validator("create"),
+            sugar2.config.get_validator("create"),
+        )
+
+    def test_cached_validator_still_validates(self):
+        sugar = self.MySugar()
+        self.assertEqual(
+            sugar.crud_api("create", {"name": "disk1"}),
+            {"name": "disk1"},
+        )
+        with self.assertRaises(FormError):
+            sugar.crud_api("create", {})
+
+    def test_overridden_validate_called(self):
+        validated = []
+
+        class MySugar(self.MySugar):
+
+            def validate(self, validate_schema, data):
+                validated.append(data)
+                return super(MySugar, self).validate(validate_schema, data)
+
+        sugar = MySugar()
+        self.assertEqual(
+            sugar.crud_api("create", {"name": "disk1"}),
+            {"name": "disk1"},
+        )
+        self.assertEqual(validated, [{"name": "disk1"}])
+
+
+class TestTrustedSchemas(unittest.TestCase):
+
+    def setUp(self):
+
+        class MySugar(SchemaSugarBase):
+            config_dict = {
+                "schema": {
+                    "create": {
+                        "type": "object",
+                        "properties": {"name": {"type": "string"}},
+                    },
+                },
+                "resources": "disks",
+            }
+
+            def create(self, data, web_request, **kwargs):
+                return data
+
+        self.MySugar = MySugar
+
+    def test_trusted_block_skips_checks(self):
+        with patch.object(Draft4Validator, "check_schema") as check_schema, \
+                patch.object(schema_sugar.SugarConfig,
+                             "_check_config") as check_config:
+            with schema_sugar.trusted_schemas():
+                self.assertTrue(schema_sugar.schemas_trusted())
+                sugar = self.MySugar()
+                form = JsonForm({"name": 1}, live_schema={"type": "object"})
+            self.assertFalse(schema_sugar.schemas_trusted())
+            self.assertTrue(sugar.config.trusted)
+            self.assertEqual(check_config.call_count, 0)
+            self.assertEqual(check_schema.call_count, 0)
+            self.MySugar()
+            self.assertEqual(check_config.call_count, 1)
+        self.assertTrue(form.validate())
+
+    def test_trusted_sugar_still_validates_data(self):
+        self.MySugar.trust_schemas = True
+        sugar = self.MySugar()
+        self.assertTrue(sugar.config.trusted)
+        with self.assertRaises(FormError):
+            sugar.crud_api("create", {"name": 1})
+
+    def test_global_trust(self):
+        schema_sugar.set_schemas_trusted(True)
+        try:
+            self.assertTrue(self.MySugar().config.trusted)
+            with schema_sugar.trusted_schemas(False):
+                self.assertFalse(self.MySugar().config.trusted)
+        finally:
+            schema_sugar.set_schemas_trusted(False)
+        self.assertFalse(self.MySugar().config.trusted)
+
+
+class TestSugarConfig(unittest.TestCase):
+
+    def setUp(self):
+
+        class MySugar(SchemaSugarBase):
+            config_dict = {
+                "schema": {
+                    "create": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "size": {"type": "integer"},
+                        },
+                    },
+                },
+                "resources": "disks",
+                "out_fields": {"create": ["name"]},
+            }
+
+            def create(self, data, web_request, **kwargs):
+                return data
+
+            def cli_response(self, result, **kwargs):
+                return result
+
+            @schema_sugar.action("resize", "POST")
+            def resize(self, data, web_request, **kwargs):
+                return data
+
+        self.MySugar = MySugar
+
+    def test_precomputed_values(self):
+        config = self.MySugar().config
+        self.assertTrue(config.is_plural)
+        self.assertEqual(config.resource_root, "/disks")
+        self.assertEqual(
+            config.resource_detail, {"is_singular": False, "name": "disks"}
+        )
+        self.assertEqual(config.support_operations, ("create", ))
+        self.assertEqual(
+            config.extra_actions, {"resize": {"http_method": "POST"}}
+        )
+        self.assertEqual(config.get_out_fields("create"), frozenset(["name"]))
+        self.assertIsNone(config.get_out_fields("show"))
+        self.assertEqual(
+            config.get_validation_schema("show"),
+            {"type": "object", "properties": {}},
+        )
+        self.assertEqual(
+            config.dumps()["schema"]["support_operations"], ["create"]
+        )
+
+    def test_frozen(self):
+        config = self.MySugar().config
+        with self.assertRaises(AttributeError):
+            config.resource_root = "/other"
+        with self.assertRaises(AttributeError):
+            config.anything = 1
+
+    def test_caller_dict_not_modified(self):
+        sugar = self.MySugar()
+        self.assertEqual(
+            list(self.MySugar.config_dict["schema"]), ["create"]
+        )
+        self.assertNotIn("extra_actions", self.MySugar.config_dict)
+        self.assertEqual(
+            sugar.crud_api("create", {"name": "disk", "size": 1}),
+            {"name": "disk"},
+        )
+
+    def test_from_dumped_config(self):
+        dumped = self.MySugar().config.dumps()
+        config = schema_sugar.SugarConfig(dumped)
+        self.assertEqual(config.support_operations, ("create", ))
+        self.assertEqual(
+            config.extra_actions, {"resize": {"http_method": "POST"}}
+        )
+
+
+class TestDispatchTable(unittest.TestCase):
+
+    def setUp(self):
+
+        class MySugar(SchemaSugarBase):
+            config_dict = {
+                "schema": {
+                    "create": {
+                        "type": "object",
+                        "properties": {"name": {"type": "string"}},
+                    },
+                },
+                "resources": "disks",
+                "out_fields": {"create": ["name"]},
+            }
+
+            def create(self, data, web_request, **kwargs):
+                data["extra"] = 1
+                return data
+
+            def show(self, data, web_request, **kwargs):
+                return {"id": kwargs["id"]}
+
+            def cli_response(self, result, **kwargs):
+                return result
+
+        self.MySugar = MySugar
+
+    def test_dispatch_without_reflection(self):
+        sugar = self.MySugar()
+        with patch("schema_sugar.is_abs_method") as is_abs, \
+                patch("schema_sugar.method2op") as to_op, \
+                patch("schema_sugar.resources_method2op") as to_ops:
+            self.assertEqual(
+                sugar.resources_api("POST", {"name": "disk"}),
+                {"name": "disk"},
+            )
+            self.assertEqual(sugar.crud_api("get", {}, id=1), {"id": 1})
+            self.assertEqual(sugar.crud_api("show", {}, id=2), {"id": 2})
+        self.assertFalse(is_abs.called)
+        self.assertFalse(to_op.called)
+        self.assertFalse(to_ops.called)
+
+    def test_unsupported_operation_short_circuits(self):
+        sugar = self.MySugar()
+        with patch.object(sugar, "pre_process") as pre_process:
+            with self.assertRaises(schema_sugar.MethodNotImplement):
+                sugar.crud_api("DELETE", {})
+            with self.assertRaises(schema_sugar.MethodNotImplement):
+                sugar.resources_api("GET", {})
+        self.assertFalse(pre_process.called)
+
+    def test_unknown_method_still_converted(self):
+        sugar = self.MySugar()
+        self.assertEqual(sugar.crud_api("Get", {}, id=3), {"id": 3})
+        with self.assertRaises(ValueError):
+            sugar.crud_api("patch", {})
+
+    def test_add_action(self):
+        sugar = self.MySugar()
+        sugar.resize = lambda data, web_request, **kwargs: {"size": 2}
+        sugar.add_action("resize", "POST")
+        self.assertEqual(
+            sugar.config.extra_actions["resize"], {"http_method": "POST"}
+        )
+        self.assertEqual(
+            sugar.action_api("resize")("resize", {}, None), {"size": 2}
+        )
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2015, SMARTX
+# All rights reserved.
+import io
+import json
+
+import pytest
+
+from schema_sugar.utils import iter_json_array, LRUCache
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1024])
+@pytest.mark.parametrize("document", [
+    '[]',
+    ' [ 1 , 2.5, -3e10,4 ] ',
+    '["a\\u00e9", {"a": [1, 2]}, null, true, false]',
+    u'["中文", 123456]'.encode("utf-8"),
+    '[{"x": 1}\n,\n{"y": "]"}]',
+    '["\\"[{", {"a\\\\": "}\\""}, [[], {}]] \n',
+])
+def test00_should_iter_json_array_yield_elements(document, chunk_size):
+    elements = iter_json_array(io.BytesIO(document).read, chunk_size)
+    assert list(elements) == json.loads(document)
+
+
+@pytest.mark.parametrize("document", [
+    '', '{}', '[1,]', '[1 2]', '[1,', '[', '[1x]', '[,1]', '[1] x', '[] []',
+    '[{"a": 1}}]', 'nope',
+])
+def test01_should_iter_json_array_reject_invalid_array(document):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(document).read, 2))
+
+
+def test02_should_iter_json_array_read_lazily():
+    stream = io.BytesIO('[{"id": 1}, {"id": 2}, ' + ' ' * 4096 + '{"id": 3}]')
+    elements = iter_json_array(stream.read, 16)
+    assert next(elements) == {"id": 1}
+    assert stream.tell() < 64
+
+
+def test03_should_iter_json_array_reject_malformed_element_early():
+    stream = io.BytesIO(
+        '[{"n": 1}, {"n": 1x}, ' + '{"n": 2}, ' * 10000 + '{"n": 3}]'
+    )
+    elements = iter_json_array(stream.read, 16)
+    assert next(elements) == {"n": 1}
+    with pytest.raises(ValueError):
+        next(elements)
+    assert stream.tell() < 64
+
+
+def test04_should_iter_json_array_read_large_element_geometrically():
+    document = json.dumps(["x" * 1000000, {"a": ["y" * 1000000]}])
+    stream = io.BytesIO(document)
+    reads = []
+
+    def read(size):
+        reads.append(size)
+        return stream.read(size)
+
+    assert list(iter_json_array(read, 1024)) == json.loads(document)
+    assert len(reads) < 50
+
+
+def test10_should_lru_cache_evict_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test11_should_lru_cache_expire_items():
+    now = [0]
+    cache = LRUCache(2, ttl=10, timer=lambda: now[0])
+    cache.set("a", 1)
+    now[0] = 9
+    assert cache.get("a") == 1
+    now[0] = 10
+    assert cache.get("a") is None
+    assert len(cache) == 0
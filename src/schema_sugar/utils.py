@@ -1,8 +1,18 @@
 # -*- coding: utf-8 -*-
 # Copyright (c) 2013-2015, SMARTX
 # All rights reserved.
+from collections import OrderedDict
+import codecs
+import json
+import re
+import threading
+import time
+
 from schema_sugar.constant import CLI2HTTP_MAP, OP2CLI_MAP
 
+_JSON_WHITESPACE = u" \t\n\r"
+_JSON_DELIMITERS = _JSON_WHITESPACE + u",]"
+
 
 def cli2http(cli_operation):
     """
@@ -17,4 +27,210 @@ def op2cli(operation_name):
     Convert operation name to human readable cli name.
     :param operation_name: str
     """
-    return OP2CLI_MAP[operation_name]
\ No newline at end of file
+    return OP2CLI_MAP[operation_name]
+
+
+def iter_json_array(read, chunk_size=64 * 1024):
+    """
+    Parse a JSON array from a stream incrementally and yield its elements
+    one by one, so only the element being parsed is kept in memory.
+    An element not decoded from the buffered data is truncated or
+    malformed, its end is found by scanning its brackets and strings as
+    chunks arrive, then it's decoded again once. So a malformed element is
+    rejected without reading the rest of the stream, and a large element
+    costs linear time, reads grow geometrically while it spans chunks.
+    :param read: function like `file.read(size)` returns utf-8 bytes
+    :param chunk_size: bytes read from the stream each time
+    :raise ValueError: if the stream is not a valid JSON array
+    """
+    decoder = json.JSONDecoder()
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    buf, pos = u"", 0
+    eof = started = False
+    # waiting for an element(after "[" or ",") or for "," and "]"
+    expect_element, first = True, True
+    # [scan position, depth, in string] of the element being scanned
+    scan = None
+    while True:
+        if scan is None:
+            while pos < len(buf) and buf[pos] in _JSON_WHITESPACE:
+                pos += 1
+        if pos == len(buf) or scan is not None:
+            end = None
+            if scan is not None:
+                end = _scan_value(buf, pos, scan, eof)
+            if end is None:
+                if eof:
+                    raise ValueError("Unexpected end of JSON array")
+                # the element may be large, read at least what is buffered
+                chunk = read(max(chunk_size, len(buf) - pos))
+                eof = not chunk
+                buf = buf[pos:] + decode(chunk, eof)
+                if scan is not None:
+                    scan[0] -= pos
+                pos = 0
+                continue
+            element, stop = decoder.raw_decode(buf, pos)
+            if stop != end:
+                raise ValueError(
+                    "Invalid JSON array element: %r" % buf[pos:end][:64]
+                )
+            yield element
+            pos, scan = end, None
+            expect_element = first = False
+            continue
+
+        char = buf[pos]
+        if not started:
+            if char != u"[":
+                raise ValueError("Expecting a JSON array")
+            started = True
+            pos += 1
+        elif char == u"]" and (first or not expect_element):
+            _check_trailing(read, chunk_size, buf, pos + 1, decode, eof)
+            return
+        elif not expect_element:
+            if char != u",":
+                raise ValueError("Expecting ',' delimiter in JSON array")
+            expect_element = True
+            pos += 1
+        else:
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                end = None
+            # a number at the end of buffer(like "2" of "2.5") may continue
+            # in next chunk, so it should be followed by a delimiter
+            if end is not None and (eof or char in u'"[{' or (
+                    end < len(buf) and buf[end] in _JSON_DELIMITERS)):
+                yield element
+                pos = end
+                expect_element = first = False
+                continue
+            # truncated or malformed, scan for its end, so it's decoded
+            # again only when complete
+            if char == u'"':
+                scan = [pos + 1, 0, True]
+            else:
+                scan = [pos, 0, False]
+
+
+# tokens changing the depth or string state of a scanned value
+_VALUE_TOKENS = re.compile(r'["\[\]{}]')
+_STRING_TOKENS = re.compile(r'["\\]')
+# a number, true, false or null ends before these
+_SCALAR_END = re.compile(r'[ \t\n\r,\]]')
+
+
+def _scan_value(buf, pos, state, eof):
+    """
+    Find the end of the JSON value starting at `buf[pos]`, the scan goes on
+    from where the last call stopped when the buffer grows.
+    :param state: [scan position, depth, in string], updated in place
+    :return: the end position, or None if the value continues after buf
+    """
+    scan, depth, in_string = state
+    if not in_string and depth == 0 and buf[pos] not in u"[{":
+        match = _SCALAR_END.search(buf, scan)
+        if match is not None:
+            return match.start()
+        state[0] = len(buf)
+        return len(buf) if eof else None
+
+    while True:
+        if in_string:
+            match = _STRING_TOKENS.search(buf, scan)
+            if match is None:
+                scan = len(buf)
+                break
+            if match.group() == u"\\":
+                if match.end() >= len(buf):
+                    # the escaped char is in next chunk
+                    scan = match.start()
+                    break
+                scan = match.end() + 1
+                continue
+            scan, in_string = match.end(), False
+            if depth == 0:
+                return scan
+        else:
+            match = _VALUE_TOKENS.search(buf, scan)
+            if match is None:
+                scan = len(buf)
+                break
+            token, scan = match.group(), match.end()
+            if token == u'"':
+                in_string = True
+            elif token in u"[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return scan
+    state[:] = scan, depth, in_string
+    return None
+
+
+def _check_trailing(read, chunk_size, buf, pos, decode, eof):
+    """
+    Check only whitespace follows the JSON array in the stream.
+    :raise ValueError: if there is extra data
+    """
+    while True:
+        if buf[pos:].strip(_JSON_WHITESPACE):
+            raise ValueError("Extra data after JSON array")
+        if eof:
+            return
+        chunk = read(chunk_size)
+        eof = not chunk
+        buf, pos = decode(chunk, eof), 0
+
+
+class LRUCache(object):
+    """
+    Thread-safe bounded LRU cache with optional TTL, it counts cache
+    hits and misses.
+    """
+
+    def __init__(self, size, ttl=None, timer=time.time):
+        """
+        :param size: max item count, the least recently used one is evicted
+        :param ttl: seconds an item lives, None means forever
+        :param timer: function returns current time in seconds
+        """
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._timer = timer
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None or (
+                    item[1] is not None and item[1] <= self._timer()):
+                self.misses += 1
+                return default
+            # move it to the end as the most recently used one
+            self._items[key] = item
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value):
+        expire_at = None
+        if self.ttl is not None:
+            expire_at = self._timer() + self.ttl
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (value, expire_at)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
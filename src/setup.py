@@ -14,7 +14,15 @@ setup(name='schema-sugar',
           'jsonschema',
           'flask',
           'click',
+          # concurrent.futures of python 3
+          'futures',
       ],
+      extras_require={
+          # column conversion of batch validation
+          'numpy': ['numpy'],
+          # compact /meta payload
+          'msgpack': ['msgpack'],
+      },
       test_requires=[
         "nose",
         "coverage",
@@ -22,6 +30,7 @@ setup(name='schema-sugar',
       entry_points={
           'console_scripts': [
               'sugar-gen = schema_sugar:gen_code',
+              'sugar-config-cache = schema_sugar.config_cache:build_cache',
           ],
       },
       )